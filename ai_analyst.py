@@ -1,7 +1,19 @@
 import pandas as pd
 import numpy as np
 
-def analisar_com_ia(df, eixo_x, eixo_y):
+from calendario import Calendario
+
+def analisar_com_ia(df, eixo_x, eixo_y, progresso=None, calendario=None):
+    """
+    Gera o diagnóstico executivo em texto.
+
+    `progresso(fracao, mensagem)` é opcional e é chamado entre as etapas;
+    se ele levantar uma exceção (ex.: cancelamento), a análise é interrompida.
+    `calendario` (Calendario do mesmo df) evita reler a coluna de data.
+    """
+    if progresso is None:
+        progresso = lambda fracao, mensagem=None: None
+
     # ============================================================
     # PREPARAÇÃO E SEGURANÇA
     # ============================================================
@@ -17,6 +29,8 @@ def analisar_com_ia(df, eixo_x, eixo_y):
     df_temp = df.copy()
     df_temp[eixo_x] = df_temp[eixo_x].astype(str)
 
+    progresso(0.2, "Agrupando categorias...")
+
     # ============================================================
     # 1. AGRUPAMENTO E CONCENTRAÇÃO
     # ============================================================
@@ -41,6 +55,8 @@ def analisar_com_ia(df, eixo_x, eixo_y):
     qtd_pareto = len(categorias_pareto)
     perc_pareto = (qtd_pareto / len(agrupado) * 100) if len(agrupado) > 0 else 0
 
+    progresso(0.4, "Procurando outliers...")
+
     # ============================================================
     # 3. OUTLIERS (IQR + Z-SCORE)
     # ============================================================
@@ -74,6 +90,8 @@ def analisar_com_ia(df, eixo_x, eixo_y):
     except:
         pass
 
+    progresso(0.6, "Analisando série temporal...")
+
     # ============================================================
     # 6. TENDÊNCIA TEMPORAL E SAZONALIDADE
     # ============================================================
@@ -87,16 +105,13 @@ def analisar_com_ia(df, eixo_x, eixo_y):
             break
 
     if datas_validas:
-        df_tempo = df.copy()
-        df_tempo[datas_validas] = pd.to_datetime(df_tempo[datas_validas], errors="coerce")
-        df_tempo = df_tempo.dropna(subset=[datas_validas])
+        if calendario is None:
+            calendario = Calendario(df)
 
-        if len(df_tempo) > 3:
-            df_tempo["mes"] = df_tempo[datas_validas].dt.to_period("M")
-            evolucao = df_tempo.groupby("mes")[eixo_y].sum()
+        if calendario.linhas_validas(datas_validas) > 3:
+            crescimento = calendario.crescimento_mensal(datas_validas, eixo_y)
 
-            if len(evolucao) > 1:
-                crescimento = evolucao.pct_change().mean() * 100
+            if crescimento is not None:
                 if crescimento > 0:
                     tendencia_texto = f"A série temporal indica um crescimento médio de {crescimento:.1f}% ao mês."
                 elif crescimento < 0:
@@ -105,8 +120,7 @@ def analisar_com_ia(df, eixo_x, eixo_y):
                     tendencia_texto = "A série temporal não apresenta tendência significativa."
 
             # Sazonalidade
-            df_tempo["mes_num"] = df_tempo[datas_validas].dt.month
-            sazonal = df_tempo.groupby("mes_num")[eixo_y].mean()
+            sazonal = calendario.sazonalidade(datas_validas, eixo_y)
 
             if len(sazonal) > 0:
                 mes_top = sazonal.idxmax()
@@ -120,6 +134,8 @@ def analisar_com_ia(df, eixo_x, eixo_y):
     nulos = df[eixo_y].isna().sum()
     perc_nulos = (nulos / qtd * 100) if qtd > 0 else 0
 
+    progresso(0.9, "Redigindo diagnóstico...")
+
     # ============================================================
     # TEXTO FINAL — ULTRA PREMIUM
     # ============================================================
@@ -181,4 +197,78 @@ Esses elementos podem orientar decisões como:
 Este diagnóstico fornece uma visão completa, combinando estatística avançada, análise temporal e inteligência executiva.
 """
 
-    return texto
\ No newline at end of file
+    return texto
+
+def analisar_agregados(kpis, pareto, tendencia, eixo_x, eixo_y):
+    """
+    Diagnóstico a partir de agregados já calculados pelo motor de consulta
+    (arquivos grandes demais para o DataFrame): KPIs, curva de Pareto por
+    `eixo_x` e tendência mensal (pode ser None). Outliers, distribuição e
+    correlações exigem as linhas e ficam de fora.
+    """
+    total, media, desvio = kpis["total"], kpis["media"], kpis["desvio"]
+    cv = (desvio / media * 100) if media and not np.isnan(desvio) else 0
+    qtd = kpis["registros"]
+
+    if pareto is None or pareto.empty:
+        return "Não foi possível gerar análise: agrupamento vazio."
+
+    maior_cat = pareto.index[0]
+    maior_val = pareto["valor"].iloc[0]
+    perc_maior = pareto["participacao"].iloc[0] * 100
+    qtd_pareto = pareto.attrs.get("categorias_no_corte", 0)
+    perc_pareto = qtd_pareto / len(pareto) * 100
+
+    tendencia_texto = ""
+    if tendencia is not None and len(tendencia.dropna()) > 1:
+        crescimento = tendencia.dropna().pct_change().mean() * 100
+        if crescimento > 0:
+            tendencia_texto = f"A série temporal indica um crescimento médio de {crescimento:.1f}% ao mês."
+        elif crescimento < 0:
+            tendencia_texto = f"Os dados mostram uma queda média de {abs(crescimento):.1f}% ao mês."
+        else:
+            tendencia_texto = "A série temporal não apresenta tendência significativa."
+
+    nulos = qtd - kpis["contagem"]
+    perc_nulos = (nulos / qtd * 100) if qtd > 0 else 0
+
+    texto = f"""
+📌 **Resumo Executivo Avançado**
+
+• Total acumulado de **{eixo_y}**: {total:,.2f}  
+• Média por registro: {media:,.2f}  
+• Desvio padrão: {desvio:,.2f}  
+• Coeficiente de variação (CV): {cv:.1f}%  
+• Intervalo observado: {kpis["minimo"]:,.2f} → {kpis["maximo"]:,.2f}  
+• Registros analisados: {qtd}  
+
+📌 **Concentração e Liderança**
+• A categoria **{maior_cat}** lidera com {maior_val:,.2f}, representando **{perc_maior:.1f}%** do total.  
+
+📌 **Pareto 80/20**
+• **{qtd_pareto} categorias** ({perc_pareto:.1f}%) respondem por **80%** do resultado.  
+• Focar nesses grupos tende a gerar maior impacto estratégico.
+
+"""
+
+    if tendencia_texto:
+        texto += f"📌 **Tendência Temporal**\n• {tendencia_texto}\n\n"
+
+    texto += f"""📌 **Qualidade dos Dados**
+• Valores nulos ou não numéricos em {eixo_y}: {nulos} ({perc_nulos:.1f}%)  
+• Arquivo analisado por agregação, sem carregar todas as linhas; outliers e correlações não foram calculados.
+"""
+
+    return texto
+
+
+def analisar_motor(motor, eixo_x, eixo_y, datas=()):
+    """
+    analisar_agregados com KPIs, Pareto e tendência pedidos a um motor de
+    consulta (ex.: o incremental de uma base com anexos).
+    """
+    col_data = eixo_x if eixo_x in datas else (datas[0] if datas else None)
+    tendencia = None
+    if col_data is not None and motor.cobre(col_data, eixo_y):
+        tendencia = motor.tendencia_mensal(col_data, eixo_y)
+    return analisar_agregados(motor.kpis(eixo_y), motor.pareto(eixo_x, eixo_y), tendencia, eixo_x, eixo_y)
@@ -0,0 +1,459 @@
+"""
+API HTTP local do pipeline de análise, sem Streamlit.
+
+Para integrações (ex.: o ERP): a planilha vai no corpo da requisição e a
+resposta traz a ingestão, os tipos, KPIs + diagnóstico ou o PDF. Só usa
+a biblioteca padrão (http.server). O trabalho roda num pool de processos
+que sobe aquecido (pandas, matplotlib, fpdf e fontes já carregados) e é
+reaproveitado por todas as requisições. Há um limite de requisições em
+execução + na fila; acima dele a resposta é 503 com Retry-After.
+
+Uso:
+    python api.py --porta 8765 --workers 2
+    curl --data-binary @vendas.csv "http://127.0.0.1:8765/analise?nome=vendas.csv"
+    curl --data-binary @vendas.xlsx -o rel.pdf "http://127.0.0.1:8765/relatorio?nome=vendas.xlsx"
+
+Rotas:
+    GET  /saude       estado do serviço (workers, em execução, na fila)
+    POST /ingestao    linhas, colunas, estratégia de carga e primeiras linhas
+    POST /tipos       colunas de data, numéricas e categóricas
+    POST /analise     KPIs e diagnóstico (analisar_com_ia); "estimado": true
+                      quando o arquivo foi lido por amostra
+    POST /relatorio   relatório PDF (gerar_pdf_pro)
+
+Parâmetros (query string): nome (obrigatório, .csv ou .xlsx), modo
+(seguro | inteligente), eixo_x, eixo_y, usuario, top_n e ia=0 (PDF sem
+parecer). Com PLATERO_API_TOKEN definido, exige "Authorization: Bearer".
+"""
+import argparse
+import hmac
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as TempoEsgotado
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+PORTA = int(os.environ.get("PLATERO_API_PORTA", "8765"))
+LIMITE_CORPO = int(os.environ.get("PLATERO_API_LIMITE_MB", "200")) * 1024 * 1024
+TEMPO_MAXIMO_S = float(os.environ.get("PLATERO_API_TEMPO_MAXIMO_S", "300"))
+MAX_FILA = int(os.environ.get("PLATERO_API_FILA", "8"))   # além das que estão executando
+ORCAMENTO_WORKER = int(os.environ.get("PLATERO_API_ORCAMENTO_MB", "1024")) * 1024 * 1024
+BLOCO_CORPO = 1024 * 1024
+LINHAS_AMOSTRA = 20
+ROTAS = ("/ingestao", "/tipos", "/analise", "/relatorio")
+
+
+class ErroEntrada(ValueError):
+    """Problema no arquivo ou nos parâmetros enviados (HTTP 422)."""
+
+
+class Ocupado(RuntimeError):
+    """Execução e fila cheias (HTTP 503)."""
+
+# ============================================================
+# NO WORKER (processo do pool)
+# ============================================================
+
+def _aquecer():
+    """Inicializador dos workers: bibliotecas e fontes carregadas antes da primeira requisição."""
+    try:
+        import graficos  # noqa: F401  (pandas, matplotlib com Agg, seaborn)
+        import pdf_engine_cloud  # noqa: F401
+        from fontes_pdf import pre_carregar_fontes
+        pre_carregar_fontes()
+    except Exception as e:  # sem fontes o PDF ainda sai, com a fonte padrão
+        logger.warning("Aquecimento do worker incompleto: %s", e)
+
+
+def _pronto():
+    return os.getpid()
+
+
+def _carregar(caminho, modo):
+    from ingestao import carregar_com_plano, planejar_carga
+
+    with open(caminho, "rb") as arquivo:
+        plano = planejar_carga(arquivo, ORCAMENTO_WORKER)
+        arquivo.seek(0)
+        df, erro = carregar_com_plano(arquivo, plano, modo)
+    if erro:
+        raise ErroEntrada(f"Não foi possível ler o arquivo: {erro}")
+    if df is None or df.empty:
+        raise ErroEntrada("O arquivo parece vazio.")
+    return df, plano
+
+
+def _eixos(df, tipos, opcoes):
+    from utils import escolher_coluna_kpi, escolher_eixo_x
+
+    if not tipos["numericas"]:
+        raise ErroEntrada("Não encontramos colunas numéricas (Vendas, Valor, etc).")
+    eixo_y = opcoes.get("eixo_y") or escolher_coluna_kpi(tipos["numericas"])
+    eixo_x = opcoes.get("eixo_x") or escolher_eixo_x(df, tipos["datas"])
+    if eixo_y not in tipos["numericas"]:
+        raise ErroEntrada(f"eixo_y deve ser uma coluna numérica: {tipos['numericas']}")
+    if eixo_x not in df.columns:
+        raise ErroEntrada(f"eixo_x não existe no arquivo: {eixo_x}")
+    return eixo_x, eixo_y
+
+
+def processar(operacao, caminho, opcoes):
+    """Executa uma rota sobre o arquivo em `caminho`. Dict (JSON) ou bytes (PDF)."""
+    from utils import detectar_tipos
+
+    df, plano = _carregar(caminho, opcoes.get("modo", "seguro"))
+    carga = {"linhas": int(len(df)), "estrategia": plano["estrategia"], "fracao": plano["fracao"]}
+    if operacao == "/ingestao":
+        amostra = df.head(LINHAS_AMOSTRA).to_json(orient="records", date_format="iso", force_ascii=False)
+        return {**carga, "colunas": [str(c) for c in df.columns], "amostra": json.loads(amostra)}
+
+    tipos = detectar_tipos(df)
+    if operacao == "/tipos":
+        return {**carga, "tipos": {chave: [str(c) for c in cols] for chave, cols in tipos.items()}}
+
+    from ai_analyst import analisar_com_ia
+    from calendario import Calendario
+    from motor_consulta import motor_para
+
+    eixo_x, eixo_y = _eixos(df, tipos, opcoes)
+    calendario = Calendario(df)
+    if operacao == "/analise":
+        kpis = motor_para(df=df, motor="pandas").kpis(eixo_y)
+        amostral = plano["fracao"] < 1
+        if amostral:
+            # Amostra uniforme (como no PDF): total e contagens escalam pelo
+            # inverso da fração; média e desvio já estimam os da base;
+            # mínimo, máximo e o diagnóstico são da amostra
+            fracao = plano["fracao"]
+            kpis = {
+                **kpis,
+                "total": kpis["total"] / fracao,
+                "contagem": round(kpis["contagem"] / fracao),
+                "registros": round(kpis["registros"] / fracao),
+                "registros_na_amostra": kpis["registros"],
+            }
+        return {
+            **carga,
+            "eixo_x": str(eixo_x),
+            "eixo_y": str(eixo_y),
+            "estimado": amostral,
+            "kpis": kpis,
+            "diagnostico": analisar_com_ia(df, eixo_x, eixo_y, calendario=calendario),
+        }
+
+    from graficos import agrupar_por_categoria, fechar_figuras, gerar_figuras
+    from pdf_engine_cloud import gerar_pdf_pro
+
+    top_n = opcoes.get("top_n", 10)
+    figs = []
+    try:
+        df_temp, df_grouped = agrupar_por_categoria(df, eixo_x, eixo_y, top_n)
+        figs, _ = gerar_figuras(df_temp, df_grouped, tipos["datas"], eixo_x, eixo_y, top_n, calendario)
+        texto_ia = analisar_com_ia(df, eixo_x, eixo_y, calendario=calendario) if opcoes.get("ia", True) else ""
+        return gerar_pdf_pro(
+            df_original=df,
+            df_limpo=df,
+            datas=tipos["datas"],
+            numericas=tipos["numericas"],
+            categoricas=tipos["categoricas"],
+            figs_principais=figs,
+            texto_ia=texto_ia,
+            usuario=opcoes.get("usuario", "Cliente"),
+            coluna_alvo=eixo_y,
+            fracao_amostra=plano["fracao"]
+        )
+    finally:
+        fechar_figuras(figs)
+
+# ============================================================
+# POOL DE WORKERS COM FILA LIMITADA
+# ============================================================
+
+class Servico:
+    """
+    Pool de processos aquecidos + admissão: até `workers` requisições
+    executando e `max_fila` esperando; além disso, Ocupado.
+    """
+
+    def __init__(self, workers=None, max_fila=MAX_FILA, tempo_maximo=TEMPO_MAXIMO_S):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_fila = max_fila
+        self.tempo_maximo = tempo_maximo
+        self._vagas = threading.BoundedSemaphore(self.workers + max_fila)
+        self._lock = threading.Lock()
+        self._admitidas = 0
+        self._atendidas = 0
+        self._pool = self._novo_pool()
+
+    def _novo_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_aquecer)
+        # Sobe (e aquece) os workers já, antes da primeira requisição
+        for futuro in [pool.submit(_pronto) for _ in range(self.workers)]:
+            futuro.result()
+        return pool
+
+    def estado(self):
+        with self._lock:
+            admitidas = self._admitidas
+            atendidas = self._atendidas
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "em_execucao": min(admitidas, self.workers),
+            "na_fila": max(0, admitidas - self.workers),
+            "max_fila": self.max_fila,
+            "atendidas": atendidas,
+        }
+
+    def executar(self, func, *args, ao_concluir=None):
+        """
+        Roda `func(*args)` num worker e devolve o resultado (exceções do
+        worker propagam). `ao_concluir()` é chamado uma vez quando o worker
+        deixa de precisar dos argumentos: ao terminar (mesmo depois de uma
+        resposta por tempo esgotado), ao ser cancelado ou se não foi admitido.
+        """
+        if not self._vagas.acquire(blocking=False):
+            if ao_concluir:
+                ao_concluir()
+            raise Ocupado("Servidor ocupado. Tente novamente em instantes.")
+        with self._lock:
+            self._admitidas += 1
+        pool = self._pool
+        try:
+            futuro = pool.submit(func, *args)
+        except BaseException:
+            self._liberar()
+            if ao_concluir:
+                ao_concluir()
+            raise
+        # A vaga só volta quando o worker termina, mesmo se a resposta já
+        # saiu por tempo esgotado
+        futuro.add_done_callback(self._liberar)
+        if ao_concluir:
+            futuro.add_done_callback(lambda _: ao_concluir())
+        try:
+            return futuro.result(timeout=self.tempo_maximo)
+        except TempoEsgotado:
+            # Ainda na fila: não chega a rodar (libera vaga e argumentos já)
+            futuro.cancel()
+            raise
+        except BrokenProcessPool:
+            # Worker morreu (ex.: falta de memória): pool novo para as próximas
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = self._novo_pool()
+                    pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def _liberar(self, futuro=None):
+        with self._lock:
+            self._admitidas -= 1
+            self._atendidas += 1
+        self._vagas.release()
+
+    def fechar(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+# ============================================================
+# HTTP
+# ============================================================
+
+def _para_json(valor):
+    """NaN/infinito viram null; escalares numpy viram números Python."""
+    if isinstance(valor, dict):
+        return {str(k): _para_json(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_para_json(v) for v in valor]
+    if hasattr(valor, "item") and not isinstance(valor, (str, bytes)):
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def _remover_spool(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def _opcoes(consulta):
+    campos = {chave: valores[-1] for chave, valores in parse_qs(consulta).items()}
+    nome = campos.get("nome", "")
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao not in (".csv", ".xlsx"):
+        raise ErroEntrada("Informe ?nome= com a extensão do arquivo (.csv ou .xlsx).")
+    modo = campos.get("modo", "seguro")
+    if modo not in ("seguro", "inteligente"):
+        raise ErroEntrada("modo deve ser 'seguro' ou 'inteligente'.")
+    try:
+        top_n = int(campos.get("top_n", 10))
+    except ValueError:
+        raise ErroEntrada("top_n deve ser um inteiro.")
+    return extensao, {
+        "modo": modo,
+        "eixo_x": campos.get("eixo_x"),
+        "eixo_y": campos.get("eixo_y"),
+        "usuario": campos.get("usuario", "Cliente"),
+        "top_n": top_n,
+        "ia": campos.get("ia", "1") != "0",
+    }
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    # HTTP/1.1: a conexão fica aberta entre requisições (keep-alive)
+    protocol_version = "HTTP/1.1"
+    server_version = "PlateroAPI/1.0"
+
+    def log_message(self, formato, *args):
+        logger.info("%s - %s", self.address_string(), formato % args)
+
+    def _responder(self, status, corpo, tipo="application/json; charset=utf-8", cabecalhos=None):
+        if not isinstance(corpo, bytes):
+            corpo = json.dumps(_para_json(corpo), ensure_ascii=False, allow_nan=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _erro(self, status, mensagem, cabecalhos=None):
+        self._responder(status, {"erro": mensagem}, cabecalhos=cabecalhos)
+
+    def _autorizado(self):
+        token = self.server.token
+        if not token:
+            return True
+        enviado = self.headers.get("Authorization", "")
+        return hmac.compare_digest(enviado.encode(), f"Bearer {token}".encode())
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/saude":
+            return self._erro(404, "Rota inexistente.")
+        self._responder(200, self.server.servico.estado())
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        tamanho = self.headers.get("Content-Length")
+        if tamanho is None:
+            # Sem tamanho não dá para descartar o corpo e manter a conexão
+            self.close_connection = True
+            return self._erro(411, "Envie o arquivo com Content-Length.")
+        try:
+            tamanho = int(tamanho)
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0:
+            self.close_connection = True
+            return self._erro(400, "Content-Length inválido.")
+
+        if not self._autorizado():
+            status, mensagem = 401, "Token inválido."
+        elif url.path not in ROTAS:
+            status, mensagem = 404, "Rota inexistente."
+        elif tamanho > self.server.limite_corpo:
+            status, mensagem = 413, f"Arquivo acima de {self.server.limite_corpo // 1024 // 1024} MB."
+        else:
+            status, mensagem = None, None
+        if status is not None:
+            self.close_connection = True
+            return self._erro(status, mensagem)
+
+        caminho = None
+        try:
+            extensao, opcoes = _opcoes(url.query)
+            caminho = self._receber(tamanho, extensao)
+            # O arquivo recebido só é apagado quando o worker não o lê mais
+            # (após um 504 ele pode continuar processando)
+            resultado = self.server.servico.executar(
+                processar, url.path, caminho, opcoes, ao_concluir=lambda: _remover_spool(caminho)
+            )
+        except ErroEntrada as e:
+            if caminho is None:
+                self.close_connection = True  # corpo não lido
+            return self._erro(422, str(e))
+        except Ocupado as e:
+            return self._erro(503, str(e), {"Retry-After": "5"})
+        except TempoEsgotado:
+            return self._erro(504, "Processamento excedeu o tempo máximo.")
+        except BrokenProcessPool:
+            return self._erro(503, "Worker reiniciado; tente novamente.", {"Retry-After": "1"})
+        except Exception as e:
+            logger.exception("Falha em %s", url.path)
+            return self._erro(500, f"Erro interno: {e}")
+
+        if isinstance(resultado, bytes):
+            return self._responder(200, resultado, "application/pdf",
+                                   {"Content-Disposition": 'attachment; filename="Relatorio_Platero_Pro.pdf"'})
+        self._responder(200, resultado)
+
+    def _receber(self, tamanho, extensao):
+        """Grava o corpo em disco em blocos (o servidor não segura o arquivo em memória)."""
+        from ingestao import DIR_SPOOL, PREFIXO_SPOOL
+
+        fd, caminho = tempfile.mkstemp(prefix=PREFIXO_SPOOL, suffix=extensao, dir=DIR_SPOOL)
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                restante = tamanho
+                while restante:
+                    bloco = self.rfile.read(min(BLOCO_CORPO, restante))
+                    if not bloco:
+                        raise ErroEntrada("Corpo da requisição incompleto.")
+                    destino.write(bloco)
+                    restante -= len(bloco)
+        except BaseException:
+            os.remove(caminho)
+            self.close_connection = True
+            raise
+        return caminho
+
+
+def criar_servidor(host="127.0.0.1", porta=PORTA, workers=None, max_fila=MAX_FILA,
+                   tempo_maximo=TEMPO_MAXIMO_S, limite_corpo=LIMITE_CORPO, token=None):
+    """Servidor pronto para serve_forever(); porta 0 escolhe uma livre (server_address)."""
+    # O pool (fork) sobe antes das threads do servidor
+    servico = Servico(workers, max_fila, tempo_maximo)
+    servidor = ThreadingHTTPServer((host, porta), Manipulador)
+    servidor.daemon_threads = True
+    servidor.servico = servico
+    servidor.limite_corpo = limite_corpo
+    servidor.token = token if token is not None else os.environ.get("PLATERO_API_TOKEN")
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local do pipeline de análise.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface (padrão: só a máquina local)")
+    parser.add_argument("--porta", type=int, default=PORTA)
+    parser.add_argument("--workers", type=int, default=None, help="Processos no pool (padrão: nº de CPUs)")
+    parser.add_argument("--fila", type=int, default=MAX_FILA, help="Requisições aguardando além das em execução")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    servidor = criar_servidor(args.host, args.porta, args.workers, args.fila)
+    print(f"API em http://{args.host}:{servidor.server_address[1]} "
+          f"({servidor.servico.workers} workers, fila {args.fila})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servidor.servico.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
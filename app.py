@@ -1,50 +1,26 @@
 import streamlit as st
 import pandas as pd
 import io
-import re
+import os
+import uuid
+from datetime import datetime
 
 # Importações locais (Mantenha seus arquivos auxiliares na mesma pasta)
-from cleaner import carregar_e_limpar_inteligente
-from utils import detectar_tipos
-from layout import render_layout
-from pdf_engine_cloud import gerar_pdf_pro
-from ai_analyst import analisar_com_ia
-from database import init_db, salvar_registro, carregar_historico
-
-# ============================================================
-# FUNÇÃO: LIMPEZA FORÇADA DE NÚMEROS
-# ============================================================
-def limpar_coluna_numerica(serie):
-    """
-    Converte qualquer bagunça (R$, texto, erro de ponto/vírgula) em número real.
-    """
-    if pd.api.types.is_numeric_dtype(serie):
-        return serie
-
-    serie_clean = serie.astype(str).str.strip()
-    serie_clean = serie_clean.str.replace(r'[R$\s]', '', regex=True)
-
-    def converter_valor(val):
-        if not val or val.lower() in ['nan', 'none', '', 'null']:
-            return None
-        
-        # Deixa apenas números, ponto, vírgula e sinal negativo
-        val_clean = re.sub(r'[^\d.,-]', '', val)
-        
-        try:
-            # Lógica Híbrida (Brasil vs EUA)
-            if ',' in val_clean and '.' in val_clean:
-                # 1.234,56 -> Tira ponto, troca vírgula por ponto
-                val_clean = val_clean.replace('.', '').replace(',', '.')
-            elif ',' in val_clean:
-                # 1234,56 -> Troca vírgula por ponto
-                val_clean = val_clean.replace(',', '.')
-            
-            return float(val_clean)
-        except:
-            return None
-
-    return serie_clean.apply(converter_valor)
+# Núcleo sem Streamlit: leve, importado já na primeira pintura da tela.
+# Gráficos (matplotlib/seaborn), PDF (fpdf) e análise são importados só
+# no ponto de uso, para a tela de login/upload abrir sem esse custo.
+from ingestao import (planejar_carga, carregar_com_plano, descrever_plano, para_disco, limpar_temporarios, MEMORIA,
+                      ORCAMENTO_SESSAO, carregar_varios, descrever_consolidacao, anexar, EstadoIncremental)
+from utils import detectar_tipos, escolher_coluna_kpi, escolher_eixo_x
+from database import (init_db, salvar_registro, pagina_historico, comparar_uploads, tendencia_mensal, hash_do_upload,
+                      metricas_banco)
+from tarefas import executor_global, FilaCheia, CONCLUIDA, ERRO
+from dataset_store import store_global, chave_conteudo
+from exploracao import Exploracao, LINHAS_EXPLORACAO
+from calendario import Calendario, NIVEIS
+from exportacao import FORMATOS, PREFIXO_EXPORTACAO, exportar, formatos_disponiveis, ranking_completo, remover_exportacao
+import cache_dados
+from instrumentacao import etapa, instrumentado, definir_contexto, coletor_global
 
 # ============================================================
 # FUNÇÃO: GERAR MODELO PADRÃO
@@ -70,6 +46,14 @@ try:
 except:
     pass 
 
+@st.cache_resource
+def _limpar_uploads_orfaos():
+    # Uma vez por processo: temporários de upload e de exportação deixados
+    # por processos que caíram
+    return limpar_temporarios() + limpar_temporarios(prefixo=PREFIXO_EXPORTACAO)
+
+_limpar_uploads_orfaos()
+
 st.markdown("""
 <style>
     .metric-card {background-color: #f0f2f6; padding: 20px; border-radius: 10px; text-align: center;}
@@ -111,6 +95,18 @@ if not check_password():
 
 usuario_atual = st.session_state.get("username", "Cliente")
 
+# Empresa do usuário (opcional): [empresas] nos secrets, usuario = "Empresa"
+try:
+    empresa_atual = st.secrets.get("empresas", {}).get(usuario_atual)
+except Exception:
+    empresa_atual = None
+
+# Administradores (opcional): admins = ["usuario", ...] nos secrets
+try:
+    usuario_admin = usuario_atual in st.secrets.get("admins", [])
+except Exception:
+    usuario_admin = False
+
 # ============================================================
 # CABEÇALHO
 # ============================================================
@@ -138,21 +134,155 @@ with st.sidebar:
     
     st.markdown("---")
     
-    arquivo = st.file_uploader("Carregar Base de Dados", type=["xlsx", "csv"], key="uploader_principal")
+    arquivos = st.file_uploader("Carregar Base de Dados", type=["xlsx", "csv"], key="uploader_principal",
+                                accept_multiple_files=True,
+                                help="Envie vários arquivos (ex.: um por loja ou mês) para consolidá-los numa base só.")
+    assinatura_upload = "|".join(f"{a.name}-{a.size}" for a in arquivos) if arquivos else None
     
     usar_modo_seguro = st.checkbox("🛠️ Modo Seguro (Limpeza Forçada)", 
                                   value=True,
                                   help="Ative para corrigir erros de leitura e números.",
                                   key="chk_modo_seguro")
 
+    modo_incremental = st.checkbox("➕ Anexar novos uploads à base atual",
+                                   key="chk_incremental",
+                                   help="Para o acumulado enviado todo mês: só as linhas que ainda não estão "
+                                        "na base são limpas e somadas aos totais e gráficos.")
+
+    modo_exploracao = st.checkbox("🔎 Exploração rápida em bases grandes",
+                                  value=True,
+                                  key="chk_exploracao",
+                                  help=f"Acima de {LINHAS_EXPLORACAO:,} linhas, os gráficos usam uma amostra "
+                                       "estratificada (valores aproximados). KPIs e PDF seguem exatos.")
+
     st.markdown("---")
     if st.checkbox("Ver Histórico", key="chk_historico"):
+        periodo = st.date_input("Período", value=(), key="hist_periodo")
+        inicio = periodo[0] if len(periodo) > 0 else None
+        fim = periodo[1] if len(periodo) > 1 else inicio
+
+        # Pilha de cursores: cada página guarda onde a anterior terminou
+        filtro = (inicio, fim)
+        if st.session_state.get("hist_filtro") != filtro:
+            st.session_state["hist_filtro"] = filtro
+            st.session_state["hist_cursores"] = [None]
+        cursores = st.session_state["hist_cursores"]
+
         try:
-            st.dataframe(carregar_historico(usuario_atual))
-        except:
+            df_hist, proximo = pagina_historico(usuario_atual, cursor=cursores[-1], inicio=inicio, fim=fim)
+            st.dataframe(df_hist)
+
+            col_ant, col_prox = st.columns(2)
+            if col_ant.button("◀ Recentes", key="hist_anterior", disabled=len(cursores) == 1):
+                cursores.pop()
+                st.rerun()
+            if col_prox.button("Antigos ▶", key="hist_proxima", disabled=proximo is None):
+                cursores.append(proximo)
+                st.rerun()
+
+            # Reabre o dataset limpo do cache colunar, sem a planilha original
+            if not df_hist.empty:
+                id_reabrir = st.selectbox(
+                    "Reabrir upload",
+                    list(df_hist.index),
+                    format_func=lambda i: f"{df_hist.at[i, 'data_upload']} — {df_hist.at[i, 'nome_arquivo']}",
+                    key="hist_reabrir"
+                )
+                if st.button("📂 Reabrir", key="btn_reabrir"):
+                    chave = hash_do_upload(id_reabrir, usuario_atual)
+                    if chave and cache_dados.existe(chave):
+                        st.session_state["dataset_reaberto"] = {
+                            "chave": chave,
+                            "nome": df_hist.at[id_reabrir, "nome_arquivo"],
+                            "upload_na_hora": assinatura_upload,
+                        }
+                        st.rerun()
+                    else:
+                        st.warning("Este upload não está mais em cache. Envie a planilha novamente.")
+
+            # Comparação vem dos perfis gravados: nenhuma planilha é reaberta
+            if len(cursores) == 1 and len(df_hist) >= 2:
+                st.caption(f"Comparação: {df_hist['nome_arquivo'].iloc[0]} × {df_hist['nome_arquivo'].iloc[1]}")
+                st.dataframe(comparar_uploads(df_hist.index[0], df_hist.index[1]))
+
+            # Tendência lida só dos rollups mensais
+            escopo = "Usuário"
+            if empresa_atual:
+                escopo = st.radio("Tendência por", ["Usuário", "Empresa"], horizontal=True, key="hist_escopo")
+            if escopo == "Empresa":
+                tendencia = tendencia_mensal(empresa=empresa_atual)
+            else:
+                tendencia = tendencia_mensal(usuario=usuario_atual)
+            if not tendencia.empty:
+                st.caption("Faturamento mensal")
+                st.line_chart(tendencia["faturamento_total"])
+                st.caption("Ticket médio mensal")
+                st.line_chart(tendencia["ticket_medio"])
+        except Exception:
             st.info("Histórico indisponível.")
 
-if not arquivo:
+    # Painel oculto: só aparece para os administradores dos secrets
+    if usuario_admin:
+        st.markdown("---")
+        with st.expander("🩺 Diagnóstico", expanded=False):
+            coletor = coletor_global()
+            percentis = coletor.percentis()
+            if percentis:
+                st.caption("Tempo por etapa (últimas execuções)")
+                st.dataframe(pd.DataFrame({
+                    nome: {
+                        "execuções": medidas["parede_ms"]["n"],
+                        "p50 (ms)": medidas["parede_ms"]["p50"],
+                        "p95 (ms)": medidas["parede_ms"]["p95"],
+                        "CPU p95 (ms)": medidas["cpu_ms"]["p95"],
+                        "pico p95 (+MB)": medidas["aumento_pico_mb"]["p95"],
+                    }
+                    for nome, medidas in percentis.items()
+                }).T)
+            lentos = coletor.mais_lentos(10)
+            if lentos:
+                st.caption("Uploads mais lentos")
+                st.dataframe(pd.DataFrame(lentos).set_index("requisicao"))
+            st.caption("Armazém de datasets e banco")
+            st.json({"datasets": store_global().metricas(), "banco": metricas_banco()}, expanded=False)
+
+# Uploads grandes vão para um temporário em disco lido por mmap; o
+# temporário vive enquanto o upload estiver na tela e é apagado ao trocar
+# de arquivo (ou quando a sessão é coletada).
+arquivos = list(arquivos or [])
+em_disco = st.session_state.setdefault("uploads_em_disco", {})
+assinaturas = [f"{a.name}-{a.size}" for a in arquivos]
+for assinatura in set(em_disco) - set(assinaturas):
+    em_disco.pop(assinatura).close()
+for i, assinatura in enumerate(assinaturas):
+    if assinatura not in em_disco:
+        spool = para_disco(arquivos[i])
+        if spool is arquivos[i]:
+            continue
+        em_disco[assinatura] = spool
+    arquivos[i] = em_disco[assinatura]
+arquivo = arquivos[0] if len(arquivos) == 1 else None
+
+# Um novo upload substitui o dataset reaberto do histórico
+reaberto = st.session_state.get("dataset_reaberto")
+if reaberto and reaberto["upload_na_hora"] != assinatura_upload:
+    st.session_state.pop("dataset_reaberto")
+    reaberto = None
+
+# Modo incremental: a base é o dataset na tela quando o modo foi ligado;
+# cada upload novo é anexado ao resultado do anexo anterior.
+incremental = st.session_state.get("incremental")
+if not modo_incremental:
+    st.session_state.pop("incremental", None)
+    incremental = None
+elif incremental is None and st.session_state.get("chave_dataset"):
+    incremental = st.session_state["incremental"] = {
+        "upload": assinatura_upload,
+        "resultado": st.session_state["chave_dataset"],
+        "nome": st.session_state.get("nome_dataset"),
+    }
+
+if not arquivos and not reaberto and not incremental:
     st.info("👋 Bem-vindo! Se tiver problemas, use a **Planilha Modelo**.")
     st.stop()
 
@@ -163,45 +293,159 @@ if not arquivo:
 df = pd.DataFrame()
 erro = None
 
-with st.spinner("🔄 Processando arquivo..."):
-    if usar_modo_seguro:
-        try:
-            # --- BLOCAGEM DE CODIFICAÇÃO (CORREÇÃO DO ERRO) ---
-            if arquivo.name.endswith('.csv'):
-                try:
-                    # Tentativa 1: Padrão UTF-8 (Mundial)
-                    df = pd.read_csv(arquivo, sep=None, engine='python', dtype=str)
-                except UnicodeDecodeError:
-                    # Tentativa 2: Latin-1 (Excel Brasil - corrige o erro do 'ç')
-                    arquivo.seek(0)
-                    df = pd.read_csv(arquivo, sep=None, engine='python', dtype=str, encoding='latin-1')
-                except Exception:
-                    # Tentativa 3: Força separador ; e Latin-1
-                    arquivo.seek(0)
-                    df = pd.read_csv(arquivo, sep=';', dtype=str, encoding='latin-1')
-            else:
-                # Excel (xlsx) não costuma ter problema de encoding
-                df = pd.read_excel(arquivo, dtype=str)
-            
-            # --- CONVERSÃO INTELIGENTE DE NÚMEROS ---
-            for col in df.columns:
-                amostra = df[col].dropna().head(10).astype(str).str.cat()
-                # Se tem números na amostra, tenta limpar
-                if any(char.isdigit() for char in amostra):
-                    col_convertida = limpar_coluna_numerica(df[col])
-                    # Se converteu bem, salva
-                    if col_convertida.notna().sum() > (len(df) * 0.5):
-                        df[col] = col_convertida
-
-        except Exception as e:
-            erro = f"Erro grave no modo seguro: {e}"
+# Uploads idênticos (mesmo conteúdo e modo) são lidos uma vez por processo
+# e compartilhados entre sessões pelo armazém de datasets; o dataset limpo
+# também fica no cache colunar em disco para reaberturas posteriores.
+id_sessao = st.session_state.setdefault("id_sessao", uuid.uuid4().hex)
+modo = "seguro" if usar_modo_seguro else "inteligente"
+plano = None
+fracoes_amostra = None
+anexo_pendente = None
+if incremental and (not arquivos or assinatura_upload == incremental["upload"]):
+    chave_dataset, nome_arquivo = incremental["resultado"], incremental["nome"]
+elif reaberto:
+    chave_dataset, nome_arquivo = reaberto["chave"], reaberto["nome"]
+else:
+    # A estratégia (memória, lotes ou amostra) depende da estimativa de
+    # memória do arquivo e do orçamento da sessão; uma amostra entra na
+    # chave para não se misturar com a carga completa do mesmo arquivo.
+    # Com vários arquivos o orçamento da sessão é dividido entre eles.
+    planos, chaves = [], []
+    for item, assinatura in zip(arquivos, assinaturas):
+        chave_plano = f"plano_{assinatura}_{len(arquivos)}"
+        plano = st.session_state.get(chave_plano)
+        if plano is None:
+            plano = st.session_state[chave_plano] = planejar_carga(item, ORCAMENTO_SESSAO // len(arquivos))
+        extras = (f"amostra={plano['fracao']:.4f}",) if plano["fracao"] < 1 else ()
+        planos.append(plano)
+        chaves.append(chave_conteudo(item.getbuffer(), modo, *extras))
+    if arquivo:
+        chave_dataset, nome_arquivo = chaves[0], arquivo.name
+        fracoes_amostra = plano["fracao"]
     else:
-        df, erro = carregar_e_limpar_inteligente(arquivo)
+        # Vários arquivos: cada um tem sua chave (e cache próprio); a base
+        # consolidada é endereçada pela sequência delas. Cada arquivo pode
+        # ter sua fração de amostra (o PDF pondera pela coluna Origem_Arquivo);
+        # o aviso mostra o plano mais restritivo.
+        chave_dataset = chave_conteudo("\0".join(chaves).encode(), "consolidado")
+        nome_arquivo = f"{arquivos[0].name} + {len(arquivos) - 1} arquivo(s)"
+        fracoes_amostra = {item.name: p["fracao"] for item, p in zip(arquivos, planos)}
+        plano = max(planos, key=lambda p: (p["estrategia"] != MEMORIA, 1 - p["fracao"]))
+
+    if incremental:
+        # Anexo: endereçado pela base + conteúdo do(s) upload(s)
+        plano = fracoes_amostra = None
+        anexo_pendente = {
+            "base": incremental["resultado"],
+            "upload": assinatura_upload,
+            "resultado": chave_conteudo("\0".join([incremental["resultado"], *chaves]).encode(), "anexo"),
+            "nome": f"{incremental['nome']} + {nome_arquivo}",
+        }
+        chave_dataset, nome_arquivo = anexo_pendente["resultado"], anexo_pendente["nome"]
+
+chave_anterior = st.session_state.get("chave_dataset")
+if chave_anterior and chave_anterior != chave_dataset:
+    store_global().liberar(id_sessao, chave_anterior)
+st.session_state["chave_dataset"] = chave_dataset
+# Data estável do dataset na sessão: vai no "Gerado em" do PDF e na chave
+# do cache de relatórios, para o mesmo relatório sair do cache ao ser pedido de novo
+st.session_state.setdefault(f"carregado_em_{chave_dataset}", datetime.now().replace(second=0, microsecond=0))
+st.session_state["nome_dataset"] = nome_arquivo
+definir_contexto(requisicao=chave_dataset[:12], usuario=usuario_atual, arquivo=nome_arquivo)
+
+def carregar_anexo():
+    """Só as linhas inéditas do(s) upload(s) são limpas e somadas aos agregados da base."""
+    chave_base = anexo_pendente["base"]
+    base = store_global().obter(chave_base, dono=id_sessao)
+    tipos_base = st.session_state.get(f"tipos_{chave_base}") or cache_dados.carregar_tipos(chave_base)
+    if base is None or tipos_base is None:
+        em_cache = cache_dados.carregar(chave_base)
+        if em_cache is None:
+            return None, "A base deste anexo não está mais em cache. Reabra-a pelo histórico ou envie-a novamente."
+        base, tipos_base = em_cache[0], em_cache[1]
+
+    estado = EstadoIncremental.carregar(chave_base)
+    resumo = {"linhas_arquivo": 0, "novas": 0, "repetidas": 0}
+    partes = []
+    for item in arquivos:
+        item.seek(0)
+        novas, estado, relatorio = anexar(base, item, modo, tipos_base, estado)
+        if novas is None:
+            return None, relatorio["erro"]
+        partes.append(novas)
+        resumo = {campo: resumo[campo] + relatorio[campo] for campo in resumo}
+    novas = pd.concat(partes, ignore_index=True)
+    anexado = pd.concat([base, novas], ignore_index=True) if len(novas) else base
+
+    estado.salvar(chave_dataset)
+    st.session_state[f"tipos_{chave_dataset}"] = tipos_base
+    st.session_state[f"motor_{chave_dataset}"] = estado.motor
+    st.session_state[f"anexo_{chave_dataset}"] = resumo
+    # Cache em disco e histórico gravam só o incremento
+    st.session_state[f"incremento_{chave_dataset}"] = {
+        "base": chave_base, "novas": novas, "nome": ", ".join(item.name for item in arquivos)
+    }
+    # Totais de calendário já calculados para a base recebem só os das linhas novas
+    chave_calendario, calendario = st.session_state.get("calendario", (None, None))
+    if chave_calendario == chave_base:
+        st.session_state["calendario"] = (chave_dataset, calendario.anexar(anexado, novas))
+    return anexado, None
+
+def carregar_arquivo():
+    em_cache = cache_dados.carregar(chave_dataset)
+    if em_cache is not None:
+        return em_cache[0], None
+    if anexo_pendente:
+        return carregar_anexo()
+    if not arquivos:
+        return None, "Este upload não está mais em cache. Envie a planilha novamente."
+    if arquivo:
+        return carregar_com_plano(arquivo, plano, modo)
+
+    # Cada arquivo passa pelo armazém com a própria chave: ao acrescentar
+    # um arquivo, os que já estavam carregados não são lidos de novo.
+    chave_e_plano = {id(item): par for item, par in zip(arquivos, zip(chaves, planos))}
+    def carregar_um(item):
+        chave, plano_item = chave_e_plano[id(item)]
+        return store_global().obter_ou_carregar(chave, lambda: carregar_com_plano(item, plano_item, modo))
+
+    df_consolidado, relatorio = carregar_varios(arquivos, carregar_um)
+    st.session_state[f"consolidacao_{chave_dataset}"] = relatorio
+    if df_consolidado is None:
+        return None, "; ".join(descrever_consolidacao(relatorio))
+    return df_consolidado, None
+
+with st.spinner("🔄 Processando arquivo..."):
+    with etapa("carregamento") as medicao:
+        df, erro = store_global().obter_ou_carregar(chave_dataset, carregar_arquivo, dono=id_sessao)
+        medicao.dimensoes(df)
 
 if erro:
     st.error(f"Não foi possível ler o arquivo: {erro}")
     st.stop()
 
+if anexo_pendente:
+    incremental.update(upload=anexo_pendente["upload"], resultado=chave_dataset, nome=nome_arquivo)
+
+resumo_anexo = st.session_state.get(f"anexo_{chave_dataset}")
+if incremental and resumo_anexo:
+    st.success(f"➕ Anexo incremental: {resumo_anexo['novas']:,} linha(s) nova(s); "
+               f"{resumo_anexo['repetidas']:,} já estavam na base.")
+
+amostral = plano is not None and plano["fracao"] < 1
+if plano and plano["estrategia"] != MEMORIA:
+    (st.warning if amostral else st.info)(descrever_plano(plano))
+if amostral:
+    st.caption("Análise sobre amostra: não é registrada no histórico, e o PDF marca os valores como estimados.")
+
+relatorio_consolidacao = st.session_state.get(f"consolidacao_{chave_dataset}")
+if relatorio_consolidacao:
+    avisos = descrever_consolidacao(relatorio_consolidacao)
+    st.caption(f"Base consolidada de {len(relatorio_consolidacao['arquivos'])} arquivos (coluna Origem_Arquivo).")
+    if avisos:
+        with st.expander(f"⚠️ {len(avisos)} divergência(s) entre os arquivos"):
+            st.markdown("\n".join(f"- {aviso}" for aviso in avisos))
+
 if df.empty:
     st.warning("O arquivo parece vazio.")
     st.stop()
@@ -210,7 +454,27 @@ if df.empty:
 # DETECÇÃO DE TIPOS
 # ============================================================
 
-tipos = detectar_tipos(df)
+# Um anexo herda a tipagem da base (guardada na sessão ao carregar)
+tipos = st.session_state.get(f"tipos_{chave_dataset}") or cache_dados.carregar_tipos(chave_dataset)
+if tipos is None:
+    with etapa("tipos", df=df):
+        tipos = detectar_tipos(df)
+st.session_state[f"tipos_{chave_dataset}"] = tipos
+if not st.session_state.get(f"cache_dados_{chave_dataset}") and not cache_dados.existe(chave_dataset):
+    st.session_state[f"cache_dados_{chave_dataset}"] = True
+    meta = {"nome_arquivo": nome_arquivo, "modo": modo}
+    incremento = st.session_state.get(f"incremento_{chave_dataset}")
+
+    def gravar_cache(progresso):
+        # Anexo com a base no cache: só as linhas novas, apontando para ela
+        if incremento and cache_dados.existe(incremento["base"]):
+            return cache_dados.salvar(chave_dataset, incremento["novas"], tipos, meta, base=incremento["base"])
+        return cache_dados.salvar(chave_dataset, df, tipos, meta)
+
+    try:
+        executor_global().submeter("cache_dados", gravar_cache, dono=usuario_atual, pesada=False)
+    except FilaCheia:
+        pass
 datas, numericas = tipos["datas"], tipos["numericas"]
 categoricas = tipos["categoricas"]
 
@@ -226,24 +490,53 @@ st.subheader("📈 Visão Geral")
 
 col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
 
-col_kpi_padrao = numericas[0]
-for col in numericas:
-    if "VENDA" in col.upper() or "VALOR" in col.upper() or "TOTAL" in col.upper():
-        col_kpi_padrao = col
-        break
-
-valor_total = df[col_kpi_padrao].sum()
-media_valor = df[col_kpi_padrao].mean()
-total_linhas = len(df)
+col_kpi_padrao = escolher_coluna_kpi(numericas)
+
+# Base com anexos: KPIs, gráficos e diagnóstico saem dos agregados
+# incrementais (custo do anexo, não do histórico)
+motor_incremental = None
+if incremental:
+    motor_incremental = st.session_state.get(f"motor_{chave_dataset}")
+    if motor_incremental is None:
+        estado_incremental = EstadoIncremental.carregar(chave_dataset)
+        if estado_incremental is not None:
+            motor_incremental = st.session_state[f"motor_{chave_dataset}"] = estado_incremental.motor
+
+# Base grande: gráficos exploram uma amostra por eixo X (guardada na sessão
+# enquanto o dataset for o mesmo); KPIs abaixo continuam na base completa.
+exploracao = None
+if modo_exploracao and motor_incremental is None and len(df) > LINHAS_EXPLORACAO:
+    chave_exploracao, exploracao = st.session_state.get("exploracao", (None, None))
+    if chave_exploracao != chave_dataset:
+        exploracao = Exploracao(df)
+        st.session_state["exploracao"] = (chave_dataset, exploracao)
+else:
+    st.session_state.pop("exploracao", None)
+# Chaves de calendário e totais por período: uma vez por dataset, para a
+# linha do tempo, o PDF e a tendência/sazonalidade do Consultor Virtual
+chave_calendario, calendario = st.session_state.get("calendario", (None, None))
+if chave_calendario != chave_dataset:
+    calendario = Calendario(df)
+    st.session_state["calendario"] = (chave_dataset, calendario)
+
+ajuda_kpi = "Exato: calculado na base completa." if exploracao is not None else None
+
+if motor_incremental is not None and col_kpi_padrao in motor_incremental.estatisticas:
+    kpis = motor_incremental.kpis(col_kpi_padrao)
+    valor_total, media_valor, total_linhas = kpis["total"], kpis["media"], kpis["registros"]
+else:
+    valor_total = df[col_kpi_padrao].sum()
+    media_valor = df[col_kpi_padrao].mean()
+    total_linhas = len(df)
 
 with col_kpi1:
-    st.metric(f"Total ({col_kpi_padrao})", f"{valor_total:,.2f}")
+    st.metric(f"Total ({col_kpi_padrao})", f"{valor_total:,.2f}", help=ajuda_kpi)
 
 with col_kpi2:
-    st.metric("Média", f"{media_valor:,.2f}")
+    st.metric("Média", f"{media_valor:,.2f}", help=ajuda_kpi)
 
 with col_kpi3:
-    st.metric("Registros", f"{total_linhas}")
+    st.metric("Registros", f"{total_linhas}", help=ajuda_kpi)
 
 st.markdown("---")
 
@@ -256,24 +549,92 @@ col_grafico, col_config = st.columns([3, 1])
 with col_config:
     st.markdown("### ⚙️ Ajuste Fino")
 
-    index_padrao = 0
-    if datas: index_padrao = list(df.columns).index(datas[0])
-    elif "ANO" in df.columns: index_padrao = list(df.columns).index("ANO")
-    elif "CATEGORIA" in df.columns: index_padrao = list(df.columns).index("CATEGORIA")
+    index_padrao = list(df.columns).index(escolher_eixo_x(df, datas))
 
     eixo_x_view = st.selectbox("Eixo X (Agrupamento):", list(df.columns), index=index_padrao, key="sel_x")
     
     idx_y = list(numericas).index(col_kpi_padrao) if col_kpi_padrao in numericas else 0
     eixo_y_view = st.selectbox("Eixo Y (Valor):", numericas, index=idx_y, key="sel_y")
 
-    chave_salvo = f"save_{arquivo.name}_{len(df)}"
-    if chave_salvo not in st.session_state:
-        try: salvar_registro(usuario_atual, arquivo.name, df, eixo_y_view)
-        except: pass
+    # Carga por amostra não entra no histórico: as somas da amostra
+    # seriam gravadas (e somadas nos rollups) como totais exatos.
+    # No modo incremental a base já está no histórico: cada anexo registra
+    # só as linhas novas, com os próprios totais (um anexo reaberto do
+    # cache já foi registrado quando foi feito)
+    chave_salvo = f"save_{nome_arquivo}_{len(df)}"
+    if arquivos and not amostral and chave_salvo not in st.session_state:
+        anexo_registro = st.session_state.pop(f"incremento_{chave_dataset}", None)
+        if anexo_registro is not None:
+            nome_registro, df_registro = f"{anexo_registro['nome']} (anexo)", anexo_registro["novas"]
+        else:
+            nome_registro, df_registro = nome_arquivo, (None if incremental else df)
+        if df_registro is not None and len(df_registro):
+            # Perfil + commit rodam no executor (tarefa leve), fora da renderização
+            def registrar(*args, progresso, **kwargs):
+                return salvar_registro(*args, **kwargs)
+            try:
+                st.session_state["tarefa_registro"] = executor_global().submeter(
+                    "registro", registrar, usuario_atual, nome_registro, df_registro, eixo_y_view,
+                    tipos=tipos, empresa=empresa_atual, hash_conteudo=chave_dataset,
+                    dono=usuario_atual, pesada=False
+                )
+            except FilaCheia:
+                st.toast("Não foi possível registrar esta análise no histórico.", icon="⚠️")
         st.session_state[chave_salvo] = True
 
+    # Falha na gravação do histórico é avisada na primeira execução após o fim da tarefa
+    id_registro = st.session_state.get("tarefa_registro")
+    tarefa_registro = executor_global().obter(id_registro) if id_registro else None
+    if tarefa_registro is None or tarefa_registro.finalizada:
+        st.session_state.pop("tarefa_registro", None)
+        if tarefa_registro is not None and not (
+            tarefa_registro.status == CONCLUIDA and executor_global().retirar_resultado(id_registro)
+        ):
+            st.toast("Não foi possível registrar esta análise no histórico.", icon="⚠️")
+
 with col_grafico:
-    df_agrupado = render_layout(df, datas, numericas, categoricas, lang="pt")
+    from layout import render_layout
+    with etapa("graficos", df=df):
+        df_agrupado = render_layout(df, datas, numericas, categoricas, lang="pt", motor=motor_incremental,
+                                    exploracao=exploracao, calendario=calendario)
+
+# ============================================================
+# TAREFAS EM SEGUNDO PLANO (IA e PDF)
+# ============================================================
+
+def iniciar_tarefa(chave_tarefa, tipo, func, *args, **kwargs):
+    """Envia a tarefa ao executor do servidor e guarda o id na sessão."""
+    st.session_state.pop(f"erro_{chave_tarefa}", None)
+    try:
+        st.session_state[chave_tarefa] = executor_global().submeter(
+            tipo, func, *args, dono=usuario_atual, **kwargs
+        )
+    except FilaCheia as e:
+        st.warning(str(e))
+
+
+@st.fragment(run_every=1.0)
+def acompanhar_tarefa(chave_tarefa, chave_resultado, rotulo):
+    """Mostra o progresso (atualizado a cada segundo) e entrega o resultado na sessão."""
+    id_tarefa = st.session_state.get(chave_tarefa)
+    tarefa = executor_global().obter(id_tarefa) if id_tarefa else None
+    if tarefa is None:
+        st.session_state.pop(chave_tarefa, None)
+        return
+
+    if not tarefa.finalizada:
+        st.progress(tarefa.progresso, text=f"{rotulo}: {tarefa.mensagem}")
+        if st.button("✖️ Cancelar", key=f"cancelar_{chave_tarefa}"):
+            executor_global().cancelar(id_tarefa)
+        return
+
+    del st.session_state[chave_tarefa]
+    if tarefa.status == CONCLUIDA:
+        # A sessão fica com o resultado (ex.: o PDF); o executor não o retém
+        st.session_state[chave_resultado] = executor_global().retirar_resultado(id_tarefa)
+    elif tarefa.status == ERRO:
+        st.session_state[f"erro_{chave_tarefa}"] = tarefa.erro
+    st.rerun()
 
 # ============================================================
 # CONSULTOR VIRTUAL
@@ -285,10 +646,22 @@ st.subheader("🤖 Consultor Virtual")
 col_ia_txt, col_ia_btn = st.columns([4, 1])
 
 with col_ia_btn:
-    if st.button("✨ Analisar com IA", type="primary", key="btn_ia"):
-        with st.spinner("Analisando padrões..."):
-            analise = analisar_com_ia(df, eixo_x_view, eixo_y_view)
-            st.session_state["analise_ia"] = analise
+    if st.button("✨ Analisar com IA", type="primary", key="btn_ia",
+                 disabled="tarefa_ia" in st.session_state):
+        if motor_incremental is not None and motor_incremental.cobre(eixo_x_view, eixo_y_view):
+            from ai_analyst import analisar_motor
+            iniciar_tarefa("tarefa_ia", "analise", instrumentado("analise_ia", analisar_motor),
+                           motor_incremental, eixo_x_view, eixo_y_view, datas)
+        else:
+            from ai_analyst import analisar_com_ia
+            iniciar_tarefa("tarefa_ia", "analise", instrumentado("analise_ia", analisar_com_ia),
+                           df, eixo_x_view, eixo_y_view, calendario=calendario)
+
+if "tarefa_ia" in st.session_state:
+    acompanhar_tarefa("tarefa_ia", "analise_ia", "Analisando padrões")
+
+if "erro_tarefa_ia" in st.session_state:
+    st.error(f"Erro na análise: {st.session_state['erro_tarefa_ia']}")
 
 if "analise_ia" in st.session_state:
     st.info(st.session_state["analise_ia"])
@@ -306,27 +679,46 @@ if "pdf_bytes" not in st.session_state:
     st.session_state["pdf_bytes"] = None
 
 with col_btn2:
-    if st.button("📄 Gerar Relatório PDF", type="primary", key="btn_pdf"):
+    if st.button("📄 Gerar Relatório PDF", type="primary", key="btn_pdf",
+                 disabled="tarefa_pdf" in st.session_state):
+        from pdf_engine_cloud import gerar_pdf_pro
+
         figs = st.session_state.get("figs_pdf", [])
+        if figs is None:
+            # A tela mostrou gráficos da amostra: o relatório refaz a mesma
+            # seleção na base completa
+            from graficos import agrupar_por_categoria, gerar_figuras
+            eixo_x_pdf, eixo_y_pdf, top_n_pdf, nivel_pdf = st.session_state["selecao_pdf"]
+            with etapa("graficos_pdf", df=df):
+                df_temp, df_grouped = agrupar_por_categoria(df, eixo_x_pdf, eixo_y_pdf, top_n_pdf)
+                figs, _ = gerar_figuras(df_temp, df_grouped, datas, eixo_x_pdf, eixo_y_pdf, top_n_pdf,
+                                        calendario, nivel_pdf)
         texto_ia = st.session_state.get("analise_ia", "")
-
-        with st.spinner("Gerando PDF..."):
-            try:
-                pdf_data = gerar_pdf_pro(
-                    df_original=df,
-                    df_limpo=df,
-                    datas=datas,
-                    numericas=numericas,
-                    categoricas=categoricas,
-                    figs_principais=figs,
-                    texto_ia=texto_ia,
-                    usuario=usuario_atual,
-                    coluna_alvo=eixo_y_view
-                )
-                st.session_state["pdf_bytes"] = bytes(pdf_data)
-                st.success("Relatório pronto! Baixe abaixo.")
-            except Exception as e:
-                st.error(f"Erro ao gerar PDF: {e}")
+        st.session_state["pdf_bytes"] = None
+
+        iniciar_tarefa(
+            "tarefa_pdf",
+            "relatorio",
+            instrumentado("pdf", gerar_pdf_pro),
+            df_original=df,
+            df_limpo=df,
+            datas=datas,
+            numericas=numericas,
+            categoricas=categoricas,
+            figs_principais=figs,
+            texto_ia=texto_ia,
+            usuario=usuario_atual,
+            coluna_alvo=eixo_y_view,
+            usar_cache=True,
+            data_geracao=st.session_state[f"carregado_em_{chave_dataset}"],
+            fracao_amostra=fracoes_amostra if amostral else None
+        )
+
+    if "tarefa_pdf" in st.session_state:
+        acompanhar_tarefa("tarefa_pdf", "pdf_bytes", "Gerando PDF")
+
+    if "erro_tarefa_pdf" in st.session_state:
+        st.error(f"Erro ao gerar PDF: {st.session_state['erro_tarefa_pdf']}")
 
     if st.session_state["pdf_bytes"] is not None:
         st.download_button(
@@ -336,4 +728,73 @@ with col_btn2:
             "application/pdf",
             type="primary",
             key="dl_pdf"
-        )
\ No newline at end of file
+        )
+
+# ============================================================
+# EXPORTAÇÃO DOS DADOS TRATADOS
+# ============================================================
+
+st.markdown("---")
+st.subheader("📥 Dados Tratados")
+
+# Exporta a base limpa ou os agregados por trás dos gráficos (completos e
+# exatos, mesmo no modo exploração). O arquivo é gravado em blocos num
+# temporário pelo executor; o download só lê o arquivo compactado.
+eixo_x_exp, eixo_y_exp, _, nivel_exp = st.session_state.get("selecao_pdf", (eixo_x_view, eixo_y_view, 10, "mes"))
+col_tempo_exp = eixo_x_exp if eixo_x_exp in datas else (datas[0] if datas else None)
+conteudos = {"dados": "Base limpa", "ranking": f"Ranking: {eixo_y_exp} por {eixo_x_exp}"}
+if col_tempo_exp is not None:
+    conteudos["evolucao"] = f"Evolução: {eixo_y_exp} por {NIVEIS[nivel_exp].lower()}"
+
+col_exp1, col_exp2, col_exp3 = st.columns([2, 1, 1])
+conteudo_exp = col_exp1.selectbox("Conteúdo:", list(conteudos), format_func=conteudos.get, key="sel_exp_conteudo")
+formato_exp = col_exp2.selectbox("Formato:", formatos_disponiveis(), format_func=lambda f: FORMATOS[f][0],
+                                 key="sel_exp_formato")
+
+with col_exp3:
+    st.write("")
+    if st.button("📦 Preparar arquivo", key="btn_exportar", disabled="tarefa_exportacao" in st.session_state):
+        anterior = st.session_state.pop("exportacao", None)
+        if anterior:
+            remover_exportacao(anterior["caminho"])
+        if conteudo_exp == "dados":
+            tabela = df
+        elif conteudo_exp == "ranking":
+            tabela = ranking_completo(df, eixo_x_exp, eixo_y_exp)
+        else:
+            tabela = calendario.serie(col_tempo_exp, eixo_y_exp, nivel_exp).reset_index()
+        st.session_state["exportacao_pedida"] = {"conteudo": conteudo_exp, "formato": formato_exp,
+                                                 "dataset": chave_dataset}
+        iniciar_tarefa("tarefa_exportacao", "exportacao", instrumentado("exportacao", exportar),
+                       tabela, formato_exp, nome_aba=conteudos[conteudo_exp].split(":")[0][:31])
+
+if "tarefa_exportacao" in st.session_state:
+    acompanhar_tarefa("tarefa_exportacao", "exportacao_caminho", "Exportando")
+
+if "erro_tarefa_exportacao" in st.session_state:
+    st.error(f"Erro na exportação: {st.session_state['erro_tarefa_exportacao']}")
+
+if "exportacao_caminho" in st.session_state:
+    st.session_state["exportacao"] = {**st.session_state.pop("exportacao_pedida", {}),
+                                      "caminho": st.session_state.pop("exportacao_caminho")}
+
+pronta = st.session_state.get("exportacao")
+if pronta and pronta.get("dataset") != chave_dataset:
+    remover_exportacao(st.session_state.pop("exportacao")["caminho"])
+elif pronta and os.path.exists(pronta["caminho"]):
+    caminho_exp = pronta["caminho"]
+
+    def ler_exportacao():
+        # Lido só no clique, direto do temporário
+        with open(caminho_exp, "rb") as f:
+            return f.read()
+
+    nome_base = os.path.splitext(nome_arquivo)[0].split(" + ")[0]
+    st.download_button(
+        f"⬇️ Baixar {conteudos.get(pronta['conteudo'], 'arquivo').split(':')[0]} "
+        f"({os.path.getsize(caminho_exp) / 1024:,.0f} KB)",
+        data=ler_exportacao,
+        file_name=f"{nome_base}_{pronta['conteudo']}.{pronta['formato']}",
+        mime=FORMATOS[pronta["formato"]][1],
+        key="dl_exportacao"
+    )
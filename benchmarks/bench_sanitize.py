@@ -0,0 +1,93 @@
+"""
+Benchmark do sanitize_text: implementação antiga (concatenação caractere a
+caractere) contra a versão com operações pré-compiladas (replace em C e regex).
+
+Uso:
+    python benchmarks/bench_sanitize.py [--kb 100] [--repeticoes 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_engine_cloud import sanitize_text  # noqa: E402
+
+
+def sanitize_text_legado(text):
+    """Cópia fiel da versão anterior, mantida apenas para comparação."""
+    if not text:
+        return ""
+    text = re.sub(r'\*\*|__|##|`', '', text)
+    text = re.sub(r'\$\$|\$', '', text)
+    replacements = {
+        "•": "-", "–": "-", "—": "-",
+        "“": '"', "”": '"', "‘": "'", "’": "'",
+        "…": "..."
+    }
+    for char, replacement in replacements.items():
+        text = text.replace(char, replacement)
+    text_safe = ""
+    for char in text:
+        if ord(char) < 256:
+            text_safe += char
+        else:
+            text_safe += " "
+    lines = text_safe.split('\n')
+    cleaned_lines = [re.sub(r'\s+', ' ', line).strip() for line in lines]
+    text = "\n".join(cleaned_lines)
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+
+TRECHOS = [
+    "📌 **Resumo Executivo Avançado**\n",
+    "• Total acumulado de **VENDAS**: 1.234.567,89  \n",
+    "• A categoria **Serviços** lidera com 45,3% do total “destacado”.\n",
+    "• Outliers pelo método Z‑Score (>3σ): **12** — revisar…\n",
+    "Coeficiente de variação (CV): 38,2% → atenção à sazonalidade.\n\n",
+]
+
+
+def gerar_texto(kb, semente=42):
+    rnd = random.Random(semente)
+    partes, tamanho = [], 0
+    while tamanho < kb * 1024:
+        trecho = rnd.choice(TRECHOS)
+        partes.append(trecho)
+        tamanho += len(trecho.encode("utf-8"))
+    return "".join(partes)
+
+
+def cronometrar(func, texto, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func(texto)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--kb", type=int, default=100)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    texto = gerar_texto(args.kb)
+    assert sanitize_text(texto) == sanitize_text_legado(texto), "Saídas divergentes"
+
+    t_legado = cronometrar(sanitize_text_legado, texto, args.repeticoes)
+    t_latin1 = cronometrar(sanitize_text, texto, args.repeticoes)
+    t_unicode = cronometrar(lambda t: sanitize_text(t, unicode=True), texto, args.repeticoes)
+
+    print(f"Entrada: {len(texto.encode('utf-8')) / 1024:.0f} KB")
+    print(f"legado           : {t_legado * 1000:8.2f} ms")
+    print(f"novo (latin-1)   : {t_latin1 * 1000:8.2f} ms  ({t_legado / t_latin1:.1f}x)")
+    print(f"novo (unicode)   : {t_unicode * 1000:8.2f} ms  ({t_legado / t_unicode:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
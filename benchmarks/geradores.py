@@ -0,0 +1,86 @@
+"""
+Geradores determinísticos de planilhas no formato brasileiro para os
+benchmarks: valores "R$ 1.234,56", datas dd/mm/aaaa, CSV em latin-1 com
+";" e xlsx com várias abas, linhas de título antes do cabeçalho e linha
+de TOTAL no fim. A mesma semente produz sempre os mesmos bytes.
+"""
+import numpy as np
+import pandas as pd
+
+LOJAS = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Curitiba", "Porto Alegre",
+         "Salvador", "Recife", "Fortaleza", "Brasília", "Goiânia", "Belém", "Manaus"]
+VENDEDORES = ["Ana", "Bruno", "Carla", "Diego", "Érica", "Fábio", "Gabriela", "Hélio"]
+CATEGORIAS = ["Eletrônicos", "Vestuário", "Alimentação", "Serviços", "Móveis", "Papelaria"]
+FRACAO_VAZIOS = 0.01
+LINHAS_LIXO = ["Relatório de Vendas — Platero Comércio Ltda.", "Gerado em 31/12/2024 às 18:00"]
+_TROCA_BR = str.maketrans(",.", ".,")
+
+
+def _moeda_br(centavos):
+    """Inteiros em centavos → "R$ 1.234,56" (vetorizado o suficiente para 10M linhas)."""
+    return [f"R$ {v / 100:,.2f}".translate(_TROCA_BR) for v in centavos.tolist()]
+
+
+def gerar_vendas(linhas, semente=42, colunas_extras=0, cardinalidade=200):
+    """
+    DataFrame só de texto, como sai de um export de ERP: DATA, LOJA,
+    CATEGORIA, PRODUTO (`cardinalidade` valores distintos), VENDEDOR,
+    QUANTIDADE, VALOR e `colunas_extras` colunas numéricas adicionais
+    (variante "larga"). Cerca de 1% dos valores vem em branco.
+    """
+    rnd = np.random.default_rng(semente)
+
+    dias = rnd.integers(0, 730, linhas)
+    datas = pd.Timestamp("2023-01-01") + pd.to_timedelta(dias, unit="D")
+    centavos = np.round(rnd.lognormal(mean=11, sigma=1.2, size=linhas)).astype(np.int64)
+
+    df = pd.DataFrame({
+        "DATA": datas.strftime("%d/%m/%Y"),
+        "LOJA": np.array(LOJAS, dtype=object)[rnd.integers(0, len(LOJAS), linhas)],
+        "CATEGORIA": np.array(CATEGORIAS, dtype=object)[rnd.integers(0, len(CATEGORIAS), linhas)],
+        "PRODUTO": pd.Series(rnd.integers(1, cardinalidade + 1, linhas)).map("SKU-{:07d}".format),
+        "VENDEDOR": np.array(VENDEDORES, dtype=object)[rnd.integers(0, len(VENDEDORES), linhas)],
+        "QUANTIDADE": rnd.integers(1, 50, linhas).astype(str),
+        "VALOR": _moeda_br(centavos),
+    }, dtype=object)
+
+    for i in range(colunas_extras):
+        extra = np.round(rnd.normal(1000, 300, linhas), 2)
+        df[f"INDICADOR_{i + 1:02d}"] = [f"{v:.2f}".replace(".", ",") for v in extra.tolist()]
+
+    vazios = rnd.random(linhas) < FRACAO_VAZIOS
+    df.loc[vazios, "VALOR"] = None
+    return df
+
+
+def salvar_csv(df, caminho, encoding="latin-1", sep=";"):
+    df.to_csv(caminho, sep=sep, index=False, encoding=encoding)
+    return caminho
+
+
+def _aba_com_lixo(df, total):
+    """Linhas de título, uma em branco, o cabeçalho, os dados e a linha de TOTAL."""
+    largura = len(df.columns)
+    lixo = [[texto] + [None] * (largura - 1) for texto in LINHAS_LIXO]
+    lixo.append([None] * largura)
+    lixo.append(list(df.columns))
+    rodape = ["TOTAL"] + [None] * (largura - 1)
+    rodape[list(df.columns).index("VALOR")] = f"R$ {total:,.2f}".translate(_TROCA_BR)
+    return pd.concat(
+        [pd.DataFrame(lixo, dtype=object), pd.DataFrame(df.to_numpy(), dtype=object),
+         pd.DataFrame([rodape], dtype=object)],
+        ignore_index=True
+    )
+
+
+def salvar_xlsx(df, caminho, abas=3):
+    """Divide as linhas em `abas` abas (uma por trimestre fictício), cada uma com título e TOTAL."""
+    with pd.ExcelWriter(caminho, engine="openpyxl") as writer:
+        for i, parte in enumerate(np.array_split(np.arange(len(df)), abas)):
+            fatia = df.iloc[parte]
+            total = pd.to_numeric(
+                fatia["VALOR"].str.replace(r"[R$\s.]", "", regex=True).str.replace(",", "."),
+                errors="coerce"
+            ).sum()
+            _aba_com_lixo(fatia, total).to_excel(writer, sheet_name=f"Trimestre {i + 1}", header=False, index=False)
+    return caminho
@@ -0,0 +1,293 @@
+"""
+Suíte de benchmarks de ponta a ponta: tempo e pico de memória de cada
+etapa do pipeline (limpeza, carga, tipagem, agregação, IA e PDF) sobre
+planilhas sintéticas no formato brasileiro, com baseline em JSON e
+alerta de regressão.
+
+Uso:
+    python benchmarks/suite.py                         # 10k e 100k, variante padrão
+    python benchmarks/suite.py --tamanhos 10k,1M,10M --variantes padrao,larga,alta_cardinalidade
+    python benchmarks/suite.py --salvar-baseline       # grava benchmarks/baseline.json
+    python benchmarks/suite.py --limite 0.25           # compara com a baseline (padrão: 20%)
+
+Sai com código 1 quando alguma etapa regride além do limite.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from benchmarks.geradores import gerar_vendas, salvar_csv, salvar_xlsx  # noqa: E402
+from cleaner import carregar_e_limpar_inteligente, carregar_modo_seguro, limpar_coluna_numerica  # noqa: E402
+from utils import detectar_tipos, escolher_coluna_kpi, escolher_eixo_x  # noqa: E402
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(PASTA, "baseline.json")
+LIMITE_REGRESSAO = 0.20
+MINIMO_S = 0.005     # diferenças abaixo disso são ruído de medição
+MINIMO_MB = 1.0
+LIMITE_XLSX = 200_000  # acima disso a etapa inteligente lê o CSV (openpyxl levaria minutos)
+
+VARIANTES = {
+    "padrao": {},
+    "larga": {"colunas_extras": 40},
+    "alta_cardinalidade": {"cardinalidade": 10_000_000},
+}
+
+# ============================================================
+# ETAPAS
+# ============================================================
+
+def _carregar(carregador, caminho):
+    with open(caminho, "rb") as arquivo:
+        df, erro = carregador(arquivo)
+    if erro:
+        raise RuntimeError(erro)
+    return df
+
+
+def _tipar(ctx):
+    tipos = detectar_tipos(ctx["df"])
+    ctx["tipos"] = tipos
+    ctx["eixo_y"] = escolher_coluna_kpi(tipos["numericas"])
+    ctx["eixo_x"] = escolher_eixo_x(ctx["df"], tipos["datas"])
+    return tipos
+
+
+def _agrupar(ctx):
+    from graficos import agrupar_por_categoria
+    ctx["df_temp"], ctx["df_grouped"] = agrupar_por_categoria(ctx["df"], ctx["eixo_x"], ctx["eixo_y"])
+
+
+def _figuras(ctx):
+    from graficos import fechar_figuras, gerar_figuras
+    fechar_figuras(ctx.get("figs", []))
+    ctx["figs"], _ = gerar_figuras(
+        ctx["df_temp"], ctx["df_grouped"], ctx["tipos"]["datas"], ctx["eixo_x"], ctx["eixo_y"]
+    )
+
+
+def _ia(ctx):
+    from ai_analyst import analisar_com_ia
+    ctx["texto_ia"] = analisar_com_ia(ctx["df"], ctx["eixo_x"], ctx["eixo_y"])
+
+
+def _pdf(ctx):
+    from pdf_engine_cloud import gerar_pdf_pro
+    tipos = ctx["tipos"]
+    return gerar_pdf_pro(
+        df_original=ctx["df"],
+        df_limpo=ctx["df"],
+        datas=tipos["datas"],
+        numericas=tipos["numericas"],
+        categoricas=tipos["categoricas"],
+        figs_principais=ctx["figs"],
+        texto_ia=ctx["texto_ia"],
+        coluna_alvo=ctx["eixo_y"],
+        data_geracao=datetime(2024, 12, 31, 18, 0)
+    )
+
+
+def _inteligente(ctx):
+    ctx["df"] = _carregar(carregar_e_limpar_inteligente, ctx.get("xlsx") or ctx["csv"])
+
+
+# Ordem importa: cada etapa usa o que as anteriores deixaram em `ctx`.
+ETAPAS = [
+    ("limpar_coluna_numerica", lambda ctx: limpar_coluna_numerica(ctx["bruto"]["VALOR"])),
+    ("carregar_modo_seguro", lambda ctx: _carregar(carregar_modo_seguro, ctx["csv"])),
+    ("carregar_e_limpar_inteligente", _inteligente),
+    ("detectar_tipos", _tipar),
+    ("agrupar_por_categoria", _agrupar),
+    ("gerar_figuras", _figuras),
+    ("analisar_com_ia", _ia),
+    ("gerar_pdf_pro", _pdf),
+]
+
+# ============================================================
+# MEDIÇÃO
+# ============================================================
+
+def medir(funcao, ctx, repeticoes=3, memoria=True):
+    """
+    Melhor tempo de `repeticoes` execuções e, numa execução à parte sob
+    tracemalloc (que deixa o código mais lento), o pico de memória alocada
+    em MB — inclui os buffers de numpy/pandas.
+    """
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(ctx)
+        melhor = min(melhor, time.perf_counter() - inicio)
+
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcao(ctx)
+            pico = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return {"tempo_s": round(melhor, 4), "pico_mb": None if pico is None else round(pico, 2)}
+
+
+def executar_cenario(variante, linhas, repeticoes=None, memoria=True, log=print):
+    """Gera a planilha da variante e mede todas as etapas. Retorna o resultado do cenário."""
+    if repeticoes is None:
+        repeticoes = 3 if linhas <= 100_000 else 1
+
+    with tempfile.TemporaryDirectory(prefix="platero_bench_") as pasta:
+        bruto = gerar_vendas(linhas, **VARIANTES[variante])
+        ctx = {"bruto": bruto, "csv": salvar_csv(bruto, os.path.join(pasta, "vendas.csv"))}
+        if linhas <= LIMITE_XLSX:
+            ctx["xlsx"] = salvar_xlsx(bruto, os.path.join(pasta, "vendas.xlsx"))
+
+        etapas = {}
+        try:
+            for nome, funcao in ETAPAS:
+                etapas[nome] = medir(funcao, ctx, repeticoes, memoria)
+                log(f"  {nome:<32} {etapas[nome]['tempo_s']:>9.3f} s  {_fmt_mb(etapas[nome]['pico_mb'])}")
+        finally:
+            from graficos import fechar_figuras
+            fechar_figuras(ctx.get("figs", []))
+
+        return {
+            "variante": variante,
+            "linhas": linhas,
+            "colunas": int(len(bruto.columns)),
+            "bytes_csv": os.path.getsize(ctx["csv"]),
+            "entrada_inteligente": "xlsx" if "xlsx" in ctx else "csv",
+            "etapas": etapas,
+        }
+
+
+def executar(tamanhos, variantes, repeticoes=None, memoria=True, log=print):
+    resultados = {}
+    for variante in variantes:
+        for linhas in tamanhos:
+            nome = f"{variante}-{_rotulo(linhas)}"
+            log(f"[{nome}]")
+            resultados[nome] = executar_cenario(variante, linhas, repeticoes, memoria, log)
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "maquina": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "resultados": resultados,
+    }
+
+# ============================================================
+# BASELINE E REGRESSÕES
+# ============================================================
+
+def comparar(atual, baseline, limite=LIMITE_REGRESSAO, minimo_s=MINIMO_S, minimo_mb=MINIMO_MB):
+    """
+    Lista as etapas que pioraram mais que `limite` (fração) em tempo ou
+    memória em relação à baseline. Cenários/etapas ausentes na baseline
+    são ignorados.
+    """
+    regressoes = []
+    for cenario, dados in atual["resultados"].items():
+        base = baseline.get("resultados", {}).get(cenario)
+        if not base:
+            continue
+        for etapa, medida in dados["etapas"].items():
+            referencia = base["etapas"].get(etapa)
+            if not referencia:
+                continue
+            for metrica, minimo in (("tempo_s", minimo_s), ("pico_mb", minimo_mb)):
+                valor, anterior = medida.get(metrica), referencia.get(metrica)
+                if valor is None or anterior is None:
+                    continue
+                if valor > anterior * (1 + limite) and valor - anterior > minimo:
+                    regressoes.append({
+                        "cenario": cenario,
+                        "etapa": etapa,
+                        "metrica": metrica,
+                        "baseline": anterior,
+                        "atual": valor,
+                        "variacao_pct": round((valor / anterior - 1) * 100, 1) if anterior else None,
+                    })
+    return regressoes
+
+
+def _rotulo(linhas):
+    for divisor, sufixo in ((1_000_000, "M"), (1_000, "k")):
+        if linhas >= divisor and linhas % divisor == 0:
+            return f"{linhas // divisor}{sufixo}"
+    return str(linhas)
+
+
+def _tamanho(texto):
+    texto = texto.strip().lower()
+    multiplicador = {"k": 1_000, "m": 1_000_000}.get(texto[-1], 1)
+    return int(float(texto.rstrip("km")) * multiplicador)
+
+
+def _fmt_mb(valor):
+    return "" if valor is None else f"{valor:>9.1f} MB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de ponta a ponta do pipeline de relatórios.")
+    parser.add_argument("--tamanhos", default="10k,100k", help="Linhas por cenário (ex.: 10k,1M,10M)")
+    parser.add_argument("--variantes", default="padrao", help=f"Entre: {','.join(VARIANTES)}")
+    parser.add_argument("--repeticoes", type=int, default=None, help="Execuções por etapa (padrão: 3 até 100k, senão 1)")
+    parser.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (mais rápido)")
+    parser.add_argument("--baseline", default=BASELINE, help="Arquivo JSON da baseline")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava o resultado como nova baseline")
+    parser.add_argument("--limite", type=float, default=LIMITE_REGRESSAO, help="Piora tolerada (0.2 = 20%%)")
+    parser.add_argument("--saida", default=None, help="Grava o resultado completo neste JSON")
+    args = parser.parse_args(argv)
+    warnings.simplefilter("ignore", FutureWarning)  # avisos do seaborn poluem a tabela
+
+    variantes = [v.strip() for v in args.variantes.split(",") if v.strip()]
+    desconhecidas = [v for v in variantes if v not in VARIANTES]
+    if desconhecidas:
+        parser.error(f"Variantes desconhecidas: {', '.join(desconhecidas)}")
+    tamanhos = [_tamanho(t) for t in args.tamanhos.split(",") if t.strip()]
+
+    atual = executar(tamanhos, variantes, args.repeticoes, memoria=not args.sem_memoria)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(atual, f, ensure_ascii=False, indent=2)
+
+    if args.salvar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(atual, f, ensure_ascii=False, indent=2)
+        print(f"Baseline gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sem baseline para comparar (use --salvar-baseline).")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressoes = comparar(atual, baseline, args.limite)
+    if not regressoes:
+        print(f"Nenhuma regressão acima de {args.limite:.0%}.")
+        return 0
+
+    print(f"{len(regressoes)} regressão(ões) acima de {args.limite:.0%}:")
+    for r in regressoes:
+        print(f"  {r['cenario']} / {r['etapa']} / {r['metrica']}: {r['baseline']} → {r['atual']} (+{r['variacao_pct']}%)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
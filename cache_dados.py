@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# CACHE COLUNAR DE DATASETS LIMPOS (Arrow/Feather em disco)
+# ============================================================
+
+DIR_CACHE = os.environ.get("PLATERO_CACHE_DADOS", ".cache_dados")
+LIMITE_BYTES = int(os.environ.get("PLATERO_CACHE_DADOS_MB", "1024")) * 1024 * 1024
+IDADE_MAXIMA_SEGUNDOS = int(os.environ.get("PLATERO_CACHE_DADOS_DIAS", "30")) * 86400
+EXT_DADOS = ".arrow"
+EXT_META = ".json"
+EXT_INCREMENTAL = ".incremental.npz"
+
+
+def _pyarrow():
+    """pyarrow é opcional: sem ele o cache fica desligado."""
+    try:
+        import pyarrow.feather as feather
+        return feather
+    except ImportError:
+        return None
+
+
+def disponivel():
+    return _pyarrow() is not None
+
+
+def _caminhos(chave, diretorio):
+    base = os.path.join(diretorio, chave)
+    return base + EXT_DADOS, base + EXT_META
+
+
+def _nome_e_extensao(arquivo):
+    if arquivo.endswith(EXT_INCREMENTAL):
+        return arquivo[:-len(EXT_INCREMENTAL)], EXT_INCREMENTAL
+    return os.path.splitext(arquivo)
+
+
+def _gravar_atomico(destino, escrever):
+    pasta = os.path.dirname(destino) or "."
+    fd, tmp = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+    os.close(fd)
+    try:
+        escrever(tmp)
+        os.replace(tmp, destino)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def salvar(chave, df, tipos, meta=None, diretorio=None, limite_bytes=None, idade_maxima=None, base=None):
+    """
+    Grava o DataFrame limpo (Arrow sem compressão, para leitura por
+    memória mapeada) e, ao lado, um JSON com o resultado de detectar_tipos
+    e metadados livres (nome do arquivo, modo...). Retorna True se gravou.
+
+    Com `base` (chave de outro dataset do cache), `df` são só as linhas
+    anexadas a ela: o anexo grava o tamanho do incremento, não o do
+    histórico, e carregar() junta as partes.
+    """
+    feather = _pyarrow()
+    if feather is None:
+        return False
+
+    diretorio = diretorio or DIR_CACHE
+    caminho_dados, caminho_meta = _caminhos(chave, diretorio)
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        tabela = df.reset_index(drop=True)
+        tabela.columns = [str(c) for c in tabela.columns]
+        _gravar_atomico(caminho_dados, lambda tmp: tabela.to_feather(tmp, compression="uncompressed"))
+
+        conteudo = {
+            "colunas": [str(c) for c in df.columns],
+            "tipos": {k: [str(c) for c in v] for k, v in tipos.items()},
+            "linhas": int(len(df)),
+            "gravado_em": time.time(),
+            "meta": meta or {},
+            "base": base,
+        }
+
+        def escrever_meta(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(conteudo, f, ensure_ascii=False, default=str)
+
+        _gravar_atomico(caminho_meta, escrever_meta)
+    except Exception as e:
+        logger.warning("Não foi possível gravar o dataset %s no cache: %s", chave[:12], e)
+        return False
+
+    aplicar_retencao(
+        diretorio,
+        LIMITE_BYTES if limite_bytes is None else limite_bytes,
+        IDADE_MAXIMA_SEGUNDOS if idade_maxima is None else idade_maxima
+    )
+    return True
+
+
+def carregar(chave, diretorio=None):
+    """
+    Retorna (df, tipos, meta) do cache ou None. Os dados são lidos por
+    memória mapeada: nenhum parse, nenhuma limpeza, nenhuma planilha.
+    Um anexo é montado a partir da base (recursivamente); sem ela no
+    cache, o anexo não serve mais e é descartado.
+    """
+    feather = _pyarrow()
+    if feather is None:
+        return None
+
+    caminho_dados, caminho_meta = _caminhos(chave, diretorio or DIR_CACHE)
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            conteudo = json.load(f)
+        tabela = feather.read_table(caminho_dados, memory_map=True)
+        df = tabela.to_pandas()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Dataset %s ilegível no cache, descartado: %s", chave[:12], e)
+        remover(chave, diretorio)
+        return None
+
+    df.columns = conteudo["colunas"]
+    if conteudo.get("base"):
+        anterior = carregar(conteudo["base"], diretorio)
+        if anterior is None:
+            remover(chave, diretorio)
+            return None
+        df = pd.concat([anterior[0], df], ignore_index=True)
+    for caminho in (caminho_dados, caminho_meta):
+        try:
+            os.utime(caminho, None)  # marca como usado (retenção por LRU)
+        except OSError:
+            pass
+    return df, conteudo["tipos"], conteudo.get("meta", {})
+
+
+def carregar_tipos(chave, diretorio=None):
+    """Só o resultado de detectar_tipos gravado com o dataset (ou None)."""
+    _, caminho_meta = _caminhos(chave, diretorio or DIR_CACHE)
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            return json.load(f)["tipos"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def existe(chave, diretorio=None):
+    return all(os.path.exists(c) for c in _caminhos(chave, diretorio or DIR_CACHE))
+
+
+def salvar_incremental(chave, agregados, hashes, diretorio=None):
+    """
+    Estado do modo incremental ao lado do dataset: os agregados (dict
+    JSON) e arrays de hashes de linhas ({nome: np.ndarray}). True se gravou.
+    """
+    diretorio = diretorio or DIR_CACHE
+    destino = os.path.join(diretorio, chave + EXT_INCREMENTAL)
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        def escrever(tmp):
+            with open(tmp, "wb") as f:
+                np.savez(f, agregados=np.array(json.dumps(agregados, default=str)), **hashes)
+        _gravar_atomico(destino, escrever)
+    except Exception as e:
+        logger.warning("Estado incremental de %s não gravado: %s", chave[:12], e)
+        return False
+    return True
+
+
+def carregar_incremental(chave, diretorio=None):
+    """(agregados, {nome: hashes}) gravados por salvar_incremental, ou None."""
+    caminho = os.path.join(diretorio or DIR_CACHE, chave + EXT_INCREMENTAL)
+    try:
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            agregados = json.loads(str(arquivo["agregados"]))
+            hashes = {nome: arquivo[nome] for nome in arquivo.files if nome != "agregados"}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Estado incremental de %s ilegível, descartado: %s", chave[:12], e)
+        return None
+    return agregados, hashes
+
+
+def remover(chave, diretorio=None):
+    diretorio = diretorio or DIR_CACHE
+    for caminho in (*_caminhos(chave, diretorio), os.path.join(diretorio, chave + EXT_INCREMENTAL)):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def aplicar_retencao(diretorio=None, limite_bytes=LIMITE_BYTES, idade_maxima=IDADE_MAXIMA_SEGUNDOS):
+    """
+    Remove datasets sem uso há mais de `idade_maxima` segundos e, depois,
+    os menos usados até o total caber em `limite_bytes`. Retorna o total.
+    """
+    diretorio = diretorio or DIR_CACHE
+    entradas = {}
+    try:
+        with os.scandir(diretorio) as it:
+            for item in it:
+                nome, ext = _nome_e_extensao(item.name)
+                if item.is_file() and ext in (EXT_DADOS, EXT_META, EXT_INCREMENTAL):
+                    info = item.stat()
+                    usado, tamanho = entradas.get(nome, (0, 0))
+                    entradas[nome] = (max(usado, info.st_mtime), tamanho + info.st_size)
+    except FileNotFoundError:
+        return 0
+
+    agora = time.time()
+    total = sum(tamanho for _, tamanho in entradas.values())
+    for chave, (usado, tamanho) in sorted(entradas.items(), key=lambda item: item[1][0]):
+        if total <= limite_bytes and agora - usado <= idade_maxima:
+            continue
+        remover(chave, diretorio)
+        total -= tamanho
+    return total
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+# ============================================================
+# CACHE DE RELATÓRIOS ENDEREÇADO POR CONTEÚDO
+# ============================================================
+
+DIR_CACHE = os.environ.get("PLATERO_CACHE_RELATORIOS", ".cache_relatorios")
+LIMITE_BYTES = int(os.environ.get("PLATERO_CACHE_RELATORIOS_MB", "200")) * 1024 * 1024
+EXTENSAO = ".pdf"
+
+
+def hash_dataframe(df):
+    """Hash estável do conteúdo do DataFrame (valores, índice, colunas e tipos)."""
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    h.update(json.dumps([str(t) for t in df.dtypes]).encode("utf-8"))
+    if len(df):
+        try:
+            valores = pd.util.hash_pandas_object(df, index=True)
+        except TypeError:
+            # Colunas com objetos não hasheáveis: usa a representação textual
+            valores = pd.util.hash_pandas_object(df.astype(str), index=True)
+        h.update(valores.values.tobytes())
+    return h.hexdigest()
+
+
+def chave_relatorio(df, figuras, **entradas):
+    """
+    Chave do relatório: hash das entradas semânticas que definem o PDF.
+
+    `figuras` são os bytes já renderizados de cada gráfico; as demais
+    entradas (colunas, texto da IA, usuário, opções...) precisam ser
+    serializáveis em JSON.
+    """
+    h = hashlib.sha256()
+    h.update(hash_dataframe(df).encode("utf-8"))
+    for dados in figuras:
+        h.update(hashlib.sha256(dados).digest())
+    h.update(json.dumps(entradas, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _caminho(chave, diretorio):
+    return os.path.join(diretorio, chave + EXTENSAO)
+
+
+def obter(chave, diretorio=None):
+    """Retorna os bytes do relatório em cache (ou None)."""
+    caminho = _caminho(chave, diretorio or DIR_CACHE)
+    try:
+        with open(caminho, "rb") as f:
+            dados = f.read()
+    except OSError:
+        return None
+
+    # Marca como usado recentemente (a remoção segue a ordem de acesso)
+    try:
+        os.utime(caminho, None)
+    except OSError:
+        pass
+    return dados
+
+
+def salvar(chave, dados, diretorio=None, limite_bytes=None):
+    """Grava o relatório de forma atômica e aplica o limite de tamanho."""
+    diretorio = diretorio or DIR_CACHE
+    os.makedirs(diretorio, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, _caminho(chave, diretorio))
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    remover_excedente(diretorio, LIMITE_BYTES if limite_bytes is None else limite_bytes)
+
+
+def remover_excedente(diretorio=None, limite_bytes=LIMITE_BYTES):
+    """Remove os relatórios menos usados até o cache caber no limite."""
+    diretorio = diretorio or DIR_CACHE
+    arquivos = []
+    with os.scandir(diretorio) as it:
+        for entrada in it:
+            if entrada.is_file() and entrada.name.endswith(EXTENSAO):
+                info = entrada.stat()
+                arquivos.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite_bytes:
+            break
+        try:
+            os.remove(caminho)
+            total -= tamanho
+        except OSError:
+            pass
+    return total
@@ -0,0 +1,173 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# HIERARQUIA DE CALENDÁRIO (dia / semana / mês / trimestre / ano)
+# ============================================================
+#
+# A coluna de data é lida uma vez por dataset e vira uma chave inteira
+# compacta (int32): dias desde 1970. Para cada métrica, os totais por dia
+# são somados de uma vez (np.bincount) e semana, mês, trimestre, ano e mês
+# do ano são somados a partir da tabela diária, que é pequena. Tendência,
+# crescimento mês a mês, sazonalidade e a linha do tempo viram consultas
+# a essas tabelas.
+
+NIVEIS = {"dia": "Dia", "semana": "Semana", "mes": "Mês", "trimestre": "Trimestre", "ano": "Ano"}
+
+
+def chaves_calendario(serie):
+    """(dias desde 1970 em int32, máscara de datas válidas)."""
+    valores = pd.to_datetime(serie, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    validas = ~np.isnat(valores)
+    dias = np.zeros(len(valores), dtype=np.int32)
+    dias[validas] = valores[validas].astype("datetime64[D]").astype(np.int64)
+    return dias, validas
+
+
+def _chave_do_nivel(dias, nivel):
+    """Chave inteira do nível a partir dos dias (semanas começam na segunda)."""
+    if nivel == "dia":
+        return dias
+    if nivel == "semana":
+        return (dias + 3) // 7  # 1970-01-01 foi quinta-feira
+    meses = dias.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if nivel == "mes":
+        return meses
+    if nivel == "trimestre":
+        return meses // 3
+    if nivel == "ano":
+        return meses // 12
+    raise ValueError(f"Nível de calendário desconhecido: {nivel}")
+
+
+def _inicio_do_periodo(chaves, nivel):
+    """Timestamp do primeiro dia de cada chave do nível (índice dos gráficos)."""
+    chaves = np.asarray(chaves, dtype=np.int64)
+    if nivel == "dia":
+        inicio = chaves.astype("datetime64[D]")
+    elif nivel == "semana":
+        inicio = (chaves * 7 - 3).astype("datetime64[D]")
+    elif nivel == "mes":
+        inicio = chaves.astype("datetime64[M]")
+    elif nivel == "trimestre":
+        inicio = (chaves * 3).astype("datetime64[M]")
+    else:
+        inicio = chaves.astype("datetime64[Y]")
+    return pd.DatetimeIndex(inicio.astype("datetime64[ns]"))
+
+
+def _somar_totais(a, b):
+    """Totais por nível de duas partes do dataset somados período a período."""
+    if not a or not b:
+        return a or b
+    return {nivel: pd.concat([a[nivel], b[nivel]]).groupby(level=0).sum().sort_index() for nivel in a}
+
+
+class Calendario:
+    """
+    Chaves de calendário e totais por nível de um dataset, calculados sob
+    demanda (por coluna de data e por métrica) e reaproveitados depois.
+    Pode ser compartilhado entre a tela e as tarefas em segundo plano.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._chaves = {}
+        self._totais = {}
+        self._lock = threading.Lock()
+
+    def chaves(self, col_data):
+        with self._lock:
+            if col_data not in self._chaves:
+                self._chaves[col_data] = chaves_calendario(self.df[col_data])
+            return self._chaves[col_data]
+
+    def anexar(self, df, novas):
+        """
+        Calendário de `df`, que é `self.df` seguido de `novas` (anexo
+        incremental). Chaves e totais já calculados são estendidos com os
+        de `novas`, sem reler o histórico; o resto continua sob demanda.
+        """
+        incremento = Calendario(novas)
+        calendario = Calendario(df)
+        with self._lock:
+            chaves, totais = dict(self._chaves), dict(self._totais)
+        for col_data, (dias, validas) in chaves.items():
+            if col_data in novas.columns:
+                dias_novos, validas_novas = incremento.chaves(col_data)
+                calendario._chaves[col_data] = (
+                    np.concatenate([dias, dias_novos]), np.concatenate([validas, validas_novas])
+                )
+        for (col_data, col_valor), por_nivel in totais.items():
+            if col_data in novas.columns and col_valor in novas.columns:
+                calendario._totais[(col_data, col_valor)] = _somar_totais(
+                    por_nivel, incremento.totais(col_data, col_valor)
+                )
+        return calendario
+
+    def linhas_validas(self, col_data):
+        return int(self.chaves(col_data)[1].sum())
+
+    def totais(self, col_data, col_valor):
+        """
+        {nível: DataFrame(soma, contagem, linhas)} com um registro por
+        período que tem datas; `contagem` são os valores não nulos.
+        """
+        chave = (col_data, col_valor)
+        with self._lock:
+            if chave in self._totais:
+                return self._totais[chave]
+
+        dias, validas = self.chaves(col_data)
+        valores = pd.to_numeric(self.df[col_valor], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        dias, valores = dias[validas], valores[validas]
+        preenchidos = ~np.isnan(valores)
+
+        totais = {}
+        if len(dias):
+            base = int(dias.min())
+            posicao = dias - base
+            linhas = np.bincount(posicao)
+            existentes = np.flatnonzero(linhas)
+            diario = pd.DataFrame({
+                "soma": np.bincount(posicao, weights=np.where(preenchidos, valores, 0.0))[existentes],
+                "contagem": np.bincount(posicao, weights=preenchidos)[existentes].astype(np.int64),
+                "linhas": linhas[existentes],
+            }, index=existentes + base)
+            for nivel in NIVEIS:
+                por_nivel = diario.groupby(_chave_do_nivel(diario.index.to_numpy(), nivel)).sum()
+                por_nivel.index = _inicio_do_periodo(por_nivel.index, nivel)
+                totais[nivel] = por_nivel
+            # Mês do ano (1 a 12) para a sazonalidade
+            mes_do_ano = _chave_do_nivel(diario.index.to_numpy(), "mes") % 12 + 1
+            totais["mes_do_ano"] = diario.groupby(mes_do_ano).sum()
+
+        with self._lock:
+            self._totais[chave] = totais
+        return totais
+
+    def serie(self, col_data, col_valor, nivel="dia"):
+        """Soma de `col_valor` por período do nível, em ordem cronológica."""
+        totais = self.totais(col_data, col_valor)
+        if not totais:
+            return pd.Series(dtype="float64", name=col_valor, index=pd.DatetimeIndex([], name=col_data))
+        serie = totais[nivel]["soma"].rename(col_valor)
+        serie.index.name = col_data
+        return serie
+
+    def crescimento_mensal(self, col_data, col_valor):
+        """Crescimento médio mês a mês (%) das somas mensais; None com menos de dois meses."""
+        mensal = self.serie(col_data, col_valor, "mes")
+        if len(mensal) < 2:
+            return None
+        return float(mensal.pct_change().mean() * 100)
+
+    def sazonalidade(self, col_data, col_valor):
+        """Média de `col_valor` por mês do ano (1 a 12), só nos meses que aparecem."""
+        totais = self.totais(col_data, col_valor)
+        if not totais:
+            return pd.Series(dtype="float64")
+        por_mes = totais["mes_do_ano"]
+        return (por_mes["soma"] / por_mes["contagem"].where(por_mes["contagem"] > 0)).rename(col_valor)
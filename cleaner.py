@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
-import streamlit as st
 import re
 
+from instrumentacao import etapa
+
 # ============================================================
 # 1. DETECÇÃO INTELIGENTE DE LINHA DE CABEÇALHO
 # ============================================================
@@ -35,12 +36,10 @@ def encontrar_linha_cabecalho(df_temp):
 # 2. CARREGAMENTO E LIMPEZA INTELIGENTE
 # ============================================================
 
-def carregar_e_limpar_inteligente(arquivo):
-    lista_dfs = []
-
-    # 1. LEITURA
-    try:
-        if arquivo.name.endswith('.xlsx'):
+def ler_abas(arquivo):
+    """Passo 1: todas as abas (ou o CSV) como texto, sem cabeçalho. {nome: df}"""
+    with etapa("leitura") as medicao:
+        if arquivo.name.lower().endswith('.xlsx'):
             dfs_dict = pd.read_excel(arquivo, sheet_name=None, header=None, dtype=str)
         else:
             dfs_dict = {
@@ -52,32 +51,57 @@ def carregar_e_limpar_inteligente(arquivo):
                     dtype=str
                 )
             }
+        medicao.linhas = sum(len(d) for d in dfs_dict.values())
+    return dfs_dict
+
+
+def carregar_e_limpar_inteligente(arquivo):
+    # 1. LEITURA
+    try:
+        dfs_dict = ler_abas(arquivo)
     except Exception as e:
         return None, f"Erro na leitura: {e}"
 
-    # 2. PROCESSAMENTO POR ABA
-    for nome_aba, df_raw in dfs_dict.items():
-        if df_raw.empty:
-            continue
+    return limpar_abas(dfs_dict)
+
+
+def extrair_tabela(df_raw, nome_aba, idx_header=None):
+    """
+    Cabeçalho (detectado, se `idx_header` não vier), colunas válidas e a
+    coluna Origem_Aba de uma aba lida sem cabeçalho. None se não houver tabela.
+    """
+    if df_raw.empty:
+        return None
 
+    if idx_header is None:
         idx_header = encontrar_linha_cabecalho(df_raw)
 
-        # Extrai dados e cabeçalho
-        df_aba = df_raw.iloc[idx_header+1:].copy()
-        df_aba.columns = df_raw.iloc[idx_header].astype(str).str.strip()
+    # Extrai dados e cabeçalho
+    df_aba = df_raw.iloc[idx_header+1:].copy()
+    df_aba.columns = df_raw.iloc[idx_header].fillna("").astype(str).str.strip()
 
-        # Remove colunas vazias ou "Unnamed"
-        cols_validas = [
-            c for c in df_aba.columns
-            if c.strip() not in ["", "nan", "None"] and not c.startswith("Unnamed")
-        ]
+    # Remove colunas vazias ou "Unnamed"
+    cols_validas = [
+        c for c in df_aba.columns
+        if c.strip() not in ["", "nan", "None"] and not c.startswith("Unnamed")
+    ]
 
-        if not cols_validas:
-            continue
+    if not cols_validas:
+        return None
+
+    df_aba = df_aba[cols_validas]
+    df_aba["Origem_Aba"] = nome_aba
+    return df_aba
 
-        df_aba = df_aba[cols_validas]
-        df_aba["Origem_Aba"] = nome_aba
-        lista_dfs.append(df_aba)
+
+def limpar_abas(dfs_dict):
+    """Passos 2 a 7 sobre as abas lidas ({nome: df sem cabeçalho}). Retorna (df, erro)."""
+    # 2. PROCESSAMENTO POR ABA
+    lista_dfs = []
+    for nome_aba, df_raw in dfs_dict.items():
+        df_aba = extrair_tabela(df_raw, nome_aba)
+        if df_aba is not None:
+            lista_dfs.append(df_aba)
 
     if not lista_dfs:
         return None, "Nenhuma tabela válida encontrada."
@@ -85,6 +109,15 @@ def carregar_e_limpar_inteligente(arquivo):
     # 3. CONSOLIDAÇÃO
     df_final = pd.concat(lista_dfs, ignore_index=True)
 
+    with etapa("limpeza", df=df_final) as medicao:
+        df_final = limpar_tabela(df_final)
+        medicao.dimensoes(df_final)
+
+    return df_final, None
+
+
+def limpar_tabela(df_final):
+    """Linhas de TOTAL, datas, números BR/US e linhas vazias (vale para um lote isolado)."""
     # 4. REMOVE LINHAS DE TOTAL
     for col in df_final.columns:
         df_final = df_final[
@@ -127,6 +160,111 @@ def carregar_e_limpar_inteligente(arquivo):
             df_final[col] = melhor
 
     # 7. REMOVE LINHAS TOTALMENTE VAZIAS
-    df_final = df_final.dropna(how="all")
+    return df_final.dropna(how="all")
+
+
+# ============================================================
+# 3. LIMPEZA FORÇADA DE NÚMEROS
+# ============================================================
+
+def limpar_coluna_numerica(serie):
+    """
+    Converte qualquer bagunça (R$, texto, erro de ponto/vírgula) em número real.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+
+    serie_clean = serie.astype(str).str.strip()
+    serie_clean = serie_clean.str.replace(r'[R$\s]', '', regex=True)
+
+    def converter_valor(val):
+        if not isinstance(val, str) or not val or val.lower() in ['nan', 'none', '', 'null']:
+            return None
+        
+        # Deixa apenas números, ponto, vírgula e sinal negativo
+        val_clean = re.sub(r'[^\d.,-]', '', val)
+        
+        try:
+            # Lógica Híbrida (Brasil vs EUA)
+            if ',' in val_clean and '.' in val_clean:
+                # 1.234,56 -> Tira ponto, troca vírgula por ponto
+                val_clean = val_clean.replace('.', '').replace(',', '.')
+            elif ',' in val_clean:
+                # 1234,56 -> Troca vírgula por ponto
+                val_clean = val_clean.replace(',', '.')
+            
+            return float(val_clean)
+        except:
+            return None
+
+    return serie_clean.apply(converter_valor)
+
+
+# ============================================================
+# 4. CARREGAMENTO BLINDADO (MODO SEGURO)
+# ============================================================
+
+def ler_modo_seguro(arquivo):
+    """Leitura (ainda só texto) do modo seguro, tolerante a encoding."""
+    # --- BLOCAGEM DE CODIFICAÇÃO (CORREÇÃO DO ERRO) ---
+    with etapa("leitura") as medicao:
+        if arquivo.name.lower().endswith('.csv'):
+            try:
+                # Tentativa 1: Padrão UTF-8 (Mundial)
+                df = pd.read_csv(arquivo, sep=None, engine='python', dtype=str)
+            except UnicodeDecodeError:
+                # Tentativa 2: Latin-1 (Excel Brasil - corrige o erro do 'ç')
+                arquivo.seek(0)
+                df = pd.read_csv(arquivo, sep=None, engine='python', dtype=str, encoding='latin-1')
+            except Exception:
+                # Tentativa 3: Força separador ; e Latin-1
+                arquivo.seek(0)
+                df = pd.read_csv(arquivo, sep=';', dtype=str, encoding='latin-1')
+        else:
+            # Excel (xlsx) não costuma ter problema de encoding
+            df = pd.read_excel(arquivo, dtype=str)
+        medicao.dimensoes(df)
+    return df
+
+
+def carregar_modo_seguro(arquivo):
+    """
+    Leitura tolerante a encoding (utf-8 / latin-1) seguida da conversão
+    forçada de números. Retorna (df, erro), como carregar_e_limpar_inteligente.
+    """
+    try:
+        df = ler_modo_seguro(arquivo)
 
-    return df_final, None
\ No newline at end of file
+        # --- CONVERSÃO INTELIGENTE DE NÚMEROS ---
+        with etapa("limpeza", df=df):
+            df, _ = converter_numeros(df)
+
+    except Exception as e:
+        return pd.DataFrame(), f"Erro grave no modo seguro: {e}"
+
+    return df, None
+
+
+def converter_numeros(df, colunas=None):
+    """
+    Conversão forçada do modo seguro. Sem `colunas`, converte as que têm
+    dígitos na amostra e viram número em mais da metade das linhas; com
+    `colunas` (decisão já tomada, ex.: no primeiro lote), converte essas.
+    Retorna (df, colunas convertidas).
+    """
+    convertidas = []
+    for col in df.columns:
+        if colunas is not None:
+            if col in colunas:
+                df[col] = limpar_coluna_numerica(df[col])
+                convertidas.append(col)
+            continue
+        amostra = df[col].dropna().head(10).astype(str).str.cat()
+        # Se tem números na amostra, tenta limpar
+        if any(char.isdigit() for char in amostra):
+            col_convertida = limpar_coluna_numerica(df[col])
+            # Se converteu bem, salva
+            if col_convertida.notna().sum() > (len(df) * 0.5):
+                df[col] = col_convertida
+                convertidas.append(col)
+    return df, convertidas
@@ -1,96 +1,737 @@
 import sqlite3
+import logging
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+import json
 import pandas as pd
-from datetime import datetime
-import streamlit as st
+from datetime import date, datetime, timedelta
+
+from perfil import perfilar, variacao_pct
+
+# Erros são registrados em log; a interface decide como exibi-los
+logger = logging.getLogger(__name__)
 
 DB_FILE = "historico_platero.db"
 
+TAMANHO_POOL_LEITURA = 4
+LOTE_MAX_ESCRITAS = 200       # operações agrupadas em uma única transação
+JANELA_LOTE_SEGUNDOS = 0.005  # espera curta para juntar escritas simultâneas
+AMOSTRAS_LATENCIA = 1000
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # leitores não bloqueiam o escritor
+    "PRAGMA synchronous=NORMAL",      # seguro com WAL e bem mais rápido
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",        # ~8 MB de cache de páginas
+    "PRAGMA mmap_size=67108864",      # leituras via memória mapeada (64 MB)
+)
+
 # ============================================================
 # FUNÇÃO AUXILIAR — CONEXÃO SEGURA
 # ============================================================
 
-def get_connection():
-    """Retorna conexão segura com SQLite, compatível com Streamlit."""
-    return sqlite3.connect(DB_FILE, check_same_thread=False)
+def get_connection(db_file=None):
+    """Retorna conexão SQLite já configurada (WAL e pragmas), compartilhável entre threads."""
+    conn = sqlite3.connect(db_file or DB_FILE, check_same_thread=False, timeout=5)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 # ============================================================
-# INICIALIZAÇÃO DO BANCO
+# CAMADA DE ARMAZENAMENTO — POOL DE LEITURA + ESCRITOR ÚNICO
 # ============================================================
 
+def _percentis(amostras):
+    if not amostras:
+        return {"p50": None, "p95": None, "max": None}
+    ordenadas = sorted(amostras)
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))], 3)
+    return {"p50": p(0.50), "p95": p(0.95), "max": round(ordenadas[-1], 3)}
+
+
+class Armazenamento:
+    """
+    Acesso ao SQLite de um arquivo de banco.
+
+    Leituras usam um pool pequeno de conexões somente-leitura. Todas as
+    escritas passam por uma fila consumida por uma única thread, que agrupa
+    as operações pendentes em uma transação só — sem disputa pelo lock de
+    escrita do SQLite ("database is locked").
+    """
+
+    def __init__(self, db_file, tamanho_pool=TAMANHO_POOL_LEITURA):
+        self.db_file = db_file
+        self._pool = queue.Queue()
+        for _ in range(tamanho_pool):
+            conn = get_connection(db_file)
+            conn.execute("PRAGMA query_only=1")
+            self._pool.put(conn)
+        self._tamanho_pool = tamanho_pool
+
+        self._fila = queue.Queue()
+        self._lat_escrita = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._lat_leitura = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._lock_metricas = threading.Lock()
+        self._contadores = {"escritas": 0, "lotes": 0, "falhas_escrita": 0, "leituras": 0}
+        self._fila_max = 0
+
+        self._escritor = threading.Thread(target=self._loop_escrita, name="platero-db-escritor", daemon=True)
+        self._escritor.start()
+
+    # ------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------
+
+    @contextmanager
+    def leitura(self):
+        """Empresta uma conexão de leitura do pool."""
+        inicio = time.perf_counter()
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+            with self._lock_metricas:
+                self._contadores["leituras"] += 1
+                self._lat_leitura.append((time.perf_counter() - inicio) * 1000)
+
+    # ------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------
+
+    def escrever(self, operacao):
+        """
+        Enfileira `operacao(conn)` para o escritor e retorna um Future
+        com o valor retornado por ela (após o commit).
+        """
+        futuro = Future()
+        self._fila.put((operacao, futuro, time.perf_counter()))
+        tamanho = self._fila.qsize()
+        if tamanho > self._fila_max:
+            self._fila_max = tamanho
+        return futuro
+
+    def aguardar_escritas(self, timeout=None):
+        """Bloqueia até tudo que já foi enfileirado estar gravado."""
+        return self.escrever(lambda conn: None).result(timeout=timeout)
+
+    def _loop_escrita(self):
+        conn = get_connection(self.db_file)
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+
+            lote = [item]
+            limite = time.perf_counter() + JANELA_LOTE_SEGUNDOS
+            parar = False
+            while len(lote) < LOTE_MAX_ESCRITAS:
+                restante = limite - time.perf_counter()
+                try:
+                    proximo = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    parar = True
+                    break
+                lote.append(proximo)
+
+            self._executar_lote(conn, lote)
+            if parar:
+                break
+        conn.close()
+
+    def _executar_lote(self, conn, lote):
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operacao, _, _ in lote:
+                resultados.append(operacao(conn))
+            conn.commit()
+        except Exception as erro:
+            conn.rollback()
+            # Uma operação ruim não pode derrubar as demais: refaz uma a uma
+            if len(lote) > 1:
+                for item in lote:
+                    self._executar_lote(conn, [item])
+                return
+            _, futuro, _ = lote[0]
+            with self._lock_metricas:
+                self._contadores["falhas_escrita"] += 1
+            logger.error("Erro ao gravar no banco: %s", erro)
+            futuro.set_exception(erro)
+            return
+
+        agora = time.perf_counter()
+        with self._lock_metricas:
+            self._contadores["lotes"] += 1
+            self._contadores["escritas"] += len(lote)
+            for _, _, enfileirado in lote:
+                self._lat_escrita.append((agora - enfileirado) * 1000)
+        for (_, futuro, _), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+    # ------------------------------------------------------------
+    # Métricas e encerramento
+    # ------------------------------------------------------------
+
+    def metricas(self):
+        with self._lock_metricas:
+            return {
+                **self._contadores,
+                "fila_escrita": self._fila.qsize(),
+                "fila_escrita_max": self._fila_max,
+                "conexoes_leitura_livres": self._pool.qsize(),
+                "conexoes_leitura": self._tamanho_pool,
+                "latencia_escrita_ms": _percentis(list(self._lat_escrita)),
+                "latencia_leitura_ms": _percentis(list(self._lat_leitura)),
+            }
+
+    def fechar(self):
+        self._fila.put(None)
+        self._escritor.join(timeout=10)
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+_ARMAZENAMENTOS = {}
+_INICIALIZADOS = set()  # DB_FILEs já criados/migrados neste processo
+_LOCK_ARMAZENAMENTO = threading.Lock()
+
+
+def armazenamento():
+    """Camada de armazenamento do processo para o DB_FILE atual."""
+    with _LOCK_ARMAZENAMENTO:
+        instancia = _ARMAZENAMENTOS.get(DB_FILE)
+        if instancia is None:
+            instancia = Armazenamento(DB_FILE)
+            _ARMAZENAMENTOS[DB_FILE] = instancia
+        return instancia
+
+
+def metricas_banco():
+    """Latência de leitura/escrita, tamanho da fila e contadores da camada de banco."""
+    return armazenamento().metricas()
+
+
+def aguardar_escritas(timeout=None):
+    """Garante que as escritas enfileiradas até aqui foram gravadas."""
+    return armazenamento().aguardar_escritas(timeout=timeout)
+
+
+@atexit.register
+def fechar_conexoes():
+    """Esvazia a fila de escrita e fecha as conexões de todos os bancos abertos."""
+    with _LOCK_ARMAZENAMENTO:
+        instancias = list(_ARMAZENAMENTOS.values())
+        _ARMAZENAMENTOS.clear()
+        _INICIALIZADOS.clear()
+    for instancia in instancias:
+        instancia.fechar()
+
+# ============================================================
+# INICIALIZAÇÃO E MIGRAÇÕES DO BANCO
+# ============================================================
+
+FORMATO_DATA_ANTIGO = "%d/%m/%Y %H:%M"
+LIMITE_PAGINA = 50
+
+
+def _colunas(conn, tabela):
+    return {linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+
+
+def _epoch_de_texto(texto):
+    """Converte o data_upload gravado (dd/mm/YYYY HH:MM ou ISO) em epoch."""
+    for conversor in (lambda t: datetime.strptime(t, FORMATO_DATA_ANTIGO), datetime.fromisoformat):
+        try:
+            return int(conversor(str(texto).strip()).timestamp())
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _migrar_v1(conn):
+    """data_upload em ISO + coluna ts_upload (epoch) e índice (usuario, ts_upload)."""
+    if "ts_upload" not in _colunas(conn, "historico"):
+        conn.execute("ALTER TABLE historico ADD COLUMN ts_upload INTEGER")
+
+    pendentes = conn.execute(
+        "SELECT id, data_upload FROM historico WHERE ts_upload IS NULL"
+    ).fetchall()
+    atualizacoes = []
+    for id_registro, texto in pendentes:
+        ts = _epoch_de_texto(texto)
+        if ts is None:
+            # Data ilegível: vai para o fim da ordenação, texto preservado
+            atualizacoes.append((0, texto, id_registro))
+        else:
+            atualizacoes.append((ts, _iso(ts), id_registro))
+    conn.executemany(
+        "UPDATE historico SET ts_upload = ?, data_upload = ? WHERE id = ?", atualizacoes
+    )
+
+    conn.execute("DROP INDEX IF EXISTS idx_usuario")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_usuario_ts ON historico(usuario, ts_upload DESC, id DESC)"
+    )
+
+
+def _migrar_v2(conn):
+    """Perfil compacto de cada coluna do upload (comparações sem reabrir arquivos)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS perfil_coluna (
+            historico_id INTEGER NOT NULL REFERENCES historico(id) ON DELETE CASCADE,
+            coluna TEXT NOT NULL,
+            tipo TEXT,
+            contagem INTEGER,
+            nulos INTEGER,
+            distintos INTEGER,
+            soma REAL,
+            media REAL,
+            minimo,
+            maximo,
+            quantis TEXT,
+            top TEXT,
+            PRIMARY KEY (historico_id, coluna)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migrar_v3(conn):
+    """Empresa do upload + rollups mensais por usuário e por empresa."""
+    if "empresa" not in _colunas(conn, "historico"):
+        conn.execute("ALTER TABLE historico ADD COLUMN empresa TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_mensal (
+            escopo TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            uploads INTEGER NOT NULL DEFAULT 0,
+            faturamento_total REAL NOT NULL DEFAULT 0,
+            soma_ticket REAL NOT NULL DEFAULT 0,
+            uploads_ticket INTEGER NOT NULL DEFAULT 0,
+            linhas INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (escopo, chave, mes)
+        ) WITHOUT ROWID
+    """)
+    _reconstruir_rollups(conn)
+
+
+def _migrar_v4(conn):
+    """Hash do conteúdo do upload: liga o registro ao dataset em cache (cache_dados)."""
+    if "hash_conteudo" not in _colunas(conn, "historico"):
+        conn.execute("ALTER TABLE historico ADD COLUMN hash_conteudo TEXT")
+
+
+MIGRACOES = {1: _migrar_v1, 2: _migrar_v2, 3: _migrar_v3, 4: _migrar_v4}
+
+
 def init_db():
-    """Cria a tabela de histórico se ela não existir."""
+    """
+    Cria a tabela de histórico e aplica as migrações pendentes. Roda uma
+    vez por processo e banco: as chamadas seguintes (a cada rerun do
+    Streamlit) não passam pela fila de escrita.
+    """
+    if DB_FILE in _INICIALIZADOS:
+        return
+
+    def criar(conn):
+        c = conn.cursor()
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS historico (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                usuario TEXT,
+                data_upload TEXT,
+                nome_arquivo TEXT,
+                faturamento_total REAL,
+                ticket_medio REAL,
+                linhas_processadas INTEGER
+            )
+        """)
+
+        versao = c.execute("PRAGMA user_version").fetchone()[0]
+        for numero in sorted(MIGRACOES):
+            if numero > versao:
+                MIGRACOES[numero](conn)
+                c.execute(f"PRAGMA user_version = {int(numero)}")
+
     try:
-        with get_connection() as conn:
-            c = conn.cursor()
-            c.execute("""
-                CREATE TABLE IF NOT EXISTS historico (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    usuario TEXT,
-                    data_upload TEXT,
-                    nome_arquivo TEXT,
-                    faturamento_total REAL,
-                    ticket_medio REAL,
-                    linhas_processadas INTEGER
-                )
-            """)
-            c.execute("CREATE INDEX IF NOT EXISTS idx_usuario ON historico(usuario)")
-            conn.commit()
+        armazenamento().escrever(criar).result()
+        _INICIALIZADOS.add(DB_FILE)
     except Exception as e:
-        st.error(f"Erro ao inicializar banco: {e}")
+        logger.error("Erro ao inicializar banco: %s", e)
+
+# ============================================================
+# DATAS
+# ============================================================
+
+def _numero_ou_none(valor):
+    return None if valor is None or valor != valor else float(valor)
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat(sep=" ", timespec="seconds")
+
+
+def _para_epoch(valor, fim=False):
+    """
+    Aceita epoch, datetime, date ou texto ISO. Com fim=True uma data sem
+    hora cobre o dia inteiro (limite exclusivo no dia seguinte).
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return int(valor)
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor) if ("T" in valor or ":" in valor) else date.fromisoformat(valor)
+    if isinstance(valor, datetime):
+        return int(valor.timestamp())
+    if isinstance(valor, date):
+        dia = datetime.combine(valor, datetime.min.time())
+        if fim:
+            dia += timedelta(days=1)
+        return int(dia.timestamp())
+    raise TypeError(f"Data inválida: {valor!r}")
 
 # ============================================================
 # SALVAR REGISTRO
 # ============================================================
 
-def salvar_registro(usuario, nome_arquivo, df, col_valor):
-    """Salva o resumo da planilha no banco de dados."""
+COLUNAS_PERFIL = (
+    "coluna", "tipo", "contagem", "nulos", "distintos",
+    "soma", "media", "minimo", "maximo", "quantis", "top"
+)
+SQL_COLUNAS_PERFIL = ", ".join(COLUNAS_PERFIL)
+
+
+def salvar_registro(usuario, nome_arquivo, df, col_valor, aguardar=True, tipos=None, empresa=None,
+                    hash_conteudo=None):
+    """
+    Salva o resumo da planilha e o perfil de cada coluna no banco de dados.
+
+    `tipos` é o resultado de detectar_tipos (opcional, melhora o perfil).
+    O rollup mensal do usuário (e da `empresa`, se informada) é atualizado
+    na mesma transação, feita pelo escritor em segundo plano. Por padrão
+    a função espera o commit e retorna True (ou False se a gravação
+    falhou); com aguardar=False retorna logo o Future da gravação (id do
+    registro, ou a exceção), para quem chama conferir depois.
+    `hash_conteudo` liga o registro ao dataset limpo guardado em cache_dados.
+    """
     try:
         if col_valor not in df.columns:
-            st.error(f"Coluna '{col_valor}' não encontrada no DataFrame.")
+            logger.error("Coluna '%s' não encontrada no DataFrame.", col_valor)
             return False
 
         serie = pd.to_numeric(df[col_valor], errors="coerce")
         total = float(serie.sum(skipna=True))
         media = float(serie.mean(skipna=True))
         linhas = int(len(df))
-        data_hoje = datetime.now().strftime("%d/%m/%Y %H:%M")
+        ts = int(time.time())
 
-        with get_connection() as conn:
+        try:
+            perfis = perfilar(df, tipos=tipos, col_valor=col_valor)
+        except Exception as e:
+            logger.error("Erro ao calcular perfil das colunas: %s", e)
+            perfis = []
+        linhas_perfil = [
+            tuple(
+                json.dumps(p[c], ensure_ascii=False) if c in ("quantis", "top") and p[c] is not None else p[c]
+                for c in COLUNAS_PERFIL
+            )
+            for p in perfis
+        ]
+
+        def inserir(conn):
             c = conn.cursor()
             c.execute("""
-                INSERT INTO historico 
-                (usuario, data_upload, nome_arquivo, faturamento_total, ticket_medio, linhas_processadas)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (usuario, data_hoje, nome_arquivo, total, media, linhas))
-            conn.commit()
+                INSERT INTO historico
+                (usuario, empresa, data_upload, ts_upload, nome_arquivo, faturamento_total, ticket_medio,
+                 linhas_processadas, hash_conteudo)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (usuario, empresa, _iso(ts), ts, nome_arquivo, total, media, linhas, hash_conteudo))
+            historico_id = c.lastrowid
+            _somar_rollups(conn, usuario, empresa, ts, total, media, linhas)
+            c.executemany(f"""
+                INSERT INTO perfil_coluna (historico_id, {SQL_COLUNAS_PERFIL})
+                VALUES (?{", ?" * len(COLUNAS_PERFIL)})
+            """, [(historico_id, *linha) for linha in linhas_perfil])
+            return historico_id
 
+        futuro = armazenamento().escrever(inserir)
+        if not aguardar:
+            return futuro
+        futuro.result()
         return True
 
     except Exception as e:
-        st.error(f"Erro ao salvar no banco: {e}")
+        logger.error("Erro ao salvar no banco: %s", e)
         return False
 
+# ============================================================
+# ROLLUPS MENSAIS (mantidos a cada gravação)
+# ============================================================
+
+ESCOPO_USUARIO = "usuario"
+ESCOPO_EMPRESA = "empresa"
+
+
+def _mes(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m")
+
+
+def _somar_rollups(conn, usuario, empresa, ts, total, media, linhas):
+    """Soma um upload aos rollups do mês (executa dentro da transação do escritor)."""
+    ticket = _numero_ou_none(media)
+    escopos = [(ESCOPO_USUARIO, usuario)]
+    if empresa:
+        escopos.append((ESCOPO_EMPRESA, empresa))
+    conn.executemany("""
+        INSERT INTO rollup_mensal
+        (escopo, chave, mes, uploads, faturamento_total, soma_ticket, uploads_ticket, linhas)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT (escopo, chave, mes) DO UPDATE SET
+            uploads = uploads + 1,
+            faturamento_total = faturamento_total + excluded.faturamento_total,
+            soma_ticket = soma_ticket + excluded.soma_ticket,
+            uploads_ticket = uploads_ticket + excluded.uploads_ticket,
+            linhas = linhas + excluded.linhas
+    """, [
+        (escopo, chave, _mes(ts), _numero_ou_none(total) or 0.0, ticket or 0.0, int(ticket is not None), linhas)
+        for escopo, chave in escopos
+    ])
+
+
+def _reconstruir_rollups(conn):
+    """Recalcula todos os rollups a partir do histórico (migração/reparo)."""
+    conn.execute("DELETE FROM rollup_mensal")
+    for escopo, coluna in ((ESCOPO_USUARIO, "usuario"), (ESCOPO_EMPRESA, "empresa")):
+        conn.execute(f"""
+            INSERT INTO rollup_mensal
+            (escopo, chave, mes, uploads, faturamento_total, soma_ticket, uploads_ticket, linhas)
+            SELECT ?, {coluna}, strftime('%Y-%m', ts_upload, 'unixepoch', 'localtime'),
+                   COUNT(*), COALESCE(SUM(faturamento_total), 0), COALESCE(SUM(ticket_medio), 0),
+                   COUNT(ticket_medio), COALESCE(SUM(linhas_processadas), 0)
+            FROM historico
+            WHERE {coluna} IS NOT NULL AND ts_upload > 0
+            GROUP BY {coluna}, strftime('%Y-%m', ts_upload, 'unixepoch', 'localtime')
+        """, (escopo,))
+
+
+def reconstruir_rollups():
+    """Refaz os rollups mensais do zero, pela fila do escritor."""
+    return armazenamento().escrever(_reconstruir_rollups).result()
+
+
+def tendencia_mensal(usuario=None, empresa=None, meses=12):
+    """
+    Faturamento total, uploads e ticket médio por mês, lidos só dos
+    rollups (nunca varre o histórico). Informe `usuario` ou `empresa`.
+    """
+    escopo, chave = (ESCOPO_EMPRESA, empresa) if empresa else (ESCOPO_USUARIO, usuario)
+    colunas = ["mes", "uploads", "faturamento_total", "ticket_medio"]
+    try:
+        with armazenamento().leitura() as conn:
+            linhas = conn.execute("""
+                SELECT mes, uploads, faturamento_total,
+                       CASE WHEN uploads_ticket > 0 THEN soma_ticket / uploads_ticket END
+                FROM rollup_mensal
+                WHERE escopo = ? AND chave = ?
+                ORDER BY mes DESC
+                LIMIT ?
+            """, (escopo, chave, int(meses))).fetchall()
+    except Exception as e:
+        logger.error("Erro ao carregar tendência: %s", e)
+        linhas = []
+    return pd.DataFrame(linhas[::-1], columns=colunas).set_index("mes")
+
 # ============================================================
 # CARREGAR HISTÓRICO
 # ============================================================
 
-def carregar_historico(usuario):
-    """Lê todo o histórico de um usuário específico."""
+COLUNAS_HISTORICO = ["data_upload", "nome_arquivo", "faturamento_total", "ticket_medio"]
+
+
+def pagina_historico(usuario, limite=LIMITE_PAGINA, cursor=None, inicio=None, fim=None):
+    """
+    Uma página do histórico, do mais recente para o mais antigo.
+
+    Paginação por cursor (keyset): `cursor` é o valor devolvido pela página
+    anterior, então o custo de cada página não cresce com o histórico.
+    `inicio`/`fim` filtram o período (datas inclusivas).
+
+    Retorna (df, proximo_cursor); proximo_cursor é None na última página.
+    """
+    condicoes = ["usuario = ?"]
+    params = [usuario]
+
+    ts_inicio, ts_fim = _para_epoch(inicio), _para_epoch(fim, fim=True)
+    if ts_inicio is not None:
+        condicoes.append("ts_upload >= ?")
+        params.append(ts_inicio)
+    if ts_fim is not None:
+        condicoes.append("ts_upload < ?")
+        params.append(ts_fim)
+    if cursor is not None:
+        ts_cursor, id_cursor = cursor
+        condicoes.append("(ts_upload < ? OR (ts_upload = ? AND id < ?))")
+        params.extend([ts_cursor, ts_cursor, id_cursor])
+
+    query = f"""
+        SELECT id, ts_upload, {", ".join(COLUNAS_HISTORICO)}
+        FROM historico
+        WHERE {" AND ".join(condicoes)}
+        ORDER BY ts_upload DESC, id DESC
+        LIMIT ?
+    """
+    params.append(int(limite) + 1)
+
+    try:
+        with armazenamento().leitura() as conn:
+            linhas = conn.execute(query, params).fetchall()
+    except Exception as e:
+        logger.error("Erro ao carregar histórico: %s", e)
+        return pd.DataFrame(columns=COLUNAS_HISTORICO).rename_axis("id"), None
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = (linhas[-1][1], linhas[-1][0])
+
+    df = pd.DataFrame(
+        [linha[2:] for linha in linhas],
+        columns=COLUNAS_HISTORICO,
+        index=pd.Index([linha[0] for linha in linhas], name="id")
+    )
+    return df, proximo
+
+
+def carregar_historico(usuario, limite=LIMITE_PAGINA, inicio=None, fim=None):
+    """Uploads mais recentes de um usuário (primeira página; índice = id do upload)."""
+    df, _ = pagina_historico(usuario, limite=limite, inicio=inicio, fim=fim)
+    return df
+
+
+def hash_do_upload(historico_id, usuario=None):
+    """hash_conteudo de um upload (restrito ao usuário, se informado) ou None."""
+    query = "SELECT hash_conteudo FROM historico WHERE id = ?"
+    params = [int(historico_id)]
+    if usuario is not None:
+        query += " AND usuario = ?"
+        params.append(usuario)
     try:
-        with get_connection() as conn:
-            query = """
-                SELECT 
-                    data_upload,
-                    nome_arquivo,
-                    faturamento_total,
-                    ticket_medio
-                FROM historico
-                WHERE usuario = ?
-                ORDER BY id DESC
-            """
-            df = pd.read_sql_query(query, conn, params=(usuario,))
-        return df
+        with armazenamento().leitura() as conn:
+            linha = conn.execute(query, params).fetchone()
+    except Exception as e:
+        logger.error("Erro ao consultar upload: %s", e)
+        return None
+    return linha[0] if linha else None
 
+# ============================================================
+# PERFIS E COMPARAÇÕES
+# ============================================================
+
+def carregar_perfil(historico_id):
+    """Perfil das colunas de um upload (quantis e top já decodificados)."""
+    try:
+        with armazenamento().leitura() as conn:
+            linhas = conn.execute(
+                f"SELECT {SQL_COLUNAS_PERFIL} FROM perfil_coluna WHERE historico_id = ?",
+                (int(historico_id),)  # ids vindos do pandas são numpy.int64
+            ).fetchall()
     except Exception as e:
-        st.error(f"Erro ao carregar histórico: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        logger.error("Erro ao carregar perfil: %s", e)
+        linhas = []
+
+    df = pd.DataFrame(linhas, columns=COLUNAS_PERFIL)
+    for col in ("quantis", "top"):
+        df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else None)
+    return df.set_index("coluna")
+
+
+def comparar_uploads(id_atual, id_anterior):
+    """
+    Compara soma, média e contagem das colunas numéricas de dois uploads.
+    Colunas presentes em só um dos uploads aparecem com o outro lado vazio.
+    """
+    metricas = ["tipo", "contagem", "soma", "media"]
+    atual = carregar_perfil(id_atual)[metricas]
+    anterior = carregar_perfil(id_anterior)[metricas]
+    atual = atual[atual["tipo"] == "numerica"].drop(columns="tipo")
+    anterior = anterior[anterior["tipo"] == "numerica"].drop(columns="tipo")
+
+    df = atual.join(anterior, how="outer", lsuffix="_atual", rsuffix="_anterior")
+    for metrica in ("soma", "media", "contagem"):
+        df[f"variacao_{metrica}_pct"] = [
+            variacao_pct(a, b) for a, b in zip(df[f"{metrica}_atual"], df[f"{metrica}_anterior"])
+        ]
+    return df
+
+
+def comparar_categorias(id_atual, id_anterior, coluna):
+    """Top categorias de `coluna` nos dois uploads, com as somas lado a lado."""
+    def top(historico_id):
+        perfil = carregar_perfil(historico_id)
+        if coluna not in perfil.index or not perfil.at[coluna, "top"]:
+            return pd.DataFrame(columns=["categoria", "contagem", "soma"]).set_index("categoria")
+        return pd.DataFrame(perfil.at[coluna, "top"], columns=["categoria", "contagem", "soma"]).set_index("categoria")
+
+    df = top(id_atual).join(top(id_anterior), how="outer", lsuffix="_atual", rsuffix="_anterior")
+    df["variacao_soma_pct"] = [variacao_pct(a, b) for a, b in zip(df["soma_atual"], df["soma_anterior"])]
+    return df.sort_values("soma_atual", ascending=False, na_position="last")
+
+
+def resumo_periodo(usuario, inicio=None, fim=None):
+    """
+    Soma, contagem e média ponderada de cada coluna numérica em todos os
+    uploads do período, direto dos perfis gravados.
+    """
+    condicoes = ["h.usuario = ?", "p.tipo = 'numerica'"]
+    params = [usuario]
+    ts_inicio, ts_fim = _para_epoch(inicio), _para_epoch(fim, fim=True)
+    if ts_inicio is not None:
+        condicoes.append("h.ts_upload >= ?")
+        params.append(ts_inicio)
+    if ts_fim is not None:
+        condicoes.append("h.ts_upload < ?")
+        params.append(ts_fim)
+
+    query = f"""
+        SELECT p.coluna, COUNT(*) AS uploads, SUM(p.contagem) AS contagem, SUM(p.soma) AS soma
+        FROM historico h JOIN perfil_coluna p ON p.historico_id = h.id
+        WHERE {" AND ".join(condicoes)}
+        GROUP BY p.coluna
+    """
+    try:
+        with armazenamento().leitura() as conn:
+            linhas = conn.execute(query, params).fetchall()
+    except Exception as e:
+        logger.error("Erro ao resumir período: %s", e)
+        linhas = []
+
+    df = pd.DataFrame(linhas, columns=["coluna", "uploads", "contagem", "soma"]).set_index("coluna")
+    df["media"] = df["soma"] / df["contagem"].where(df["contagem"] > 0)
+    return df
+
+
+def comparar_periodos(usuario, periodo_atual, periodo_anterior):
+    """
+    Compara dois períodos (cada um um par (inicio, fim)), por exemplo mês
+    corrente contra o mês anterior, sem reabrir nenhuma planilha.
+    """
+    atual = resumo_periodo(usuario, *periodo_atual)
+    anterior = resumo_periodo(usuario, *periodo_anterior)
+    df = atual.join(anterior, how="outer", lsuffix="_atual", rsuffix="_anterior")
+    for metrica in ("soma", "media"):
+        df[f"variacao_{metrica}_pct"] = [
+            variacao_pct(a, b) for a, b in zip(df[f"{metrica}_atual"], df[f"{metrica}_anterior"])
+        ]
+    return df
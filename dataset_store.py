@@ -0,0 +1,300 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# As sessões recebem cópias rasas (df.copy(deep=False)) do mesmo DataFrame,
+# o que só é seguro com copy-on-write: padrão a partir do pandas 3, ligado
+# aqui nas versões anteriores
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# ============================================================
+# ARMAZÉM DE DATASETS DO PROCESSO (deduplicado por conteúdo)
+# ============================================================
+
+LIMITE_BYTES = int(os.environ.get("PLATERO_DATASETS_MB", "512")) * 1024 * 1024
+DIR_SPILL = os.environ.get("PLATERO_DATASETS_SPILL", ".cache_datasets")
+LIMITE_SPILL_BYTES = int(os.environ.get("PLATERO_DATASETS_SPILL_MB", "2048")) * 1024 * 1024
+TTL_REFERENCIA = 2 * 3600   # sessão sem atividade por 2h deixa de segurar o dataset
+MAX_CARDINALIDADE_CATEGORIA = 0.5  # texto vira category se únicos <= 50% das linhas
+
+
+def chave_conteudo(dados, *partes):
+    """Hash dos bytes do upload + parâmetros que mudam o resultado (ex.: modo)."""
+    h = hashlib.sha256(dados)
+    for parte in partes:
+        h.update(b"\0" + str(parte).encode("utf-8"))
+    return h.hexdigest()
+
+
+def compactar(df):
+    """
+    Reduz a memória sem mudar o significado dos dados: texto repetitivo vira
+    category e inteiros descem para int32 quando cabem. Floats ficam em
+    float64 (valores monetários não perdem precisão).
+    """
+    if df.columns.has_duplicates:
+        return df
+
+    colunas = {}
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_integer_dtype(serie) and not pd.api.types.is_bool_dtype(serie) and len(serie):
+            if serie.min() >= -2**31 and serie.max() < 2**31 and serie.dtype.itemsize > 4:
+                colunas[col] = serie.astype("int32")
+        elif pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            if len(serie) and serie.nunique(dropna=True) <= MAX_CARDINALIDADE_CATEGORIA * len(serie):
+                try:
+                    colunas[col] = serie.astype("category")
+                except TypeError:
+                    pass  # valores não hasheáveis: mantém como está
+    if not colunas:
+        return df
+    df = df.copy(deep=False)
+    for col, serie in colunas.items():
+        df[col] = serie
+    return df
+
+
+def tamanho_bytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class _Entrada:
+    __slots__ = ("df", "tamanho", "donos", "criado_em")
+
+    def __init__(self, df, tamanho):
+        self.df = df
+        self.tamanho = tamanho
+        self.donos = {}   # dono -> último acesso
+        self.criado_em = time.time()
+
+
+class DatasetStore:
+    """
+    DataFrames limpos compartilhados entre sessões, endereçados por hash.
+
+    Cada sessão recebe uma cópia rasa (pandas com copy-on-write: quem
+    alterar a sua cópia não afeta as demais). Sessões são donas das chaves
+    que usam; acima do orçamento de memória, as entradas sem dono saem em
+    ordem LRU e são gravadas em Parquet, de onde voltam sem novo parse.
+    """
+
+    def __init__(self, limite_bytes=LIMITE_BYTES, diretorio_spill=DIR_SPILL,
+                 limite_spill_bytes=LIMITE_SPILL_BYTES, ttl_referencia=TTL_REFERENCIA):
+        self.limite_bytes = limite_bytes
+        self.diretorio_spill = diretorio_spill
+        self.limite_spill_bytes = limite_spill_bytes
+        self.ttl_referencia = ttl_referencia
+        self._entradas = OrderedDict()
+        self._carregando = {}
+        self._lock = threading.Lock()
+        self._contadores = {"acertos": 0, "carregamentos": 0, "recuperados_disco": 0, "despejos": 0, "spills": 0}
+
+    # ------------------------------------------------------------
+    # Consulta e carga
+    # ------------------------------------------------------------
+
+    def obter(self, chave, dono=None):
+        """Cópia rasa do dataset (memória ou disco) ou None."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._usar(chave, entrada, dono)
+                self._contadores["acertos"] += 1
+                return entrada.df.copy(deep=False)
+
+        df = self._ler_spill(chave)
+        if df is None:
+            return None
+        tamanho = tamanho_bytes(df)
+        with self._lock:
+            self._contadores["recuperados_disco"] += 1
+            copia, despejados = self._guardar(chave, df, tamanho, dono)
+        self._gravar_spills(despejados)
+        return copia
+
+    def obter_ou_carregar(self, chave, carregar, dono=None):
+        """
+        Retorna (df, erro). Se a chave não existe, chama `carregar()` — que
+        segue o padrão (df, erro) dos carregadores — uma única vez, mesmo
+        com várias sessões pedindo o mesmo conteúdo ao mesmo tempo.
+        """
+        while True:
+            df = self.obter(chave, dono)
+            if df is not None:
+                return df, None
+
+            with self._lock:
+                evento = self._carregando.get(chave)
+                if evento is None:
+                    evento = self._carregando[chave] = threading.Event()
+                    responsavel = True
+                else:
+                    responsavel = False
+
+            if not responsavel:
+                evento.wait()
+                continue  # quem carregou já guardou (ou falhou; então tentamos nós)
+
+            try:
+                df, erro = carregar()
+                if erro or df is None:
+                    return df, erro
+                df = compactar(df)
+                tamanho = tamanho_bytes(df)
+                with self._lock:
+                    self._contadores["carregamentos"] += 1
+                    copia, despejados = self._guardar(chave, df, tamanho, dono)
+                self._gravar_spills(despejados)
+                return copia, None
+            finally:
+                with self._lock:
+                    self._carregando.pop(chave, None)
+                evento.set()
+
+    def liberar(self, dono, chave=None):
+        """A sessão deixa de segurar `chave` (ou todas as suas chaves)."""
+        with self._lock:
+            alvos = [chave] if chave is not None else list(self._entradas)
+            for alvo in alvos:
+                entrada = self._entradas.get(alvo)
+                if entrada is not None:
+                    entrada.donos.pop(dono, None)
+            despejados = self._aplicar_orcamento()
+        self._gravar_spills(despejados)
+
+    # ------------------------------------------------------------
+    # Internos (chamados com o lock)
+    # ------------------------------------------------------------
+
+    def _usar(self, chave, entrada, dono):
+        self._entradas.move_to_end(chave)
+        if dono is not None:
+            entrada.donos[dono] = time.time()
+
+    def _guardar(self, chave, df, tamanho, dono):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            entrada = self._entradas[chave] = _Entrada(df, tamanho)
+        self._usar(chave, entrada, dono)
+        return entrada.df.copy(deep=False), self._aplicar_orcamento()
+
+    def _aplicar_orcamento(self):
+        """Despeja entradas sem dono (LRU) até caber; retorna [(chave, df)] a gravar."""
+        agora = time.time()
+        for entrada in self._entradas.values():
+            for dono, visto in list(entrada.donos.items()):
+                if agora - visto > self.ttl_referencia:
+                    del entrada.donos[dono]
+
+        despejados = []
+        total = sum(e.tamanho for e in self._entradas.values())
+        for chave in list(self._entradas):  # do menos para o mais recente
+            if total <= self.limite_bytes:
+                break
+            entrada = self._entradas[chave]
+            if entrada.donos:
+                continue
+            despejados.append((chave, entrada.df))
+            del self._entradas[chave]
+            total -= entrada.tamanho
+            self._contadores["despejos"] += 1
+        return despejados
+
+    # ------------------------------------------------------------
+    # Spill em disco (Parquet, fora do lock)
+    # ------------------------------------------------------------
+
+    def _gravar_spills(self, despejados):
+        for chave, df in despejados:
+            self._gravar_spill(chave, df)
+
+    def _caminho_spill(self, chave):
+        return os.path.join(self.diretorio_spill, chave + ".parquet")
+
+    def _gravar_spill(self, chave, df):
+        if not self.diretorio_spill:
+            return
+        caminho = self._caminho_spill(chave)
+        if os.path.exists(caminho):
+            return
+        try:
+            os.makedirs(self.diretorio_spill, exist_ok=True)
+            tmp = caminho + ".tmp"
+            df.to_parquet(tmp)
+            os.replace(tmp, caminho)
+            with self._lock:
+                self._contadores["spills"] += 1
+            self._limitar_spill()
+        except Exception as e:  # pyarrow ausente ou colunas não serializáveis
+            logger.warning("Dataset %s não pôde ir para o disco: %s", chave[:12], e)
+
+    def _ler_spill(self, chave):
+        if not self.diretorio_spill:
+            return None
+        caminho = self._caminho_spill(chave)
+        if not os.path.exists(caminho):
+            return None
+        try:
+            df = pd.read_parquet(caminho)
+            os.utime(caminho, None)
+            return df
+        except Exception as e:
+            logger.warning("Spill %s ilegível, descartado: %s", chave[:12], e)
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+            return None
+
+    def _limitar_spill(self):
+        arquivos = []
+        with os.scandir(self.diretorio_spill) as it:
+            for item in it:
+                if item.is_file() and item.name.endswith(".parquet"):
+                    info = item.stat()
+                    arquivos.append((info.st_mtime, info.st_size, item.path))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_spill_bytes:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------
+
+    def metricas(self):
+        with self._lock:
+            return {
+                **self._contadores,
+                "datasets": len(self._entradas),
+                "bytes": sum(e.tamanho for e in self._entradas.values()),
+                "limite_bytes": self.limite_bytes,
+                "com_dono": sum(1 for e in self._entradas.values() if e.donos),
+            }
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def store_global():
+    """Armazém único do processo, compartilhado por todas as sessões."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = DatasetStore()
+        return _STORE
@@ -0,0 +1,95 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# EXPLORAÇÃO POR AMOSTRA ESTRATIFICADA
+# ============================================================
+#
+# Com milhões de linhas, cada troca de eixo no dashboard reagrupava a base
+# inteira. No modo exploração os gráficos saem de uma amostra estratificada
+# pelo eixo X: cada categoria entra com uma fração das suas linhas (no
+# mínimo MINIMO_POR_ESTRATO, ou todas se tiver menos) e cada linha carrega
+# o peso N_categoria / n_categoria. Somando `valor * peso` chega-se a uma
+# estimativa dos totais por categoria e por data — valores aproximados, e
+# marcados como tal na tela. KPIs e PDF continuam na base completa.
+#
+# O tamanho da amostra vem de uma meta de latência: um agrupamento numa
+# fatia da base mede o custo por linha, e a amostra fica com as linhas que
+# cabem em ALVO_MS.
+
+LINHAS_EXPLORACAO = int(os.environ.get("PLATERO_LINHAS_EXPLORACAO", "1000000"))  # bases acima disso
+ALVO_MS = float(os.environ.get("PLATERO_ALVO_EXPLORACAO_MS", "300"))
+LINHAS_CALIBRACAO = 200_000
+MINIMO_LINHAS = 20_000
+MINIMO_POR_ESTRATO = 30
+COLUNA_PESO = "_peso_amostra"
+
+
+def linhas_para_alvo(df, eixo_x, eixo_y, alvo_ms=ALVO_MS):
+    """Quantas linhas um agrupamento por `eixo_x` processa dentro de `alvo_ms`."""
+    fatia = df.iloc[:LINHAS_CALIBRACAO]
+    inicio = time.perf_counter()
+    fatia.groupby(fatia[eixo_x].astype(str))[eixo_y].sum(min_count=1)
+    custo_por_linha = max(time.perf_counter() - inicio, 1e-6) / max(len(fatia), 1)
+    return max(MINIMO_LINHAS, int(alvo_ms / 1000 / custo_por_linha))
+
+
+def amostra_estratificada(df, coluna, linhas, semente=0):
+    """
+    Amostra de ~`linhas` linhas estratificada por `coluna`, com COLUNA_PESO
+    (N/n do estrato). Sorteio de Bernoulli por linha, em O(N) e sem ordenar.
+    None quando a amostra não seria menor que a base (muitos estratos).
+    """
+    codigos, _ = pd.factorize(df[coluna].astype(str), use_na_sentinel=False)
+    tamanhos = np.bincount(codigos)
+    minimo = min(MINIMO_POR_ESTRATO, max(1, linhas // len(tamanhos)))
+    fracao = linhas / len(df)
+    alvos = np.minimum(tamanhos, np.maximum(np.ceil(tamanhos * fracao), minimo))
+    if alvos.sum() >= len(df) * 0.8:
+        return None
+
+    rng = np.random.default_rng(semente)
+    sorteio = rng.random(len(df)) < (alvos / tamanhos)[codigos]
+    sorteados = np.bincount(codigos[sorteio], minlength=len(tamanhos))
+    # Peso pelo que de fato saiu do sorteio: o total de cada estrato fecha
+    pesos = tamanhos / np.maximum(sorteados, 1)
+
+    amostra = df[sorteio].copy()
+    amostra[COLUNA_PESO] = pesos[codigos[sorteio]]
+    return amostra
+
+
+def ponderar(amostra, eixo_y):
+    """Amostra com `eixo_y` multiplicado pelo peso: suas somas estimam as da base."""
+    ponderada = amostra.drop(columns=COLUNA_PESO)
+    ponderada[eixo_y] = amostra[eixo_y] * amostra[COLUNA_PESO]
+    return ponderada
+
+
+class Exploracao:
+    """
+    Amostras de uma base para o dashboard, uma por eixo X (estratificada
+    por ele), sorteadas na primeira vez que o eixo é escolhido.
+    """
+
+    def __init__(self, df, alvo_ms=ALVO_MS, semente=0):
+        self.df = df
+        self.alvo_ms = alvo_ms
+        self.semente = semente
+        self._amostras = {}
+
+    def amostra(self, eixo_x, eixo_y):
+        """(amostra ponderada por `eixo_y`, linhas na amostra) ou None se valer a base inteira."""
+        if eixo_x not in self._amostras:
+            linhas = linhas_para_alvo(self.df, eixo_x, eixo_y, self.alvo_ms)
+            self._amostras[eixo_x] = (
+                amostra_estratificada(self.df, eixo_x, linhas, self.semente)
+                if linhas < len(self.df) else None
+            )
+        amostra = self._amostras[eixo_x]
+        if amostra is None:
+            return None
+        return ponderar(amostra, eixo_y), len(amostra)
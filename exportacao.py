@@ -0,0 +1,163 @@
+import gzip
+import logging
+import os
+import tempfile
+
+import pandas as pd
+
+from ingestao import DIR_SPOOL
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# EXPORTAÇÃO EM BLOCOS (CSV.GZ / PARQUET / XLSX)
+# ============================================================
+#
+# O dataset limpo (ou um agregado) é gravado num temporário em disco em
+# blocos de LINHAS_POR_BLOCO linhas. Nenhum arquivo completo é montado em
+# memória: a memória extra fica em um bloco convertido de cada vez (e no
+# buffer do compressor). O download lê o temporário já compactado, que é
+# bem menor que o DataFrame.
+
+LINHAS_POR_BLOCO = 50_000
+LINHAS_POR_ABA_XLSX = 1_048_575  # limite do Excel, descontado o cabeçalho
+PREFIXO_EXPORTACAO = "platero_export_"
+COMPRESSAO_GZIP = 3  # bem mais rápido que o padrão (9), arquivo pouco maior
+
+FORMATOS = {
+    "csv.gz": ("CSV compactado (.csv.gz)", "application/gzip"),
+    "parquet": ("Parquet (.parquet)", "application/vnd.apache.parquet"),
+    "xlsx": ("Excel (.xlsx)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def _pyarrow():
+    """pyarrow é opcional: sem ele não há exportação em Parquet."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        return pa, pq
+    except ImportError:
+        return None
+
+
+def formatos_disponiveis():
+    return [f for f in FORMATOS if f != "parquet" or _pyarrow() is not None]
+
+
+def _blocos(df, linhas_por_bloco):
+    for inicio in range(0, len(df), linhas_por_bloco):
+        yield df.iloc[inicio:inicio + linhas_por_bloco]
+
+
+def _gravar_csv_gz(df, caminho, linhas_por_bloco, avancar):
+    # BOM para o Excel reconhecer UTF-8; ";" como na planilha modelo. Cada
+    # bloco vira texto de uma vez e entra no gzip numa única escrita (o
+    # to_csv direto no arquivo compactado faz milhares de escritas pequenas).
+    with gzip.open(caminho, "wb", compresslevel=COMPRESSAO_GZIP) as f:
+        f.write("\ufeff".encode("utf-8"))
+        for i, bloco in enumerate(_blocos(df, linhas_por_bloco)):
+            f.write(bloco.to_csv(sep=";", index=False, header=i == 0).encode("utf-8"))
+            avancar(len(bloco))
+        if df.empty:
+            f.write(df.to_csv(sep=";", index=False).encode("utf-8"))
+
+
+def _gravar_parquet(df, caminho, linhas_por_bloco, avancar):
+    pa, pq = _pyarrow()
+    # Esquema pelo primeiro bloco; coluna toda nula nele ganha o tipo dos
+    # primeiros valores preenchidos, para os blocos seguintes caberem
+    esquema = pa.Schema.from_pandas(df.iloc[:linhas_por_bloco], preserve_index=False)
+    for i, campo in enumerate(esquema):
+        if pa.types.is_null(campo.type):
+            preenchidos = df[campo.name].dropna().iloc[:1000]
+            if len(preenchidos):
+                esquema = esquema.set(i, campo.with_type(pa.array(preenchidos.tolist()).type))
+    with pq.ParquetWriter(caminho, esquema, compression="zstd") as escritor:
+        for bloco in _blocos(df, linhas_por_bloco):
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+            avancar(len(bloco))
+
+
+def _gravar_xlsx(df, caminho, linhas_por_bloco, avancar, nome_aba):
+    from openpyxl import Workbook
+
+    # write_only: as linhas vão para o disco à medida que são anexadas
+    wb = Workbook(write_only=True)
+    cabecalho = [str(c) for c in df.columns]
+    aba, linhas_na_aba, abas = None, 0, 0
+    for bloco in _blocos(df, linhas_por_bloco):
+        valores = bloco.astype(object).where(bloco.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            if aba is None or linhas_na_aba >= LINHAS_POR_ABA_XLSX:
+                abas += 1
+                aba = wb.create_sheet(nome_aba if abas == 1 else f"{nome_aba} ({abas})")
+                aba.append(cabecalho)
+                linhas_na_aba = 0
+            aba.append(linha)
+            linhas_na_aba += 1
+        avancar(len(bloco))
+    if aba is None:
+        wb.create_sheet(nome_aba).append(cabecalho)
+    wb.save(caminho)
+
+
+def exportar(df, formato, progresso=None, nome_aba="Dados", linhas_por_bloco=LINHAS_POR_BLOCO, diretorio=None):
+    """
+    Grava `df` no `formato` ("csv.gz", "parquet" ou "xlsx") num temporário
+    e retorna o caminho (quem chama apaga depois). `progresso(fracao,
+    mensagem)` é chamado a cada bloco; se levantar exceção (cancelamento),
+    o temporário é removido.
+    """
+    if formato not in formatos_disponiveis():
+        raise ValueError(f"Formato de exportação indisponível: {formato}")
+    if progresso is None:
+        progresso = lambda fracao, mensagem=None: None
+
+    total = max(len(df), 1)
+    feitas = 0
+
+    def avancar(linhas):
+        nonlocal feitas
+        feitas += linhas
+        progresso(min(feitas / total, 0.99), f"{feitas:,} de {len(df):,} linhas")
+
+    fd, caminho = tempfile.mkstemp(prefix=PREFIXO_EXPORTACAO, suffix=f".{formato}", dir=diretorio or DIR_SPOOL)
+    os.close(fd)
+    try:
+        if formato == "csv.gz":
+            _gravar_csv_gz(df, caminho, linhas_por_bloco, avancar)
+        elif formato == "parquet":
+            _gravar_parquet(df, caminho, linhas_por_bloco, avancar)
+        else:
+            _gravar_xlsx(df, caminho, linhas_por_bloco, avancar, nome_aba)
+    except BaseException:
+        remover_exportacao(caminho)
+        raise
+    progresso(1.0, "Arquivo pronto")
+    return caminho
+
+
+def remover_exportacao(caminho):
+    try:
+        os.remove(caminho)
+    except OSError as e:
+        if os.path.exists(caminho):
+            logger.warning("Temporário de exportação %s não removido: %s", caminho, e)
+
+# ============================================================
+# AGREGADOS PARA EXPORTAR
+# ============================================================
+
+def ranking_completo(df, eixo_x, eixo_y):
+    """Todas as categorias de `eixo_x` (não só o top N do gráfico), da maior soma para a menor."""
+    valores = pd.to_numeric(df[eixo_y], errors="coerce")
+    grupos = valores.groupby(df[eixo_x].astype(str))
+    ranking = pd.DataFrame({
+        f"{eixo_y} (soma)": grupos.sum(min_count=1),
+        "Registros": grupos.size(),
+        "Média": grupos.mean(),
+    }).sort_values(f"{eixo_y} (soma)", ascending=False)
+    total = valores.sum()
+    ranking["Participação (%)"] = ranking[f"{eixo_y} (soma)"] / total * 100 if total else 0.0
+    return ranking.rename_axis(eixo_x).reset_index()
@@ -0,0 +1,173 @@
+import io
+import os
+import threading
+
+from fontTools import ttLib
+from fpdf import FPDF, FPDF_VERSION
+from fpdf.fonts import TTFFont, SubsetMap
+
+# ============================================================
+# REGISTRO DE FONTES EMBARCADAS (SEM REDE)
+# ============================================================
+
+# As fontes DejaVu são distribuídas junto com o projeto
+DIR_FONTES = os.path.dirname(os.path.abspath(__file__))
+
+FAMILIAS = {
+    "DejaVu": {
+        "": "DejaVuSans.ttf",
+        "B": "DejaVuSans-Bold.ttf",
+        "I": "DejaVuSans-Oblique.ttf",
+        "BI": "DejaVuSans-BoldOblique.ttf",
+    },
+    "DejaVuCondensed": {
+        "": "DejaVuSansCondensed.ttf",
+        "B": "DejaVuSansCondensed-Bold.ttf",
+        "I": "DejaVuSansCondensed-Oblique.ttf",
+        "BI": "DejaVuSansCondensed-BoldOblique.ttf",
+    },
+    "DejaVuMono": {
+        "": "DejaVuSansMono.ttf",
+        "B": "DejaVuSansMono-Bold.ttf",
+        "I": "DejaVuSansMono-Oblique.ttf",
+        "BI": "DejaVuSansMono-BoldOblique.ttf",
+    },
+    "DejaVuSerif": {
+        "": "DejaVuSerif.ttf",
+        "B": "DejaVuSerif-Bold.ttf",
+        "I": "DejaVuSerif-Italic.ttf",
+        "BI": "DejaVuSerif-BoldItalic.ttf",
+    },
+}
+
+# O clone das métricas mexe em atributos internos do TTFFont; só é usado
+# na série do fpdf2 fixada no requirements.txt. Fora dela, add_font público.
+SERIE_FPDF_CLONAVEL = "2.8."
+CLONE_SUPORTADO = FPDF_VERSION.startswith(SERIE_FPDF_CLONAVEL)
+
+# Cache do processo: caminho absoluto -> (fonte modelo já analisada, bytes do TTF)
+_MODELOS = {}
+_LOCK = threading.Lock()
+
+
+def caminho_fonte(arquivo):
+    """Resolve o caminho absoluto de um arquivo de fonte embarcado (ou None)."""
+    caminho = os.path.join(DIR_FONTES, arquivo)
+    return caminho if os.path.isfile(caminho) else None
+
+
+def _carregar_modelo(caminho, estilo):
+    """
+    Analisa o TTF uma única vez por processo e guarda as métricas prontas.
+    """
+    with _LOCK:
+        modelo = _MODELOS.get(caminho)
+        if modelo is not None:
+            return modelo
+
+        with open(caminho, "rb") as f:
+            dados = f.read()
+
+        pdf_temp = FPDF()
+        pdf_temp.add_font("modelo", estilo, caminho)
+        fonte = pdf_temp.fonts["modelo" + estilo]
+
+        # Fontes sem glifo .notdef são corrigidas em memória pelo FPDF;
+        # nesse caso o clone a partir dos bytes originais não seria fiel.
+        original = ttLib.TTFont(io.BytesIO(dados), lazy=True)
+        clonavel = "glyf" not in original or ".notdef" in original["glyf"]
+
+        modelo = (fonte, dados, clonavel)
+        _MODELOS[caminho] = modelo
+        return modelo
+
+
+def _clonar_fonte(pdf, modelo, dados, fontkey):
+    """
+    Cria a fonte do documento reaproveitando as métricas do modelo.
+
+    Apenas o que muda por documento é recriado: o TTFont (que o FPDF
+    subconjunta na saída, embutindo só os glifos usados) e o mapa de subset.
+    """
+    fonte = TTFFont.__new__(TTFFont)
+    for attr in TTFFont.__slots__:
+        if hasattr(modelo, attr):
+            setattr(fonte, attr, getattr(modelo, attr))
+
+    fonte.i = len(pdf.fonts) + 1
+    fonte.fontkey = fontkey
+    fonte.ttfont = ttLib.TTFont(io.BytesIO(dados), recalcTimestamp=False, lazy=True)
+    fonte.missing_glyphs = []
+    fonte.biggest_size_pt = 0
+    fonte._hbfont = None
+    fonte.subset = SubsetMap(fonte)
+    return fonte
+
+
+def registrar_fontes(pdf, familia="DejaVu", estilos=("", "B")):
+    """
+    Registra os estilos pedidos da família no PDF.
+
+    Só os estilos registrados entram no documento, por isso o padrão é
+    apenas regular e negrito. Retorna True se o estilo regular foi registrado.
+    """
+    arquivos = FAMILIAS.get(familia)
+    if not arquivos:
+        return False
+
+    registrou_regular = False
+    for estilo in estilos:
+        arquivo = arquivos.get(estilo)
+        if not arquivo:
+            continue
+        caminho = caminho_fonte(arquivo)
+        if not caminho:
+            continue
+
+        fontkey = f"{familia.lower()}{estilo}"
+        if fontkey in pdf.fonts:
+            registrou_regular = registrou_regular or estilo == ""
+            continue
+
+        try:
+            modelo, dados, clonavel = _carregar_modelo(caminho, estilo)
+            if clonavel and CLONE_SUPORTADO:
+                pdf.fonts[fontkey] = _clonar_fonte(pdf, modelo, dados, fontkey)
+            else:
+                pdf.add_font(familia, estilo, caminho)
+        except Exception:
+            # Fallback: caminho padrão do FPDF, sem cache
+            try:
+                pdf.add_font(familia, estilo, caminho)
+            except Exception:
+                continue
+
+        if estilo == "":
+            registrou_regular = True
+
+    return registrou_regular
+
+
+def caracteres_suportados(familia="DejaVu"):
+    """Conjunto de code points que o estilo regular da família consegue desenhar."""
+    caminho = caminho_fonte(FAMILIAS.get(familia, {}).get("", ""))
+    if not caminho:
+        return frozenset()
+    modelo, _, _ = _carregar_modelo(caminho, "")
+    return frozenset(modelo.cmap)
+
+
+def pre_carregar_fontes(familias=("DejaVu",), estilos=("", "B")):
+    """Aquece o cache de fontes (útil ao iniciar workers)."""
+    for familia in familias:
+        arquivos = FAMILIAS.get(familia, {})
+        for estilo in estilos:
+            caminho = caminho_fonte(arquivos.get(estilo, ""))
+            if caminho:
+                _carregar_modelo(caminho, estilo)
+
+
+def limpar_cache_fontes():
+    """Descarta as fontes analisadas em memória."""
+    with _LOCK:
+        _MODELOS.clear()
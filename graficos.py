@@ -0,0 +1,173 @@
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from calendario import Calendario
+
+# ============================================================
+# GRÁFICOS DO DASHBOARD E DO PDF (sem dependência do Streamlit)
+# ============================================================
+
+def agrupar_por_categoria(df, eixo_x, eixo_y, top_n=10):
+    """Soma `eixo_y` por `eixo_x` e devolve (df_temp, top N ordenado)."""
+    df_temp = df.copy()
+    df_temp[eixo_x] = df_temp[eixo_x].astype(str)
+
+    df_grouped = (
+        df_temp.groupby(eixo_x)[eixo_y]
+        .sum(min_count=1)
+        .reset_index()
+    )
+    df_grouped = df_grouped.sort_values(by=eixo_y, ascending=False).head(top_n)
+    return df_temp, df_grouped
+
+
+def grafico_ranking(df_grouped, eixo_x, eixo_y):
+    fig1, ax1 = plt.subplots(figsize=(8, 4))
+    sns.barplot(
+        data=df_grouped,
+        x=eixo_x,
+        y=eixo_y,
+        palette="viridis",
+        ax=ax1
+    )
+    ax1.set_title(f"Ranking: {eixo_y} por {eixo_x}")
+    ax1.tick_params(axis='x', rotation=45)
+
+    for container in ax1.containers:
+        ax1.bar_label(container, fmt='%.0f', padding=3)
+
+    plt.tight_layout()
+    return fig1
+
+
+def coluna_tempo(datas, eixo_x):
+    """Coluna da linha do tempo: o próprio eixo X se for data/ano, senão a primeira data (ou None)."""
+    if eixo_x in datas or "ANO" in eixo_x.upper():
+        return eixo_x
+    return datas[0] if datas else None
+
+
+def agrupar_do_motor(motor, eixo_x, eixo_y, datas, top_n=10):
+    """
+    Como agrupar_por_categoria, mas a partir dos agregados de um motor
+    incremental: df_temp já vem somado por `coluna_tempo`. None se o
+    motor não mantém `eixo_x` (quem chama volta ao DataFrame).
+    """
+    if not motor.cobre(eixo_x, eixo_y):
+        return None
+    df_grouped = motor.agrupar(eixo_x, eixo_y, top_n).reset_index()
+
+    col_tempo = coluna_tempo(datas, eixo_x)
+    if col_tempo is None or not motor.cobre(col_tempo, eixo_y):
+        df_temp = pd.DataFrame(columns=[eixo_x, eixo_y])
+    elif col_tempo in motor.datas:
+        df_temp = motor.serie_temporal(col_tempo, eixo_y).reset_index()
+    else:
+        df_temp = motor.agrupar(col_tempo, eixo_y).reset_index()
+    return df_temp, df_grouped
+
+
+def grafico_evolucao(df_temp, datas, eixo_x, eixo_y, calendario=None, nivel="dia"):
+    """
+    Linha do tempo no nível do calendário (dia, semana, mês...); retorna
+    None quando não há coluna temporal. Com `calendario` (da base completa)
+    a série é uma consulta aos totais já calculados.
+    """
+    col_tempo = coluna_tempo(datas, eixo_x)
+    if col_tempo is None or col_tempo not in df_temp.columns:
+        return None
+
+    if col_tempo in datas:
+        if calendario is None:
+            calendario = Calendario(df_temp)
+        df_tempo = calendario.serie(col_tempo, eixo_y, nivel).reset_index()
+    else:
+        df_tempo = df_temp.copy()
+        df_tempo[col_tempo] = pd.to_datetime(df_tempo[col_tempo], errors="coerce")
+        df_tempo = df_tempo.dropna(subset=[col_tempo])
+
+        df_tempo = (
+            df_tempo.groupby(col_tempo)[eixo_y]
+            .sum(min_count=1)
+            .reset_index()
+            .sort_values(col_tempo)
+        )
+
+    fig2, ax2 = plt.subplots(figsize=(8, 4))
+    sns.lineplot(
+        data=df_tempo,
+        x=col_tempo,
+        y=eixo_y,
+        marker="o",
+        ax=ax2
+    )
+    ax2.set_title(f"Evolução: {eixo_y}")
+    ax2.tick_params(axis='x', rotation=45)
+    ax2.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig2
+
+
+def grafico_share(df_grouped, eixo_x, eixo_y, top_n):
+    """Pizza do top N; retorna None quando não há valores positivos."""
+    valores = df_grouped[eixo_y].clip(lower=0)  # evita valores negativos
+    if not valores.sum() > 0:
+        return None
+
+    fig3, ax3 = plt.subplots(figsize=(6, 4))
+    ax3.pie(
+        valores,
+        labels=df_grouped[eixo_x],
+        autopct='%1.1f%%',
+        startangle=90,
+        colors=sns.color_palette("pastel")
+    )
+    ax3.set_title(f"Share Top {top_n}")
+    plt.tight_layout()
+    return fig3
+
+
+def gerar_figuras(df_temp, df_grouped, datas, eixo_x, eixo_y, top_n=10, calendario=None, nivel="dia"):
+    """
+    Monta os três gráficos padrão (`calendario` e `nivel` vão para a
+    linha do tempo).
+
+    Retorna (figs_para_pdf, graficos), onde `graficos` mapeia
+    "ranking", "evolucao" e "share" para a figura (ou None).
+    """
+    figs_para_pdf = []
+    graficos = {"ranking": None, "evolucao": None, "share": None}
+
+    # GRÁFICO 1 — BARRAS
+    try:
+        graficos["ranking"] = grafico_ranking(df_grouped, eixo_x, eixo_y)
+        figs_para_pdf.append(graficos["ranking"])
+    except Exception:
+        figs_para_pdf.append(plt.figure())
+
+    # GRÁFICO 2 — LINHA DO TEMPO
+    try:
+        graficos["evolucao"] = grafico_evolucao(df_temp, datas, eixo_x, eixo_y, calendario, nivel)
+        if graficos["evolucao"] is not None:
+            figs_para_pdf.append(graficos["evolucao"])
+    except Exception:
+        pass
+
+    # GRÁFICO 3 — PIZZA
+    try:
+        graficos["share"] = grafico_share(df_grouped, eixo_x, eixo_y, top_n)
+        figs_para_pdf.append(graficos["share"] if graficos["share"] is not None else plt.figure())
+    except Exception:
+        figs_para_pdf.append(plt.figure())
+
+    return figs_para_pdf, graficos
+
+
+def fechar_figuras(figs):
+    """Libera a memória das figuras (essencial em processamento em lote)."""
+    for fig in figs:
+        if fig is not None:
+            plt.close(fig)
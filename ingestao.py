@@ -0,0 +1,845 @@
+import contextvars
+import csv
+import io
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import time
+import unicodedata
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import cache_dados
+from cleaner import (
+    carregar_e_limpar_inteligente, carregar_modo_seguro, converter_numeros, limpar_coluna_numerica,
+    encontrar_linha_cabecalho, extrair_tabela, limpar_tabela, ler_abas, ler_modo_seguro,
+)
+from dataset_store import MAX_CARDINALIDADE_CATEGORIA, compactar
+from instrumentacao import etapa
+from motor_consulta import MotorIncremental, encoding_da_amostra, separador_da_amostra
+
+# ============================================================
+# ESTRATÉGIA DE CARGA CONFORME A MEMÓRIA DISPONÍVEL
+# ============================================================
+#
+# Antes de ler o upload, estimamos quanto ele ocupará em memória (tamanho,
+# formato e uma amostra do início do arquivo) e escolhemos:
+#   - memoria: carga completa, como sempre foi;
+#   - lotes:   leitura em blocos (CSV em chunks, xlsx em streaming), cada
+#              bloco limpo e compactado antes do próximo;
+#   - amostra: só uma fração aleatória das linhas é mantida.
+# O orçamento é por sessão e nunca passa da memória livre da máquina.
+
+ORCAMENTO_SESSAO = int(os.environ.get("PLATERO_ORCAMENTO_SESSAO_MB", "1024")) * 1024 * 1024
+FRACAO_MEMORIA_LIVRE = 0.8
+BYTES_AMOSTRA = 1024 * 1024   # início do arquivo usado na estimativa
+FATOR_PICO = 3                # leitura + cópias da limpeza, sobre o DataFrame de texto
+FATOR_PICO_XLSX = 6           # openpyxl cria um objeto Python por célula
+BYTES_LINHA_XLSX = 30         # sem dimensão gravada na aba, estimamos pelo tamanho
+BYTES_NUMERO = 8
+BYTES_CATEGORIA = 4
+LINHAS_LOTE_MIN, LINHAS_LOTE_MAX = 1_000, 500_000
+FRACAO_MINIMA = 0.001
+
+MEMORIA = "memoria"
+LOTES = "lotes"
+AMOSTRA = "amostra"
+DESCRICOES = {
+    MEMORIA: "carga completa em memória",
+    LOTES: "leitura em lotes com compactação",
+    AMOSTRA: "amostra aleatória das linhas",
+}
+
+
+def memoria_livre():
+    """MemAvailable do Linux em bytes (None em outros sistemas)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for linha in f:
+                if linha.startswith("MemAvailable:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def orcamento_efetivo(orcamento=None):
+    orcamento = ORCAMENTO_SESSAO if orcamento is None else orcamento
+    livre = memoria_livre()
+    return orcamento if livre is None else min(orcamento, int(livre * FRACAO_MEMORIA_LIVRE))
+
+
+def _tamanho(arquivo):
+    tamanho = getattr(arquivo, "size", None)
+    if tamanho is None:
+        posicao = arquivo.tell()
+        arquivo.seek(0, os.SEEK_END)
+        tamanho = arquivo.tell()
+        arquivo.seek(posicao)
+    return int(tamanho)
+
+
+def _custos_por_linha(amostra):
+    """Bytes por linha da amostra como texto lido e depois de limpa e compactada."""
+    n = max(len(amostra), 1)
+    texto = amostra.memory_usage(deep=True, index=False).sum() / n
+    _, numericas = converter_numeros(amostra.copy())
+    compactado = 0.0
+    for col in amostra.columns:
+        if col in numericas:
+            compactado += BYTES_NUMERO
+        elif amostra[col].nunique(dropna=True) <= MAX_CARDINALIDADE_CATEGORIA * n:
+            compactado += BYTES_CATEGORIA
+        else:
+            compactado += amostra[col].memory_usage(deep=True, index=False) / n
+    return texto, compactado
+
+
+def _amostra_csv(arquivo, tamanho):
+    arquivo.seek(0)
+    dados = arquivo.read(BYTES_AMOSTRA)
+    arquivo.seek(0)
+    completo = len(dados) >= tamanho
+    if not completo and b"\n" in dados:
+        dados = dados[:dados.rfind(b"\n") + 1]  # descarta a linha cortada
+
+    encoding = encoding_da_amostra(dados)
+    separador = separador_da_amostra(dados)
+    linhas = list(csv.reader(io.StringIO(dados.decode(encoding, errors="replace")), delimiter=separador))
+    bruto = pd.DataFrame(linhas, dtype=str)
+    idx = encontrar_linha_cabecalho(bruto) if len(bruto) else 0
+    amostra = bruto.iloc[idx + 1:].set_axis([str(c) for c in bruto.iloc[idx]], axis=1) if len(bruto) else bruto
+
+    fator = 1.0 if completo else tamanho / max(len(dados), 1)
+    return {
+        "formato": "csv",
+        "encoding": encoding,
+        "separador": separador,
+        "colunas_brutas": int(bruto.shape[1]),
+        "linhas_estimadas": int(len(amostra) * fator),
+    }, amostra
+
+
+def _amostra_xlsx(arquivo, tamanho, max_linhas=2000):
+    from openpyxl import load_workbook
+
+    arquivo.seek(0)
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    linhas_estimadas, linhas = 0, []
+    try:
+        for aba in livro.worksheets:
+            linhas_estimadas += aba.max_row or 0
+            if len(linhas) < max_linhas:
+                for linha in aba.iter_rows(values_only=True, max_row=max_linhas - len(linhas)):
+                    linhas.append([None if v is None else str(v) for v in linha])
+    finally:
+        livro.close()
+        arquivo.seek(0)
+
+    bruto = pd.DataFrame(linhas, dtype=str)
+    if not linhas_estimadas:
+        linhas_estimadas = tamanho // BYTES_LINHA_XLSX
+    idx = encontrar_linha_cabecalho(bruto) if len(bruto) else 0
+    amostra = bruto.iloc[idx + 1:].set_axis([str(c) for c in bruto.iloc[idx]], axis=1) if len(bruto) else bruto
+    return {"formato": "xlsx", "linhas_estimadas": int(linhas_estimadas)}, amostra
+
+
+def estimar_memoria(arquivo):
+    """
+    Estimativa de ocupação do upload: linhas, bytes do DataFrame de texto,
+    bytes depois de limpo e compactado e pico da carga completa (inclui os
+    bytes do próprio upload, quando continuam em memória).
+    """
+    tamanho = _tamanho(arquivo)
+    bytes_upload = 0 if isinstance(arquivo, UploadEmDisco) else tamanho
+    if arquivo.name.lower().endswith(".xlsx"):
+        estimativa, amostra = _amostra_xlsx(arquivo, tamanho)
+        fator_pico = FATOR_PICO_XLSX
+    else:
+        estimativa, amostra = _amostra_csv(arquivo, tamanho)
+        fator_pico = FATOR_PICO
+
+    texto, compactado = _custos_por_linha(amostra) if len(amostra) else (0.0, 0.0)
+    linhas = estimativa["linhas_estimadas"]
+    estimativa.update({
+        "tamanho_arquivo": tamanho,
+        "bytes_upload": bytes_upload,
+        "colunas": int(amostra.shape[1]),
+        "bytes_texto_linha": float(texto),
+        "bytes_texto": int(texto * linhas),
+        "bytes_compactado": int(compactado * linhas),
+        "pico_memoria": int(bytes_upload + texto * linhas * fator_pico),
+    })
+    return estimativa
+
+
+def escolher_estrategia(estimativa, orcamento):
+    """Acrescenta à estimativa a estratégia, o tamanho do lote, a fração e o pico previsto."""
+    plano = dict(estimativa, orcamento=int(orcamento), fracao=1.0, linhas_por_lote=None)
+    if estimativa["pico_memoria"] <= orcamento:
+        plano.update(estrategia=MEMORIA, pico_estimado=estimativa["pico_memoria"])
+        return plano
+
+    tamanho, compactado = estimativa["bytes_upload"], max(estimativa["bytes_compactado"], 1)
+    fator = FATOR_PICO if estimativa["formato"] == "csv" else FATOR_PICO_XLSX
+    por_linha = max(estimativa["bytes_texto_linha"], 1.0) * fator
+    linhas_por_lote = int(min(max(orcamento * 0.25 / por_linha, LINHAS_LOTE_MIN), LINHAS_LOTE_MAX))
+    pico_lote = linhas_por_lote * por_linha
+    plano["linhas_por_lote"] = linhas_por_lote
+
+    # Lotes compactados + a concatenação final (até 2x o compactado)
+    pico = tamanho + 2 * compactado + pico_lote
+    if pico <= orcamento:
+        plano.update(estrategia=LOTES, pico_estimado=int(pico))
+        return plano
+
+    sobra = orcamento - tamanho - pico_lote
+    fracao = min(max(sobra / (2 * compactado), FRACAO_MINIMA), 1.0)
+    plano.update(
+        estrategia=AMOSTRA,
+        fracao=fracao,
+        pico_estimado=int(tamanho + 2 * compactado * fracao + pico_lote),
+    )
+    return plano
+
+
+def planejar_carga(arquivo, orcamento=None):
+    """Estimativa + estratégia para o upload. Na dúvida (estimativa falhou), carga completa."""
+    orcamento = orcamento_efetivo(orcamento)
+    try:
+        return escolher_estrategia(estimar_memoria(arquivo), orcamento)
+    except Exception:
+        arquivo.seek(0)
+        return {"estrategia": MEMORIA, "orcamento": orcamento, "fracao": 1.0, "pico_memoria": None}
+
+
+def _fmt_bytes(n):
+    for unidade, divisor in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if n >= divisor:
+            return f"{n / divisor:.1f} {unidade}"
+    return f"{n} B"
+
+
+def descrever_plano(plano):
+    """Frase para o usuário: estimativa, orçamento e estratégia escolhida."""
+    texto = f"Estratégia de carga: {DESCRICOES[plano['estrategia']]}"
+    if plano.get("pico_memoria") is None:
+        return texto + "."
+    texto += (
+        f" — estimativa de {_fmt_bytes(plano['pico_memoria'])} para a carga completa"
+        f" (~{plano['linhas_estimadas']:,} linhas), orçamento da sessão de {_fmt_bytes(plano['orcamento'])}"
+    )
+    if plano["estrategia"] == AMOSTRA:
+        texto += f". Os números refletem uma amostra de {plano['fracao'] * 100:.1f}% das linhas"
+    return texto + "."
+
+# ============================================================
+# UPLOADS GRANDES EM DISCO (mmap)
+# ============================================================
+#
+# Acima de LIMITE_SPOOL o upload é copiado (em blocos) para um arquivo
+# temporário e lido por mmap: as páginas são do cache de disco, que o
+# sistema devolve sob pressão, e cada nova tentativa de leitura (seek(0)
+# do modo seguro, amostra do plano, hash) relê o mapa sem copiar o
+# buffer. O arquivo é apagado no close(), quando o objeto é coletado
+# (fim da sessão) ou na saída do processo; sobras de processos que
+# morreram são varridas por limpar_temporarios().
+
+LIMITE_SPOOL = int(os.environ.get("PLATERO_LIMITE_SPOOL_MB", "50")) * 1024 * 1024
+DIR_SPOOL = os.environ.get("PLATERO_DIR_SPOOL") or tempfile.gettempdir()
+PREFIXO_SPOOL = "platero_upload_"
+BLOCO_COPIA = 1024 * 1024
+IDADE_TEMPORARIO_S = 24 * 3600
+
+
+def _remover_spool(mapa, descritor, caminho):
+    descritor.close()  # o mmap independe do descritor
+    try:
+        if mapa is not None:
+            mapa.close()
+    except BufferError:
+        pass  # ainda há memoryview viva; o mapa cai junto com ela
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+class UploadEmDisco(io.RawIOBase):
+    """
+    Arquivo binário somente leitura sobre o mmap de um temporário. Tem
+    `name` e `size` como o UploadedFile do Streamlit e `getbuffer()` sem
+    cópia, então os carregadores e o hash do conteúdo usam-no igual.
+    """
+
+    def __init__(self, caminho, nome):
+        super().__init__()
+        self.caminho, self.name = caminho, nome
+        self._arquivo = open(caminho, "rb")
+        self.size = os.fstat(self._arquivo.fileno()).st_size
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._finalizador = weakref.finalize(self, _remover_spool, self._mapa, self._arquivo, caminho)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, n=-1):
+        if self._mapa is None:
+            return b""
+        return self._mapa.read(None if n is None or n < 0 else n)
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        dados = self.read(len(buffer))
+        buffer[:len(dados)] = dados
+        return len(dados)
+
+    def seek(self, posicao, de_onde=os.SEEK_SET):
+        if self._mapa is not None:
+            self._mapa.seek(posicao, de_onde)
+        return self.tell()
+
+    def tell(self):
+        return 0 if self._mapa is None else self._mapa.tell()
+
+    def getbuffer(self):
+        return memoryview(self._mapa if self._mapa is not None else b"")
+
+    def close(self):
+        if not self.closed:
+            self._finalizador()
+        super().close()
+
+
+def para_disco(arquivo, limite=None):
+    """
+    O próprio `arquivo` se for pequeno; senão um UploadEmDisco com o mesmo
+    conteúdo. Quem recebe o UploadEmDisco deve fechá-lo (ou deixá-lo ser
+    coletado) para apagar o temporário.
+    """
+    limite = LIMITE_SPOOL if limite is None else limite
+    if isinstance(arquivo, UploadEmDisco) or _tamanho(arquivo) <= limite:
+        return arquivo
+
+    sufixo = os.path.splitext(arquivo.name)[1]
+    fd, caminho = tempfile.mkstemp(prefix=PREFIXO_SPOOL, suffix=sufixo, dir=DIR_SPOOL)
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            arquivo.seek(0)
+            shutil.copyfileobj(arquivo, destino, BLOCO_COPIA)
+        arquivo.seek(0)
+        return UploadEmDisco(caminho, arquivo.name)
+    except BaseException:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+        raise
+
+
+def limpar_temporarios(idade_s=IDADE_TEMPORARIO_S, prefixo=PREFIXO_SPOOL):
+    """Apaga temporários (`prefixo`) mais velhos que `idade_s` (processos que caíram)."""
+    limite = time.time() - idade_s
+    removidos = 0
+    try:
+        nomes = os.listdir(DIR_SPOOL)
+    except OSError:
+        return 0
+    for nome in nomes:
+        if not nome.startswith(prefixo):
+            continue
+        caminho = os.path.join(DIR_SPOOL, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+                removidos += 1
+        except OSError:
+            continue
+    return removidos
+
+# ============================================================
+# CARREGADORES EM LOTES / AMOSTRADOS
+# ============================================================
+
+def carregar_com_plano(arquivo, plano, modo="seguro"):
+    """Carrega o upload conforme o plano. Retorna (df, erro), como os carregadores do cleaner."""
+    try:
+        if plano["estrategia"] == MEMORIA:
+            if modo == "seguro":
+                return carregar_modo_seguro(arquivo)
+            return carregar_e_limpar_inteligente(arquivo)
+        return carregar_em_lotes(arquivo, plano, modo)
+    except MemoryError:
+        return None, (
+            f"Memória insuficiente para carregar o arquivo ({descrever_plano(plano)}). "
+            "Envie um arquivo menor ou filtrado."
+        )
+
+
+def _blocos_csv(arquivo, plano):
+    arquivo.seek(0)
+    leitor = pd.read_csv(
+        arquivo,
+        sep=plano["separador"],
+        encoding=plano["encoding"],
+        header=None,
+        names=range(plano["colunas_brutas"]),
+        dtype=str,
+        chunksize=plano["linhas_por_lote"],
+        on_bad_lines="skip",
+    )
+    for bloco in leitor:
+        yield "CSV", bloco
+
+
+def _blocos_xlsx(arquivo, plano, modo):
+    """Linhas das abas em streaming (openpyxl somente leitura), em blocos de texto."""
+    from openpyxl import load_workbook
+
+    arquivo.seek(0)
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        abas = livro.worksheets if modo == "inteligente" else livro.worksheets[:1]
+        for aba in abas:
+            linhas = []
+            for linha in aba.iter_rows(values_only=True):
+                linhas.append([None if v is None else str(v) for v in linha])
+                if len(linhas) >= plano["linhas_por_lote"]:
+                    yield aba.title, pd.DataFrame(linhas, dtype=str)
+                    linhas = []
+            if linhas:
+                yield aba.title, pd.DataFrame(linhas, dtype=str)
+    finally:
+        livro.close()
+
+
+def _concatenar(partes, categoricas):
+    """Junta os lotes (abas podem ter colunas diferentes) mantendo as colunas category."""
+    colunas = {}
+    for col in dict.fromkeys(c for parte in partes for c in parte.columns):
+        series = [parte[col] if col in parte.columns else pd.Series([None] * len(parte), dtype=object)
+                  for parte in partes]
+        if col in categoricas:
+            try:
+                colunas[col] = pd.Series(union_categoricals(series, ignore_order=True))
+                continue
+            except TypeError:  # aba sem a coluna: categorias de tipos diferentes
+                series = [serie.astype(object) for serie in series]
+                colunas[col] = pd.concat(series, ignore_index=True).astype("category")
+                continue
+        colunas[col] = pd.concat(series, ignore_index=True)
+    return pd.DataFrame(colunas)
+
+
+def _compactar_lote(tabela, categoricas):
+    """O primeiro lote decide quais colunas viram category; os demais seguem."""
+    if categoricas is None:
+        tabela = compactar(tabela)
+        categoricas = {c for c in tabela.columns if isinstance(tabela[c].dtype, pd.CategoricalDtype)}
+        return tabela, categoricas
+    for col in categoricas & set(tabela.columns):
+        tabela[col] = tabela[col].astype("category")
+    return tabela, categoricas
+
+
+def carregar_em_lotes(arquivo, plano, modo="seguro", semente=0):
+    """
+    Lê o upload em blocos de `plano["linhas_por_lote"]` linhas (CSV em
+    chunks, xlsx em streaming), limpa e compacta cada bloco com as mesmas
+    regras do modo escolhido e junta no fim. Com `plano["fracao"]` < 1
+    mantém só uma amostra aleatória (semente fixa: a mesma a cada leitura).
+    As decisões de cabeçalho, colunas numéricas (modo seguro) e category
+    vêm do primeiro bloco.
+    """
+    rng = np.random.default_rng(semente)
+    fracao = plano.get("fracao", 1.0)
+    if plano["formato"] == "csv":
+        blocos = _blocos_csv(arquivo, plano)
+    else:
+        blocos = _blocos_xlsx(arquivo, plano, modo)
+
+    partes, cabecalhos, numericas, categoricas = [], {}, None, None
+    with etapa("leitura_lotes") as medicao:
+        for nome_aba, lote in blocos:
+            if nome_aba not in cabecalhos:
+                idx = encontrar_linha_cabecalho(lote) if modo == "inteligente" else 0
+                cabecalhos[nome_aba] = lote.iloc[[idx]]
+                lote = lote.iloc[idx + 1:]
+            cabecalho = cabecalhos[nome_aba]
+            if fracao < 1:
+                lote = lote[rng.random(len(lote)) < fracao]
+            if lote.empty:
+                continue
+
+            if modo == "inteligente":
+                tabela = extrair_tabela(pd.concat([cabecalho, lote], ignore_index=True), nome_aba, idx_header=0)
+                if tabela is None:
+                    continue
+                tabela = limpar_tabela(tabela)
+            else:
+                nomes = [n.strip() if isinstance(n, str) and n.strip() else f"Unnamed: {i}"
+                         for i, n in enumerate(cabecalho.iloc[0])]
+                tabela, numericas = converter_numeros(lote.set_axis(nomes, axis=1).reset_index(drop=True), numericas)
+
+            tabela, categoricas = _compactar_lote(tabela, categoricas)
+            partes.append(tabela)
+
+        if not partes:
+            return None, "Nenhuma tabela válida encontrada."
+        df = _concatenar(partes, categoricas)
+        medicao.dimensoes(df)
+    return df, None
+
+# ============================================================
+# VÁRIOS ARQUIVOS: CARGA PARALELA E CONSOLIDAÇÃO
+# ============================================================
+#
+# Filiais mandam um arquivo por loja/mês. Cada arquivo passa pelo mesmo
+# pipeline de um upload único (com cache próprio, a cargo de quem chama),
+# em threads, e as tabelas são empilhadas com os esquemas alinhados e a
+# coluna Origem_Arquivo, como Origem_Aba faz para as abas.
+
+COLUNA_ORIGEM_ARQUIVO = "Origem_Arquivo"
+MAX_WORKERS_ARQUIVOS = int(os.environ.get("PLATERO_WORKERS_ARQUIVOS", "4"))
+
+
+def _normalizar_coluna(nome):
+    """"Valor ", "VALOR" e "valor" são a mesma coluna; "Região" e "Regiao" também."""
+    texto = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[\s_]+", " ", texto).strip().casefold()
+
+
+def _tipo_coluna(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return "data"
+    if pd.api.types.is_numeric_dtype(serie):
+        return "número"
+    return "texto"
+
+
+def _unificar_tipo(partes, tipo):
+    """Converte as partes em texto de uma coluna que é número/data nos demais arquivos."""
+    convertidas = []
+    for parte in partes:
+        if _tipo_coluna(parte) != "texto" or parte.isna().all():
+            convertidas.append(parte)
+        elif tipo == "número":
+            convertidas.append(pd.to_numeric(limpar_coluna_numerica(parte.astype(object)), errors="coerce"))
+        else:
+            convertidas.append(pd.to_datetime(parte, errors="coerce", dayfirst=True))
+    return convertidas
+
+
+def alinhar_esquemas(tabelas):
+    """
+    Empilha [(nome_arquivo, df)] numa base só. Colunas que diferem só em
+    caixa, acentos ou espaços são a mesma (vale o nome do primeiro arquivo
+    em que aparecem); colunas ausentes num arquivo ficam vazias nas linhas
+    dele; uma coluna número (ou data) em uns arquivos e texto em outros é
+    convertida. Retorna (df, relatorio) com o que divergiu.
+    """
+    nomes, ordem, alinhadas = {}, [], []
+    relatorio = {"arquivos": [nome for nome, _ in tabelas], "divergencias": [], "conflitos_tipo": []}
+
+    for nome_arquivo, df in tabelas:
+        renomear = {}
+        for col in df.columns:
+            chave = _normalizar_coluna(col)
+            if chave not in nomes:
+                nomes[chave] = col
+                ordem.append(col)
+            elif nomes[chave] != col:
+                renomear[col] = nomes[chave]
+        alinhadas.append((nome_arquivo, df.rename(columns=renomear), renomear))
+
+    for nome_arquivo, df, renomear in alinhadas:
+        faltando = [col for col in ordem if col not in df.columns]
+        if faltando or renomear:
+            relatorio["divergencias"].append({"arquivo": nome_arquivo, "faltando": faltando, "renomeadas": renomear})
+
+    colunas = {}
+    for col in ordem:
+        partes = [
+            df[col] if col in df.columns else pd.Series([None] * len(df), dtype=object)
+            for _, df, _ in alinhadas
+        ]
+        tipos = {nome: _tipo_coluna(df[col]) for nome, df, _ in alinhadas if col in df.columns}
+        if len(set(tipos.values())) > 1:
+            alvo = "data" if "data" in tipos.values() else "número"
+            partes = _unificar_tipo(partes, alvo)
+            relatorio["conflitos_tipo"].append({"coluna": col, "tipos": tipos, "convertida_para": alvo})
+        partes = [p.astype(object) if isinstance(p.dtype, pd.CategoricalDtype) else p for p in partes]
+        colunas[col] = pd.concat(partes, ignore_index=True)
+
+    origem = np.repeat([nome for nome, _ in tabelas], [len(df) for _, df in tabelas])
+    colunas[COLUNA_ORIGEM_ARQUIVO] = pd.Categorical(origem, categories=list(dict.fromkeys(relatorio["arquivos"])))
+    return pd.DataFrame(colunas), relatorio
+
+
+def carregar_varios(arquivos, carregar, workers=None):
+    """
+    Chama `carregar(arquivo)` — padrão (df, erro) — para cada arquivo em
+    paralelo e consolida com alinhar_esquemas. Retorna (df, relatorio);
+    arquivos que falharam ficam em relatorio["erros"] e df é None se
+    nenhum carregou.
+    """
+    workers = max(1, min(workers or MAX_WORKERS_ARQUIVOS, len(arquivos)))
+    with etapa("consolidacao", arquivos=len(arquivos)) as medicao:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="platero-ingestao") as pool:
+            # Cada thread herda o contexto da instrumentação (requisição, usuário)
+            futuros = [pool.submit(contextvars.copy_context().run, carregar, arquivo) for arquivo in arquivos]
+            resultados = [futuro.result() for futuro in futuros]
+
+        tabelas, erros = [], {}
+        for arquivo, (df, erro) in zip(arquivos, resultados):
+            if erro or df is None or df.empty:
+                erros[arquivo.name] = erro or "Arquivo vazio."
+            else:
+                tabelas.append((arquivo.name, df))
+        if not tabelas:
+            return None, {"arquivos": [a.name for a in arquivos], "divergencias": [], "conflitos_tipo": [], "erros": erros}
+
+        df, relatorio = alinhar_esquemas(tabelas)
+        relatorio["erros"] = erros
+        medicao.dimensoes(df)
+    return df, relatorio
+
+
+def descrever_consolidacao(relatorio):
+    """Linhas de aviso para o usuário (vazia se os esquemas bateram)."""
+    avisos = []
+    for arquivo, erro in relatorio.get("erros", {}).items():
+        avisos.append(f"{arquivo}: não carregado ({erro})")
+    for item in relatorio["divergencias"]:
+        if item["faltando"]:
+            avisos.append(f"{item['arquivo']}: sem as colunas {', '.join(map(str, item['faltando']))}")
+        if item["renomeadas"]:
+            pares = ", ".join(f"{de} → {para}" for de, para in item["renomeadas"].items())
+            avisos.append(f"{item['arquivo']}: colunas unificadas ({pares})")
+    for item in relatorio["conflitos_tipo"]:
+        tipos = ", ".join(f"{arquivo}: {tipo}" for arquivo, tipo in item["tipos"].items())
+        avisos.append(f"Coluna {item['coluna']} com tipos diferentes ({tipos}); convertida para {item['convertida_para']}")
+    return avisos
+
+# ============================================================
+# ANEXO INCREMENTAL
+# ============================================================
+#
+# Todo mês chega o acumulado do ano, quase todo igual ao do mês anterior.
+# Em vez de refazer o pipeline, as linhas do arquivo são lidas como texto
+# e comparadas por hash com as já vistas; só as inéditas passam pela
+# limpeza e pelo alinhamento ao esquema da base, e os agregados delas
+# (MotorIncremental) são somados aos guardados. Há duas contagens por
+# hash: das linhas brutas dos uploads anteriores (evita limpar o que já
+# veio) e das linhas limpas do dataset (vale desde o primeiro anexo,
+# quando a base só existe limpa). Colunas Origem_* ficam fora do hash: a
+# mesma venda num arquivo de outro nome continua sendo a mesma venda.
+#
+# Contar (em vez de só marcar como visto) preserva linhas idênticas
+# legítimas: duas vendas iguais no mesmo dia e loja são duas linhas. Num
+# upload, a k-ésima ocorrência de um hash só é repetida se os uploads
+# anteriores já trouxeram pelo menos k+1 linhas com ele.
+
+def ler_bruto(arquivo, modo):
+    """Linhas do upload como texto, já com cabeçalho (a entrada da limpeza). Retorna (df, erro)."""
+    try:
+        if modo != "inteligente":
+            return ler_modo_seguro(arquivo), None
+        tabelas = []
+        for nome_aba, df_raw in ler_abas(arquivo).items():
+            tabela = extrair_tabela(df_raw, nome_aba)
+            if tabela is not None:
+                tabelas.append(tabela)
+    except Exception as e:
+        return None, f"Erro na leitura: {e}"
+    if not tabelas:
+        return None, "Nenhuma tabela válida encontrada."
+    return pd.concat(tabelas, ignore_index=True), None
+
+
+def hashes_linhas(df, chave=None):
+    """
+    Hash (uint64) de cada linha nas colunas `chave` (padrão: todas menos
+    Origem_*). Números entram como float e o resto como texto, para que a
+    mesma linha dê o mesmo hash com category, str ou int/float.
+    """
+    colunas = [c for c in (chave or df.columns) if c in df.columns and not str(c).startswith("Origem_")]
+    normalizado = pd.DataFrame({
+        col: df[col].astype("float64") if pd.api.types.is_numeric_dtype(df[col]) else df[col].astype(str)
+        for col in colunas
+    }, index=df.index)
+    return pd.util.hash_pandas_object(normalizado, index=False).to_numpy()
+
+
+def _ocorrencias(hashes):
+    """Quantas vezes o hash de cada posição já apareceu antes dela no array (0, 1, 2...)."""
+    ordem = np.argsort(hashes, kind="stable")
+    ordenados = hashes[ordem]
+    posicoes = np.arange(len(hashes))
+    inicio_grupo = np.ones(len(hashes), dtype=bool)
+    inicio_grupo[1:] = ordenados[1:] != ordenados[:-1]
+    primeira = np.maximum.accumulate(np.where(inicio_grupo, posicoes, 0))
+    ocorrencias = np.empty(len(hashes), dtype=np.int64)
+    ocorrencias[ordem] = posicoes - primeira
+    return ocorrencias
+
+
+def _consultar(chaves, valores, hashes, padrao=0):
+    """Valor de cada hash na tabela ordenada (`chaves`, `valores`); `padrao` se ausente."""
+    if not len(chaves):
+        return np.full(len(hashes), padrao, dtype=valores.dtype)
+    posicao = np.minimum(np.searchsorted(chaves, hashes), len(chaves) - 1)
+    return np.where(chaves[posicao] == hashes, valores[posicao], padrao).astype(valores.dtype)
+
+
+def _mesclar(chaves, valores, novas_chaves, novos_valores, combinar):
+    todas = np.union1d(chaves, novas_chaves)
+    return todas, combinar(_consultar(chaves, valores, todas), _consultar(novas_chaves, novos_valores, todas))
+
+
+SEM_HASH = np.uint64(0)  # linha bruta que a limpeza descartou (sem hash limpo)
+
+
+class EstadoIncremental:
+    """
+    Agregados + contagens por hash das linhas já incorporadas a um dataset.
+    Brutos: hash ordenado, quantas linhas com ele os uploads já trouxeram
+    e o hash da linha depois de limpa. Limpos: hash ordenado e quantas
+    linhas do dataset o têm.
+    """
+
+    def __init__(self, motor, brutos, limpos, chave=None):
+        self.motor = motor
+        self.brutos = brutos   # (hashes, contagens, hashes limpos)
+        self.limpos = limpos   # (hashes, contagens)
+        self.chave = list(chave) if chave else None
+
+    @classmethod
+    def da_base(cls, df, tipos, chave=None):
+        """Estado inicial de um dataset que nunca recebeu anexos (custo proporcional a ele, uma vez)."""
+        motor = MotorIncremental.de_dataframe(df, tipos["numericas"], tipos["categoricas"], tipos["datas"])
+        vazio = np.empty(0, dtype=np.uint64)
+        brutos = (vazio, np.empty(0, dtype=np.int64), vazio)
+        return cls(motor, brutos, np.unique(hashes_linhas(df, chave), return_counts=True), chave)
+
+    def salvar(self, chave_dataset, diretorio=None):
+        agregados = {"motor": self.motor.para_dict(), "chave": self.chave}
+        hashes = {
+            "brutos": self.brutos[0], "contagem_brutos": self.brutos[1], "limpos_dos_brutos": self.brutos[2],
+            "limpos": self.limpos[0], "contagem_limpos": self.limpos[1],
+        }
+        return cache_dados.salvar_incremental(chave_dataset, agregados, hashes, diretorio)
+
+    @classmethod
+    def carregar(cls, chave_dataset, diretorio=None):
+        gravado = cache_dados.carregar_incremental(chave_dataset, diretorio)
+        if gravado is None:
+            return None
+        agregados, hashes = gravado
+        brutos, limpos = hashes["brutos"], hashes["limpos"]
+        # Estados gravados antes das contagens: uma linha por hash
+        contagem_brutos = hashes.get("contagem_brutos", np.ones(len(brutos), dtype=np.int64))
+        limpos_dos_brutos = hashes.get("limpos_dos_brutos", np.full(len(brutos), SEM_HASH))
+        contagem_limpos = hashes.get("contagem_limpos", np.ones(len(limpos), dtype=np.int64))
+        return cls(
+            MotorIncremental.de_dict(agregados["motor"]),
+            (brutos, contagem_brutos, limpos_dos_brutos),
+            (limpos, contagem_limpos),
+            agregados["chave"],
+        )
+
+
+def _alinhar_a_base(novas, base):
+    """Nomes de coluna e tipos (número/data) das linhas novas iguais aos da base."""
+    nomes = {_normalizar_coluna(c): c for c in base.columns}
+    renomear = {}
+    for col in novas.columns:
+        nome_base = nomes.get(_normalizar_coluna(col))
+        if nome_base is not None and nome_base != col:
+            renomear[col] = nome_base
+    novas = novas.rename(columns=renomear)
+    for col in base.columns:
+        if col in novas.columns:
+            tipo = _tipo_coluna(base[col])
+            if tipo != "texto" and _tipo_coluna(novas[col]) == "texto":
+                novas[col] = _unificar_tipo([novas[col]], tipo)[0]
+    return novas
+
+
+def anexar(base, arquivo, modo, tipos, estado=None, chave=None):
+    """
+    Linhas inéditas de `arquivo` para anexar a `base` (dataset limpo), lido
+    e limpo no `modo` da base; `tipos` é o detectar_tipos da base (as linhas
+    novas herdam a tipagem). `chave`: colunas que identificam a linha
+    (padrão: todas). Uma linha só é descartada se os uploads anteriores já
+    trouxeram tantas cópias dela quanto este (cópias dentro do mesmo
+    upload são mantidas). `base` só é lida inteira na primeira vez, sem
+    `estado`; depois, só o esquema dela é usado.
+    Retorna (novas, estado, relatorio); novas é None se a leitura falhou.
+    Quem chama junta base e novas (uma vez, depois de todos os arquivos).
+    """
+    with etapa("anexo_incremental") as medicao:
+        if estado is None or estado.chave != (list(chave) if chave else None):
+            estado = EstadoIncremental.da_base(base, tipos, chave)
+
+        bruto, erro = ler_bruto(arquivo, modo)
+        if erro:
+            return None, estado, {"erro": erro}
+        bruto = bruto.reset_index(drop=True)
+
+        # Etapa bruta: a k-ésima cópia de uma linha já trazida k+1 vezes não é relida
+        hashes_brutos = hashes_linhas(bruto, chave)
+        brutos, contagem_brutos, limpos_dos_brutos = estado.brutos
+        vistas = _ocorrencias(hashes_brutos) < _consultar(brutos, contagem_brutos, hashes_brutos)
+        # Linhas limpas do dataset que essas linhas já vistas representam
+        ja_representadas = np.unique(_consultar(brutos, limpos_dos_brutos, hashes_brutos[vistas], SEM_HASH),
+                                     return_counts=True)
+
+        novas = bruto[~vistas]
+        mapa = (np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64))
+        hashes_limpos = np.empty(0, dtype=np.uint64)
+        if len(novas):
+            if modo == "inteligente":
+                novas = limpar_tabela(novas)
+            else:
+                novas, _ = converter_numeros(novas, [c for c in tipos["numericas"] if c in novas.columns])
+            novas = _alinhar_a_base(novas, base)
+            hashes_limpos = hashes_linhas(novas, chave)
+            # Índice de `novas` = posição em `bruto`: hash bruto -> hash limpo
+            unicos, primeira = np.unique(hashes_brutos[novas.index.to_numpy()], return_index=True)
+            mapa = (unicos, hashes_limpos[primeira])
+
+            # Etapa limpa: contra as linhas do dataset ainda não representadas acima
+            disponiveis = (
+                _consultar(*estado.limpos, hashes_limpos)
+                - _consultar(*ja_representadas, hashes_limpos)
+            )
+            ineditas = _ocorrencias(hashes_limpos) >= disponiveis
+            novas, hashes_limpos = novas[ineditas], hashes_limpos[ineditas]
+
+        incremento = MotorIncremental.de_dataframe(novas, tipos["numericas"], tipos["categoricas"], tipos["datas"])
+        todas, contagem_brutos = _mesclar(brutos, contagem_brutos, *np.unique(hashes_brutos, return_counts=True),
+                                          np.maximum)
+        anteriores = _consultar(brutos, limpos_dos_brutos, todas, SEM_HASH)
+        limpos_dos_brutos = np.where(anteriores != SEM_HASH, anteriores, _consultar(*mapa, todas, SEM_HASH))
+        estado = EstadoIncremental(
+            estado.motor.mesclar(incremento),
+            (todas, contagem_brutos, limpos_dos_brutos),
+            _mesclar(*estado.limpos, *np.unique(hashes_limpos, return_counts=True), np.add),
+            chave,
+        )
+        medicao.dimensoes(novas)
+
+    relatorio = {"linhas_arquivo": int(len(bruto)), "novas": int(len(novas)), "repetidas": int(len(bruto) - len(novas))}
+    return novas, estado, relatorio
@@ -0,0 +1,263 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource  # só Unix; sem ele o pico de memória fica None
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# INSTRUMENTAÇÃO POR ETAPA (tempo, CPU, memória, dimensões)
+# ============================================================
+#
+# Cada etapa do pipeline (leitura, limpeza, tipos, gráficos, IA, PDF) vira
+# um registro JSON por linha em .metricas/etapas.jsonl. O contexto da
+# requisição (upload, usuário, arquivo) vem de uma ContextVar: o app define
+# uma vez por execução e as etapas aninhadas — inclusive nas tarefas em
+# segundo plano — herdam. Percentis das últimas execuções ficam em memória
+# e são gravados em .metricas/percentis.json.
+
+DIR_METRICAS = os.environ.get("PLATERO_METRICAS", ".metricas")
+ARQUIVO_LOG = "etapas.jsonl"
+ARQUIVO_PERCENTIS = "percentis.json"
+LIMITE_LOG_BYTES = int(os.environ.get("PLATERO_METRICAS_MB", "20")) * 1024 * 1024
+JANELA = 1000                # amostras por etapa nos percentis
+INTERVALO_PERCENTIS = 30     # segundos entre gravações de percentis.json
+ATIVO = os.environ.get("PLATERO_INSTRUMENTACAO", "1") != "0"
+
+_contexto = contextvars.ContextVar("platero_contexto", default={})
+_etapa_atual = contextvars.ContextVar("platero_etapa", default=None)
+
+
+def definir_contexto(**campos):
+    """Campos anexados a todas as etapas seguintes deste fluxo (ex.: requisicao, usuario)."""
+    _contexto.set({k: v for k, v in campos.items() if v is not None})
+
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024  # bytes no macOS, KB no Linux
+
+
+class Medicao:
+    """Entregue pelo `with etapa(...)`: permite informar as dimensões do resultado."""
+
+    __slots__ = ("nome", "linhas", "colunas", "campos")
+
+    def __init__(self, nome, campos):
+        self.nome = nome
+        self.linhas = None
+        self.colunas = None
+        self.campos = campos
+
+    def dimensoes(self, df):
+        if df is not None and hasattr(df, "shape") and len(df.shape) == 2:
+            self.linhas, self.colunas = int(df.shape[0]), int(df.shape[1])
+
+
+@contextmanager
+def etapa(nome, df=None, **campos):
+    """
+    Mede a etapa: tempo de parede, CPU da thread, pico de RSS do processo
+    (e quanto a etapa o elevou), linhas/colunas e status. Exceções são
+    registradas com status "erro" e propagadas.
+    """
+    medicao = Medicao(nome, campos)
+    medicao.dimensoes(df)
+    if not ATIVO:
+        yield medicao
+        return
+
+    pai = _etapa_atual.get()
+    token = _etapa_atual.set(nome)
+    pico_antes = _pico_rss_mb()
+    inicio, cpu_inicio = time.perf_counter(), time.thread_time()
+    status = "ok"
+    try:
+        yield medicao
+    except BaseException:
+        status = "erro"
+        raise
+    finally:
+        parede, cpu = time.perf_counter() - inicio, time.thread_time() - cpu_inicio
+        _etapa_atual.reset(token)
+        pico_depois = _pico_rss_mb()
+        registro = {
+            "ts": round(time.time(), 3),
+            "etapa": nome,
+            "pai": pai,
+            "status": status,
+            "parede_ms": round(parede * 1000, 2),
+            "cpu_ms": round(cpu * 1000, 2),
+            "pico_rss_mb": None if pico_depois is None else round(pico_depois, 1),
+            "aumento_pico_mb": None if pico_antes is None else round(pico_depois - pico_antes, 1),
+            "linhas": medicao.linhas,
+            "colunas": medicao.colunas,
+            **_contexto.get(),
+            **medicao.campos,
+        }
+        coletor_global().registrar(registro)
+
+
+def instrumentado(nome, func, **campos):
+    """Envolve `func` numa etapa (para tarefas em segundo plano, ex.: IA e PDF)."""
+    def executar(*args, **kwargs):
+        with etapa(nome, **campos) as medicao:
+            resultado = func(*args, **kwargs)
+            medicao.dimensoes(args[0] if args else kwargs.get("df_limpo"))
+            return resultado
+    return executar
+
+# ============================================================
+# COLETOR: LOG ESTRUTURADO + PERCENTIS DAS ÚLTIMAS EXECUÇÕES
+# ============================================================
+
+def _percentis(amostras):
+    if not amostras:
+        return {"n": 0, "p50": None, "p95": None, "max": None}
+    ordenadas = sorted(amostras)
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))], 2)
+    return {"n": len(ordenadas), "p50": p(0.50), "p95": p(0.95), "max": round(ordenadas[-1], 2)}
+
+
+class Coletor:
+    def __init__(self, diretorio=DIR_METRICAS, janela=JANELA, limite_log_bytes=LIMITE_LOG_BYTES):
+        self.diretorio = diretorio
+        self.janela = janela
+        self.limite_log_bytes = limite_log_bytes
+        self._lock = threading.Lock()
+        self._por_etapa = {}
+        self._recentes = deque(maxlen=janela * 4)
+        self._gravou_percentis = 0.0
+        self._carregar_log()
+
+    @property
+    def caminho_log(self):
+        return os.path.join(self.diretorio, ARQUIVO_LOG)
+
+    def registrar(self, registro):
+        linha = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._guardar(registro)
+            try:
+                os.makedirs(self.diretorio, exist_ok=True)
+                self._rotacionar()
+                with open(self.caminho_log, "a", encoding="utf-8") as f:
+                    f.write(linha)
+            except OSError as e:
+                logger.warning("Métrica da etapa %s não gravada: %s", registro.get("etapa"), e)
+            gravar_percentis = time.time() - self._gravou_percentis > INTERVALO_PERCENTIS
+        if gravar_percentis:
+            self.gravar_percentis()
+
+    def _guardar(self, registro):
+        amostras = self._por_etapa.get(registro["etapa"])
+        if amostras is None:
+            amostras = self._por_etapa[registro["etapa"]] = {
+                campo: deque(maxlen=self.janela) for campo in ("parede_ms", "cpu_ms", "aumento_pico_mb")
+            }
+        for campo, fila in amostras.items():
+            if registro.get(campo) is not None:
+                fila.append(registro[campo])
+        self._recentes.append(registro)
+
+    def _rotacionar(self):
+        try:
+            if os.path.getsize(self.caminho_log) > self.limite_log_bytes:
+                os.replace(self.caminho_log, self.caminho_log + ".1")
+        except FileNotFoundError:
+            pass
+
+    def _carregar_log(self):
+        """Na subida do processo, retoma a janela a partir do fim do log."""
+        try:
+            with open(self.caminho_log, encoding="utf-8") as f:
+                linhas = deque(f, maxlen=self._recentes.maxlen)
+        except OSError:
+            return
+        for linha in linhas:
+            try:
+                self._guardar(json.loads(linha))
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    def percentis(self):
+        """{etapa: {"parede_ms": {n, p50, p95, max}, "cpu_ms": ..., "aumento_pico_mb": ...}}"""
+        with self._lock:
+            copia = {nome: {campo: list(fila) for campo, fila in amostras.items()}
+                     for nome, amostras in self._por_etapa.items()}
+        return {nome: {campo: _percentis(valores) for campo, valores in campos.items()}
+                for nome, campos in copia.items()}
+
+    def mais_lentos(self, n=10):
+        """
+        Uploads recentes mais lentos. Cada rerun do app repete etapas do
+        mesmo upload, então o total soma o pior tempo de cada etapa de topo
+        (as aninhadas já estão contidas nelas).
+        """
+        with self._lock:
+            recentes = list(self._recentes)
+
+        por_requisicao = {}
+        for registro in recentes:
+            chave = registro.get("requisicao")
+            if chave is None or registro.get("pai") is not None:
+                continue
+            item = por_requisicao.setdefault(chave, {
+                "requisicao": chave,
+                "arquivo": registro.get("arquivo"),
+                "usuario": registro.get("usuario"),
+                "linhas": None,
+                "piores": {},
+                "ultimo_ts": 0,
+            })
+            piores = item["piores"]
+            piores[registro["etapa"]] = max(piores.get(registro["etapa"], 0.0), registro["parede_ms"])
+            item["ultimo_ts"] = max(item["ultimo_ts"], registro["ts"])
+            if registro.get("linhas") is not None:
+                item["linhas"] = registro["linhas"]
+
+        for item in por_requisicao.values():
+            piores = item.pop("piores")
+            item["total_ms"] = round(sum(piores.values()), 2)
+            item["etapa_mais_lenta"] = max(piores, key=piores.get)
+        return sorted(por_requisicao.values(), key=lambda i: i["total_ms"], reverse=True)[:n]
+
+    def gravar_percentis(self):
+        conteudo = {"gerado_em": time.time(), "etapas": self.percentis()}
+        destino = os.path.join(self.diretorio, ARQUIVO_PERCENTIS)
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            tmp = destino + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(conteudo, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, destino)
+        except OSError as e:
+            logger.warning("Percentis não gravados: %s", e)
+        with self._lock:
+            self._gravou_percentis = time.time()
+
+
+_COLETOR = None
+_COLETOR_LOCK = threading.Lock()
+
+
+def coletor_global():
+    """Coletor único do processo."""
+    global _COLETOR
+    with _COLETOR_LOCK:
+        if _COLETOR is None:
+            _COLETOR = Coletor()
+        return _COLETOR
@@ -0,0 +1,348 @@
+"""
+Geração de relatórios em lote, sem Streamlit.
+
+Processa uma pasta (ou globs) de planilhas CSV/XLSX em paralelo e grava,
+para cada arquivo, o PDF e um resumo JSON. Arquivos já processados com
+sucesso (e inalterados) são pulados, então basta rodar de novo após uma
+falha para retomar o lote.
+
+Uso:
+    python lote.py planilhas/ --saida relatorios/ --workers 8
+    python lote.py "exports/*.xlsx" --saida relatorios/ --modo inteligente
+    python lote.py exports/gigante.csv --motor arrow
+
+CSVs maiores que PLATERO_LIMITE_PANDAS_MB (ou qualquer CSV com --motor
+arrow/duckdb) não são carregados inteiros: KPIs, rankings, tendência e
+Pareto vêm do motor de consulta, e a tipagem e a amostra do relatório
+vêm das primeiras linhas do arquivo.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+EXTENSOES = (".csv", ".xlsx")
+ARQUIVO_RESUMO = "resumo_lote.json"
+
+# ============================================================
+# DESCOBERTA DE ARQUIVOS
+# ============================================================
+
+def listar_planilhas(entradas, recursivo=False):
+    """Expande pastas e globs em uma lista ordenada de planilhas."""
+    encontrados = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            padrao = os.path.join(entrada, "**", "*") if recursivo else os.path.join(entrada, "*")
+            candidatos = glob.glob(padrao, recursive=recursivo)
+        else:
+            candidatos = glob.glob(entrada, recursive=recursivo)
+        for caminho in candidatos:
+            if os.path.isfile(caminho) and caminho.lower().endswith(EXTENSOES):
+                encontrados.add(os.path.abspath(caminho))
+    return sorted(encontrados)
+
+
+def nomes_de_saida(arquivos):
+    """Nome base de saída por arquivo; homônimos de pastas diferentes ganham sufixo."""
+    contagem = {}
+    for caminho in arquivos:
+        base = os.path.splitext(os.path.basename(caminho))[0]
+        contagem[base] = contagem.get(base, 0) + 1
+
+    nomes = {}
+    for caminho in arquivos:
+        base = os.path.splitext(os.path.basename(caminho))[0]
+        if contagem[base] > 1:
+            base += "_" + hashlib.sha1(caminho.encode("utf-8")).hexdigest()[:6]
+        nomes[caminho] = base
+    return nomes
+
+
+def assinatura_arquivo(caminho):
+    """Identifica a versão do arquivo de origem (tamanho + data de modificação)."""
+    info = os.stat(caminho)
+    return f"{info.st_size}-{info.st_mtime_ns}"
+
+
+def ja_processado(caminho, destino_pdf, destino_json):
+    """True se existe resumo de sucesso para esta mesma versão do arquivo."""
+    if not (os.path.exists(destino_pdf) and os.path.exists(destino_json)):
+        return False
+    try:
+        with open(destino_json, encoding="utf-8") as f:
+            resumo = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return resumo.get("status") == "ok" and resumo.get("assinatura") == assinatura_arquivo(caminho)
+
+
+def _gravar_atomico(destino, dados):
+    pasta = os.path.dirname(destino) or "."
+    fd, tmp = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, destino)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+# ============================================================
+# PROCESSAMENTO DE UM ARQUIVO (executado no worker)
+# ============================================================
+
+def processar_arquivo(caminho, destino_pdf, destino_json, opcoes):
+    """Carrega, tipa, analisa e gera o PDF de uma planilha. Retorna o resumo."""
+    # Importações tardias: cada worker carrega pandas/matplotlib/fpdf uma vez
+    from cleaner import carregar_e_limpar_inteligente, carregar_modo_seguro
+    from utils import detectar_tipos, escolher_coluna_kpi, escolher_eixo_x
+    from ai_analyst import analisar_com_ia
+    from graficos import agrupar_por_categoria, gerar_figuras, fechar_figuras
+    from calendario import Calendario
+    from motor_consulta import MOTORES_ARQUIVO, amostra_csv, arquivo_grande, motor_para
+    from pdf_engine_cloud import gerar_pdf_pro
+
+    inicio = time.perf_counter()
+    resumo = {
+        "arquivo": caminho,
+        "assinatura": assinatura_arquivo(caminho),
+        "pdf": destino_pdf,
+        "status": "erro",
+        "erro": None,
+    }
+    figs = []
+    nome_motor = opcoes.get("motor", "auto")
+    fora_da_memoria = caminho.lower().endswith(".csv") and (
+        nome_motor in MOTORES_ARQUIVO or (nome_motor == "auto" and arquivo_grande(caminho))
+    )
+    carregar = carregar_e_limpar_inteligente if opcoes.get("modo") == "inteligente" else carregar_modo_seguro
+    try:
+        if fora_da_memoria:
+            df, erro = carregar(amostra_csv(caminho))
+        else:
+            with open(caminho, "rb") as arquivo:
+                df, erro = carregar(arquivo)
+
+        if erro:
+            raise ValueError(f"Não foi possível ler o arquivo: {erro}")
+        if df is None or df.empty:
+            raise ValueError("O arquivo parece vazio.")
+
+        tipos = detectar_tipos(df)
+        datas, numericas, categoricas = tipos["datas"], tipos["numericas"], tipos["categoricas"]
+        if not numericas:
+            raise ValueError("Não encontramos colunas numéricas (Vendas, Valor, etc).")
+
+        eixo_y = escolher_coluna_kpi(numericas)
+        eixo_x = escolher_eixo_x(df, datas)
+        top_n = opcoes.get("top_n", 10)
+
+        motor = None
+        if fora_da_memoria:
+            motor = motor_para(caminho=caminho, motor=nome_motor)
+            resumo["motor"] = motor.nome
+            figs, texto_ia = _relatorio_agregado(
+                motor, datas, eixo_x, eixo_y, top_n, opcoes.get("com_ia", True), resumo
+            )
+        else:
+            # Gráficos e parecer leem a coluna de data uma vez só
+            calendario = Calendario(df)
+            try:
+                df_temp, df_grouped = agrupar_por_categoria(df, eixo_x, eixo_y, top_n)
+                figs, _ = gerar_figuras(df_temp, df_grouped, datas, eixo_x, eixo_y, top_n, calendario)
+            except Exception as e:
+                resumo["erro_graficos"] = str(e)
+
+            texto_ia = ""
+            if opcoes.get("com_ia", True):
+                try:
+                    texto_ia = analisar_com_ia(df, eixo_x, eixo_y, calendario=calendario)
+                except Exception as e:
+                    resumo["erro_ia"] = str(e)
+
+        data_geracao = opcoes.get("data_geracao")
+        pdf_bytes = gerar_pdf_pro(
+            df_original=df,
+            df_limpo=df,
+            datas=datas,
+            numericas=numericas,
+            categoricas=categoricas,
+            figs_principais=figs,
+            texto_ia=texto_ia,
+            usuario=opcoes.get("usuario", "Cliente"),
+            coluna_alvo=eixo_y,
+            data_geracao=datetime.fromisoformat(data_geracao) if data_geracao else None,
+            motor=motor
+        )
+        _gravar_atomico(destino_pdf, pdf_bytes)
+
+        kpis = (motor or motor_para(df=df, motor="pandas")).kpis(eixo_y)
+        resumo.update({
+            "status": "ok",
+            "linhas": kpis["registros"],
+            "colunas": int(len(df.columns)),
+            "tipos": {chave: [str(c) for c in cols] for chave, cols in tipos.items()},
+            "coluna_kpi": str(eixo_y),
+            "eixo_x": str(eixo_x),
+            "total": kpis["total"],
+            "media": kpis["media"],
+            "bytes_pdf": len(pdf_bytes),
+        })
+    except Exception as e:
+        resumo["erro"] = str(e)
+        resumo["detalhes"] = traceback.format_exc(limit=5)
+    finally:
+        fechar_figuras(figs)
+
+    resumo["duracao_s"] = round(time.perf_counter() - inicio, 3)
+    resumo["gerado_em"] = datetime.now().isoformat(timespec="seconds")
+    _gravar_atomico(destino_json, json.dumps(resumo, ensure_ascii=False, indent=2).encode("utf-8"))
+    return resumo
+
+def _relatorio_agregado(motor, datas, eixo_x, eixo_y, top_n, com_ia, resumo):
+    """Gráficos e parecer a partir dos agregados do motor (arquivo fora da memória)."""
+    from ai_analyst import analisar_agregados
+    from graficos import grafico_evolucao, grafico_ranking, grafico_share
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    figs, pareto, tendencia = [], None, None
+    try:
+        pareto = motor.pareto(eixo_x, eixo_y)
+        df_grouped = pareto["valor"].head(top_n).rename(eixo_y).rename_axis(eixo_x).reset_index()
+        figs.append(grafico_ranking(df_grouped, eixo_x, eixo_y))
+
+        col_data = eixo_x if eixo_x in datas else (datas[0] if datas else None)
+        if col_data is not None:
+            tendencia = motor.tendencia_mensal(col_data, eixo_y)
+            df_tempo = tendencia.rename(eixo_y).rename_axis(col_data).reset_index()
+            df_tempo[col_data] = pd.to_datetime(df_tempo[col_data], format="%Y-%m")
+            fig = grafico_evolucao(df_tempo, [col_data], col_data, eixo_y)
+            if fig is not None:
+                figs.append(fig)
+
+        share = grafico_share(df_grouped, eixo_x, eixo_y, top_n)
+        figs.append(share if share is not None else plt.figure())
+    except Exception as e:
+        resumo["erro_graficos"] = str(e)
+
+    texto_ia = ""
+    if com_ia:
+        try:
+            texto_ia = analisar_agregados(motor.kpis(eixo_y), pareto, tendencia, eixo_x, eixo_y)
+        except Exception as e:
+            resumo["erro_ia"] = str(e)
+    return figs, texto_ia
+
+# ============================================================
+# ORQUESTRAÇÃO DO LOTE
+# ============================================================
+
+def executar_lote(arquivos, pasta_saida, workers=None, refazer=False, opcoes=None, log=print):
+    """Processa os arquivos em paralelo e retorna a lista de resumos."""
+    opcoes = opcoes or {}
+    os.makedirs(pasta_saida, exist_ok=True)
+    nomes = nomes_de_saida(arquivos)
+
+    pendentes, resumos = [], []
+    for caminho in arquivos:
+        destino_pdf = os.path.join(pasta_saida, nomes[caminho] + ".pdf")
+        destino_json = os.path.join(pasta_saida, nomes[caminho] + ".json")
+        if not refazer and ja_processado(caminho, destino_pdf, destino_json):
+            log(f"[pulado] {caminho}")
+            resumos.append({"arquivo": caminho, "status": "pulado", "pdf": destino_pdf})
+        else:
+            pendentes.append((caminho, destino_pdf, destino_json))
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(pendentes) <= 1:
+        for caminho, destino_pdf, destino_json in pendentes:
+            resumo = processar_arquivo(caminho, destino_pdf, destino_json, opcoes)
+            log(f"[{resumo['status']}] {caminho} ({resumo['duracao_s']}s)")
+            resumos.append(resumo)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pendentes))) as pool:
+            futuros = {
+                pool.submit(processar_arquivo, caminho, destino_pdf, destino_json, opcoes): caminho
+                for caminho, destino_pdf, destino_json in pendentes
+            }
+            for futuro in as_completed(futuros):
+                caminho = futuros[futuro]
+                try:
+                    resumo = futuro.result()
+                except Exception as e:  # worker morreu (ex.: falta de memória)
+                    resumo = {"arquivo": caminho, "status": "erro", "erro": str(e)}
+                log(f"[{resumo['status']}] {caminho} ({resumo.get('duracao_s', '-')}s)")
+                resumos.append(resumo)
+
+    resumos.sort(key=lambda r: r["arquivo"])
+    return resumos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios PDF em lote a partir de planilhas.")
+    parser.add_argument("entradas", nargs="+", help="Pastas, arquivos ou globs de CSV/XLSX")
+    parser.add_argument("--saida", default="relatorios", help="Pasta de destino dos PDFs e resumos")
+    parser.add_argument("--workers", type=int, default=None, help="Processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--modo", choices=["seguro", "inteligente"], default="seguro",
+                        help="Carregador: seguro (limpeza forçada) ou inteligente (multi-aba)")
+    parser.add_argument("--usuario", default="Cliente", help="Nome exibido na capa do relatório")
+    parser.add_argument("--top-n", type=int, default=10, help="Itens nos rankings")
+    parser.add_argument("--sem-ia", action="store_true", help="Não gera o parecer automático")
+    parser.add_argument("--data-geracao", default=None,
+                        help="Data fixa do cabeçalho (ISO, ex.: 2024-01-31T18:00) para PDFs reprodutíveis")
+    parser.add_argument("--recursivo", action="store_true", help="Busca planilhas em subpastas")
+    parser.add_argument("--refazer", action="store_true", help="Reprocessa mesmo o que já foi gerado")
+    parser.add_argument("--motor", choices=["auto", "pandas", "arrow", "duckdb"], default="auto",
+                        help="Motor de agregação de CSVs (auto: arquivos grandes saem do pandas)")
+    args = parser.parse_args(argv)
+
+    arquivos = listar_planilhas(args.entradas, recursivo=args.recursivo)
+    if not arquivos:
+        print("Nenhuma planilha CSV/XLSX encontrada.", file=sys.stderr)
+        return 2
+
+    opcoes = {
+        "modo": args.modo,
+        "usuario": args.usuario,
+        "top_n": args.top_n,
+        "com_ia": not args.sem_ia,
+        "data_geracao": args.data_geracao,
+        "motor": args.motor,
+    }
+    inicio = time.perf_counter()
+    resumos = executar_lote(arquivos, args.saida, workers=args.workers, refazer=args.refazer, opcoes=opcoes)
+
+    contagem = {}
+    for resumo in resumos:
+        contagem[resumo["status"]] = contagem.get(resumo["status"], 0) + 1
+
+    consolidado = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "duracao_s": round(time.perf_counter() - inicio, 3),
+        "contagem": contagem,
+        "arquivos": [
+            {chave: r.get(chave) for chave in ("arquivo", "status", "pdf", "erro", "duracao_s")}
+            for r in resumos
+        ],
+    }
+    _gravar_atomico(
+        os.path.join(args.saida, ARQUIVO_RESUMO),
+        json.dumps(consolidado, ensure_ascii=False, indent=2).encode("utf-8")
+    )
+
+    print(f"Concluído: {contagem} em {consolidado['duracao_s']}s")
+    return 1 if contagem.get("erro") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,684 @@
+import csv
+import io
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# MOTOR DE CONSULTA — AGREGAÇÕES EM PANDAS, ARROW OU DUCKDB
+# ============================================================
+#
+# Mesma API (kpis, agrupar, pareto, tendencia_mensal) sobre três motores:
+#   - pandas: DataFrame em memória (padrão para arquivos pequenos)
+#   - arrow:  varre o arquivo em lotes (pyarrow.dataset), memória limitada
+#   - duckdb: SQL embarcado, multi-thread e com spill em disco (opcional)
+# Os motores de arquivo aplicam a mesma limpeza numérica do cleaner
+# (R$, separador de milhar e vírgula decimal) e leem datas dd/mm/aaaa.
+
+LIMITE_LINHAS_PANDAS = int(os.environ.get("PLATERO_LIMITE_LINHAS_PANDAS", "2000000"))
+LIMITE_BYTES_PANDAS = int(os.environ.get("PLATERO_LIMITE_PANDAS_MB", "512")) * 1024 * 1024
+TAMANHO_LOTE = 256 * 1024
+FORMATOS_DATA = ("%d/%m/%Y", "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
+SEPARADORES = (";", ",", "\t", "|")
+LINHAS_AMOSTRA = 50_000
+
+
+class MotorIndisponivel(Exception):
+    """O motor pedido depende de uma biblioteca que não está instalada."""
+
+
+def separador_da_amostra(dados):
+    """Separador mais frequente na primeira linha de uma amostra em bytes."""
+    linha = dados.split(b"\n", 1)[0].decode("latin-1")
+    return max(SEPARADORES, key=linha.count)
+
+
+def encoding_da_amostra(dados):
+    """utf-8 se a amostra decodifica, senão latin-1 (padrão do Excel BR)."""
+    try:
+        dados.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # Corte no meio de um caractere multibyte no fim da amostra não conta
+        return "utf-8" if e.start >= len(dados) - 3 else "latin-1"
+
+
+def detectar_separador(caminho):
+    """Separador mais frequente na primeira linha do CSV."""
+    with open(caminho, "rb") as f:
+        return separador_da_amostra(f.readline())
+
+
+def detectar_encoding(caminho, amostra=1024 * 1024):
+    """utf-8 se o início do arquivo decodifica, senão latin-1 (padrão do Excel BR)."""
+    with open(caminho, "rb") as f:
+        return encoding_da_amostra(f.read(amostra))
+
+
+def _cabecalho_csv(caminho, separador, encoding):
+    with open(caminho, encoding=encoding, newline="") as f:
+        return next(csv.reader(f, delimiter=separador))
+
+
+def _tipo_arquivo(caminho):
+    ext = os.path.splitext(caminho)[1].lower()
+    if ext in (".arrow", ".feather", ".ipc"):
+        return "ipc"
+    if ext == ".parquet":
+        return "parquet"
+    return "csv"
+
+
+class _Motor:
+    """Parte comum: Pareto é derivado do agrupamento de cada motor."""
+
+    nome = None
+    caminho = None
+
+    def assinatura(self):
+        """Identifica a versão da fonte consultada (entra na chave do cache de PDF)."""
+        if self.caminho is None:
+            return None
+        info = os.stat(self.caminho)
+        return f"{self.nome}:{os.path.abspath(self.caminho)}:{info.st_size}:{info.st_mtime_ns}"
+
+    def cobre(self, col_agrupamento, col_valor=None):
+        """Se o motor sabe agrupar por `col_agrupamento` (só o incremental tem limites)."""
+        return True
+
+    def pareto(self, col_categoria, col_valor, corte=0.80):
+        """
+        Curva de Pareto: valor, participação e participação acumulada por
+        categoria (ordem decrescente). `attrs["categorias_no_corte"]` traz
+        quantas categorias somam até `corte` do total.
+        """
+        agrupado = self.agrupar(col_categoria, col_valor).dropna()
+        total = agrupado.sum()
+        df = pd.DataFrame({"valor": agrupado})
+        df["participacao"] = df["valor"] / total if total > 0 else 0.0
+        df["acumulado"] = df["participacao"].cumsum()
+        df.attrs["categorias_no_corte"] = int((df["acumulado"] <= corte).sum())
+        df.attrs["total"] = float(total)
+        return df
+
+# ============================================================
+# PANDAS (padrão)
+# ============================================================
+
+class MotorPandas(_Motor):
+    nome = "pandas"
+
+    def __init__(self, df):
+        self.df = df
+
+    def colunas(self):
+        return [str(c) for c in self.df.columns]
+
+    def kpis(self, col_valor):
+        serie = pd.to_numeric(self.df[col_valor], errors="coerce")
+        return {
+            "total": float(serie.sum(skipna=True)),
+            "media": float(serie.mean(skipna=True)),
+            "minimo": float(serie.min(skipna=True)),
+            "maximo": float(serie.max(skipna=True)),
+            "desvio": float(serie.std(skipna=True)),
+            "contagem": int(serie.notna().sum()),
+            "registros": int(len(self.df)),
+        }
+
+    def agrupar(self, col_categoria, col_valor, top_n=None):
+        """Soma de `col_valor` por categoria (texto), em ordem decrescente."""
+        valores = pd.to_numeric(self.df[col_valor], errors="coerce")
+        agrupado = (
+            valores.groupby(self.df[col_categoria].astype(str))
+            .sum(min_count=1)
+            .sort_values(ascending=False)
+        )
+        agrupado.index.name = col_categoria
+        agrupado.name = col_valor
+        return agrupado.head(top_n) if top_n else agrupado
+
+    def tendencia_mensal(self, col_data, col_valor):
+        """Soma de `col_valor` por mês ("AAAA-MM"), em ordem cronológica."""
+        datas = self.df[col_data]
+        if not pd.api.types.is_datetime64_any_dtype(datas):
+            datas = pd.to_datetime(datas, errors="coerce", dayfirst=True)
+        valores = pd.to_numeric(self.df[col_valor], errors="coerce")
+        mensal = valores.groupby(datas.dt.strftime("%Y-%m")).sum(min_count=1).sort_index()
+        mensal.index.name = "mes"
+        mensal.name = col_valor
+        return mensal
+
+# ============================================================
+# ARROW (varredura em lotes, fora da memória)
+# ============================================================
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        import pyarrow.csv as pacsv
+        return pa, pc, ds, pacsv
+    except ImportError as e:
+        raise MotorIndisponivel("pyarrow não está instalado.") from e
+
+
+class MotorArrow(_Motor):
+    """
+    Varre o arquivo em lotes com pyarrow.dataset (leitura multi-thread) e
+    combina agregados parciais: só os agregados ficam em memória.
+    """
+
+    nome = "arrow"
+    MAX_PARCIAIS = 32  # agregados parciais antes de recombinar
+
+    def __init__(self, caminho, separador=None, encoding=None):
+        pa, pc, ds, pacsv = _pyarrow()
+        self.caminho = caminho
+        tipo = _tipo_arquivo(caminho)
+        if tipo != "csv":
+            self._dataset = ds.dataset(caminho, format=tipo)
+            return
+
+        separador = separador or detectar_separador(caminho)
+        encoding = encoding or detectar_encoding(caminho)
+        # Tudo lido como texto: a limpeza numérica e de datas é feita aqui
+        colunas = _cabecalho_csv(caminho, separador, encoding)
+        formato = ds.CsvFileFormat(
+            parse_options=pacsv.ParseOptions(delimiter=separador),
+            read_options=pacsv.ReadOptions(encoding=encoding, block_size=TAMANHO_LOTE * 16),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: pa.string() for c in colunas}, strings_can_be_null=True
+            ),
+        )
+        self._dataset = ds.dataset(caminho, format=formato)
+
+    def colunas(self):
+        return list(self._dataset.schema.names)
+
+    def _lotes(self, colunas):
+        return self._dataset.to_batches(columns=colunas, batch_size=TAMANHO_LOTE, use_threads=True)
+
+    # ------------------------------------------------------------
+    # Conversões vetorizadas (mesmas regras do cleaner)
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _como_numero(coluna):
+        pa, pc, _, _ = _pyarrow()
+        if pa.types.is_dictionary(coluna.type):
+            coluna = coluna.dictionary_decode()
+        if pa.types.is_integer(coluna.type) or pa.types.is_floating(coluna.type) or pa.types.is_decimal(coluna.type):
+            return pc.cast(coluna, pa.float64())
+        if pa.types.is_null(coluna.type):
+            return pa.nulls(len(coluna), pa.float64())
+
+        texto = pc.cast(coluna, pa.string())
+        texto = pc.replace_substring_regex(texto, r"[^\d.,\-]", "")
+        com_virgula = pc.match_substring(texto, ",")
+        texto = pc.if_else(
+            com_virgula,
+            pc.replace_substring(pc.replace_substring(texto, ".", ""), ",", "."),
+            texto
+        )
+        valido = pc.match_substring_regex(texto, r"^-?(\d+\.?\d*|\.\d+)$")
+        return pc.cast(pc.if_else(valido, texto, pa.scalar(None, pa.string())), pa.float64())
+
+    @staticmethod
+    def _como_data(coluna):
+        pa, pc, _, _ = _pyarrow()
+        if pa.types.is_dictionary(coluna.type):
+            coluna = coluna.dictionary_decode()
+        if pa.types.is_timestamp(coluna.type):
+            return coluna
+        if pa.types.is_date(coluna.type):
+            return pc.cast(coluna, pa.timestamp("s"))
+
+        texto = pc.utf8_trim_whitespace(pc.cast(coluna, pa.string()))
+        tentativas = [pc.strptime(texto, format=fmt, unit="s", error_is_null=True) for fmt in FORMATOS_DATA]
+        return pc.coalesce(*tentativas)
+
+    # ------------------------------------------------------------
+    # Agregações
+    # ------------------------------------------------------------
+
+    def kpis(self, col_valor):
+        pa, pc, _, _ = _pyarrow()
+        registros, n, media, m2 = 0, 0, 0.0, 0.0
+        total, minimo, maximo = 0.0, math.inf, -math.inf
+
+        for lote in self._lotes([col_valor]):
+            registros += lote.num_rows
+            valores = pc.drop_null(self._como_numero(lote.column(0)))
+            n_lote = len(valores)
+            if not n_lote:
+                continue
+            soma_lote = pc.sum(valores).as_py()
+            media_lote = soma_lote / n_lote
+            m2_lote = pc.variance(valores, ddof=0).as_py() * n_lote
+            extremos = pc.min_max(valores).as_py()
+
+            # Combinação de variâncias (Chan et al.): estável em um passe
+            delta = media_lote - media
+            novo_n = n + n_lote
+            media += delta * n_lote / novo_n
+            m2 += m2_lote + delta * delta * n * n_lote / novo_n
+            n = novo_n
+            total += soma_lote
+            minimo = min(minimo, extremos["min"])
+            maximo = max(maximo, extremos["max"])
+
+        nan = float("nan")
+        return {
+            "total": total,
+            "media": media if n else nan,
+            "minimo": minimo if n else nan,
+            "maximo": maximo if n else nan,
+            "desvio": math.sqrt(m2 / (n - 1)) if n > 1 else nan,
+            "contagem": n,
+            "registros": registros,
+        }
+
+    def _agregar(self, colunas, chave_de):
+        """Soma e contagem de valores por chave, lote a lote, recombinando os parciais."""
+        pa, pc, _, _ = _pyarrow()
+        parciais = []
+
+        def combinar(tabelas):
+            agregado = pa.concat_tables(tabelas).group_by("chave").aggregate([("soma", "sum"), ("n", "sum")])
+            return pa.table({
+                "chave": agregado["chave"], "soma": agregado["soma_sum"], "n": agregado["n_sum"]
+            })
+
+        for lote in self._lotes(colunas):
+            chave = chave_de(lote)
+            valores = self._como_numero(lote.column(colunas[-1]))
+            tabela = pa.table({"chave": chave, "valor": valores}).filter(pc.is_valid(chave))
+            parcial = tabela.group_by("chave").aggregate([("valor", "sum"), ("valor", "count")])
+            parciais.append(pa.table({
+                "chave": parcial["chave"], "soma": parcial["valor_sum"], "n": parcial["valor_count"]
+            }))
+            if len(parciais) >= self.MAX_PARCIAIS:
+                parciais = [combinar(parciais)]
+
+        if not parciais:
+            return pd.Series(dtype="float64")
+        final = combinar(parciais).to_pandas()
+        final.loc[final["n"] == 0, "soma"] = np.nan  # mesmo efeito de sum(min_count=1)
+        return final.set_index("chave")["soma"]
+
+    def agrupar(self, col_categoria, col_valor, top_n=None):
+        pa, pc, _, _ = _pyarrow()
+
+        def chave(lote):
+            coluna = lote.column(col_categoria)
+            if pa.types.is_dictionary(coluna.type):
+                coluna = coluna.dictionary_decode()
+            return pc.cast(coluna, pa.string())
+
+        agrupado = self._agregar([col_categoria, col_valor], chave).sort_values(ascending=False)
+        agrupado.index.name = col_categoria
+        agrupado.name = col_valor
+        return agrupado.head(top_n) if top_n else agrupado
+
+    def tendencia_mensal(self, col_data, col_valor):
+        pa, pc, _, _ = _pyarrow()
+
+        def chave(lote):
+            return pc.strftime(self._como_data(lote.column(col_data)), format="%Y-%m")
+
+        mensal = self._agregar([col_data, col_valor], chave).sort_index()
+        mensal.index.name = "mes"
+        mensal.name = col_valor
+        return mensal
+
+# ============================================================
+# DUCKDB (opcional)
+# ============================================================
+
+def _duckdb():
+    try:
+        import duckdb
+        return duckdb
+    except ImportError as e:
+        raise MotorIndisponivel("duckdb não está instalado (pip install duckdb).") from e
+
+
+def _ident(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def _literal(texto):
+    # CREATE VIEW não aceita parâmetros preparados: o caminho vai como literal
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+class MotorDuckDB(_Motor):
+    """SQL embarcado: paralelo, fora da memória (spill em disco) e sem servidor."""
+
+    nome = "duckdb"
+
+    def __init__(self, caminho, separador=None, encoding=None, limite_memoria=None):
+        duckdb = _duckdb()
+        self.caminho = caminho
+        self._con = duckdb.connect()
+        if limite_memoria:
+            self._con.execute(f"SET memory_limit = '{limite_memoria}'")
+
+        tipo = _tipo_arquivo(caminho)
+        if tipo == "csv":
+            opcoes = [f"delim = {_literal(separador or detectar_separador(caminho))}", "header = true", "all_varchar = true"]
+            if (encoding or detectar_encoding(caminho)) != "utf-8":
+                opcoes.append("encoding = 'latin-1'")
+            self._con.execute(
+                f"CREATE VIEW dados AS SELECT * FROM read_csv({_literal(caminho)}, {', '.join(opcoes)})"
+            )
+        elif tipo == "parquet":
+            self._con.execute(f"CREATE VIEW dados AS SELECT * FROM read_parquet({_literal(caminho)})")
+        else:
+            import pyarrow.dataset as ds
+            self._con.register("dados", ds.dataset(caminho, format="ipc"))
+
+    def colunas(self):
+        return [linha[0] for linha in self._con.execute("DESCRIBE dados").fetchall()]
+
+    @staticmethod
+    def _numero(coluna):
+        texto = f"regexp_replace(CAST({_ident(coluna)} AS VARCHAR), '[^0-9.,\\-]', '', 'g')"
+        return (
+            f"TRY_CAST(CASE WHEN {texto} LIKE '%,%' "
+            f"THEN replace(replace({texto}, '.', ''), ',', '.') ELSE {texto} END AS DOUBLE)"
+        )
+
+    @staticmethod
+    def _data(coluna):
+        texto = f"trim(CAST({_ident(coluna)} AS VARCHAR))"
+        formatos = ", ".join(f"TRY_STRPTIME({texto}, '{fmt}')" for fmt in FORMATOS_DATA)
+        return f"COALESCE({formatos})"
+
+    def kpis(self, col_valor):
+        v = self._numero(col_valor)
+        total, media, minimo, maximo, desvio, contagem, registros = self._con.execute(f"""
+            SELECT SUM({v}), AVG({v}), MIN({v}), MAX({v}), STDDEV_SAMP({v}), COUNT({v}), COUNT(*)
+            FROM dados
+        """).fetchone()
+        nan = float("nan")
+        return {
+            "total": float(total or 0.0),
+            "media": nan if media is None else float(media),
+            "minimo": nan if minimo is None else float(minimo),
+            "maximo": nan if maximo is None else float(maximo),
+            "desvio": nan if desvio is None else float(desvio),
+            "contagem": int(contagem),
+            "registros": int(registros),
+        }
+
+    def agrupar(self, col_categoria, col_valor, top_n=None):
+        limite = f"LIMIT {int(top_n)}" if top_n else ""
+        df = self._con.execute(f"""
+            SELECT CAST({_ident(col_categoria)} AS VARCHAR) AS chave, SUM({self._numero(col_valor)}) AS soma
+            FROM dados
+            WHERE {_ident(col_categoria)} IS NOT NULL
+            GROUP BY 1
+            ORDER BY soma DESC NULLS LAST
+            {limite}
+        """).df()
+        agrupado = df.set_index("chave")["soma"]
+        agrupado.index.name = col_categoria
+        agrupado.name = col_valor
+        return agrupado
+
+    def tendencia_mensal(self, col_data, col_valor):
+        df = self._con.execute(f"""
+            SELECT strftime({self._data(col_data)}, '%Y-%m') AS mes, SUM({self._numero(col_valor)}) AS soma
+            FROM dados
+            WHERE {self._data(col_data)} IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+        """).df()
+        mensal = df.set_index("mes")["soma"]
+        mensal.name = col_valor
+        return mensal
+
+# ============================================================
+# INCREMENTAL (agregados que se somam ao anexar linhas)
+# ============================================================
+
+LIMITE_GRUPOS = int(os.environ.get("PLATERO_LIMITE_GRUPOS_INCREMENTAL", "20000"))
+_ESTATISTICAS = ("contagem", "soma", "media", "m2", "minimo", "maximo")
+
+
+def _estatisticas_antigas(e):
+    """Formato anterior (soma dos quadrados) convertido para média e M2."""
+    if "m2" in e:
+        return e
+    n = e["contagem"]
+    media = e["soma"] / n if n else 0.0
+    m2 = max(e["soma_quadrados"] - e["soma"] * media, 0.0) if n else 0.0
+    return {**{k: v for k, v in e.items() if k != "soma_quadrados"}, "media": media, "m2": m2}
+
+
+class MotorIncremental(_Motor):
+    """
+    Agregados mescláveis de um dataset: por coluna numérica, contagem,
+    soma, média, M2 (soma dos quadrados dos desvios), mínimo e máximo;
+    por coluna de agrupamento
+    (categorias, e datas por dia), soma e contagem de cada numérica.
+    Anexar linhas novas custa o tamanho delas, não o do histórico:
+    `mesclar(MotorIncremental.de_dataframe(novas, ...))`.
+    Colunas de agrupamento com mais de LIMITE_GRUPOS valores não são
+    mantidas (`cobre()` devolve False e quem chama usa o DataFrame).
+    """
+
+    nome = "incremental"
+
+    def __init__(self, registros=0, estatisticas=None, somas=None, contagens=None, datas=()):
+        self.registros = int(registros)
+        self.estatisticas = estatisticas or {}   # numérica -> {contagem, soma, ...}
+        self.somas = somas or {}                 # agrupamento -> DataFrame (índice: chave, colunas: numéricas)
+        self.contagens = contagens or {}
+        self.datas = list(datas)
+
+    @classmethod
+    def de_dataframe(cls, df, numericas, agrupamentos=(), datas=(), limite_grupos=LIMITE_GRUPOS):
+        valores = pd.DataFrame({col: pd.to_numeric(df[col], errors="coerce") for col in numericas}, index=df.index)
+        estatisticas = {
+            col: {
+                "contagem": int(serie.notna().sum()),
+                "soma": float(serie.sum()),
+                "media": float(serie.mean()) if serie.notna().any() else 0.0,
+                "m2": float(((serie - serie.mean()) ** 2).sum()) if serie.notna().any() else 0.0,
+                "minimo": float(serie.min()) if serie.notna().any() else math.nan,
+                "maximo": float(serie.max()) if serie.notna().any() else math.nan,
+            }
+            for col, serie in valores.items()
+        }
+
+        somas, contagens = {}, {}
+        for col in [c for c in agrupamentos if c in df.columns] + [c for c in datas if c in df.columns]:
+            if col in datas:
+                chaves = pd.to_datetime(df[col], errors="coerce", dayfirst=True).dt.normalize()
+            else:
+                chaves = df[col].astype(str)
+            if chaves.nunique() > limite_grupos:
+                continue
+            grupos = valores.groupby(chaves)
+            somas[col], contagens[col] = grupos.sum(), grupos.count()
+        return cls(len(df), estatisticas, somas, contagens, [c for c in datas if c in somas])
+
+    def mesclar(self, outro, limite_grupos=LIMITE_GRUPOS):
+        """Novo motor com os agregados dos dois (colunas de agrupamento em comum)."""
+        estatisticas = {}
+        for col in self.estatisticas.keys() & outro.estatisticas.keys():
+            a, b = self.estatisticas[col], outro.estatisticas[col]
+            # Combinação de variâncias (Chan et al.), como em MotorArrow.kpis
+            n = a["contagem"] + b["contagem"]
+            delta = b["media"] - a["media"]
+            estatisticas[col] = {
+                "contagem": n,
+                "soma": a["soma"] + b["soma"],
+                "media": a["media"] + delta * b["contagem"] / n if n else 0.0,
+                "m2": a["m2"] + b["m2"] + delta * delta * a["contagem"] * b["contagem"] / n if n else 0.0,
+                "minimo": float(np.nanmin([a["minimo"], b["minimo"]])) if a["contagem"] or b["contagem"] else math.nan,
+                "maximo": float(np.nanmax([a["maximo"], b["maximo"]])) if a["contagem"] or b["contagem"] else math.nan,
+            }
+        somas, contagens = {}, {}
+        for col in self.somas.keys() & outro.somas.keys():
+            soma = self.somas[col].add(outro.somas[col], fill_value=0)
+            if len(soma) > limite_grupos:
+                continue
+            somas[col] = soma
+            contagens[col] = self.contagens[col].add(outro.contagens[col], fill_value=0).astype("int64")
+        return MotorIncremental(
+            self.registros + outro.registros, estatisticas, somas, contagens,
+            [c for c in self.datas if c in somas]
+        )
+
+    def cobre(self, col_agrupamento, col_valor=None):
+        return col_agrupamento in self.somas and (col_valor is None or col_valor in self.somas[col_agrupamento])
+
+    def colunas(self):
+        return list(dict.fromkeys(list(self.estatisticas) + list(self.somas)))
+
+    def kpis(self, col_valor):
+        e = self.estatisticas[col_valor]
+        n = e["contagem"]
+        return {
+            "total": e["soma"],
+            "media": e["media"] if n else math.nan,
+            "minimo": e["minimo"],
+            "maximo": e["maximo"],
+            "desvio": math.sqrt(e["m2"] / (n - 1)) if n > 1 else math.nan,
+            "contagem": n,
+            "registros": self.registros,
+        }
+
+    def _serie(self, col_agrupamento, col_valor):
+        # Sem nenhum valor no grupo a soma é NaN (como sum(min_count=1))
+        soma = self.somas[col_agrupamento][col_valor]
+        return soma.where(self.contagens[col_agrupamento][col_valor] > 0)
+
+    def agrupar(self, col_categoria, col_valor, top_n=None):
+        agrupado = self._serie(col_categoria, col_valor).sort_values(ascending=False)
+        if col_categoria in self.datas:
+            agrupado.index = agrupado.index.astype(str)
+        agrupado.index.name = col_categoria
+        agrupado.name = col_valor
+        return agrupado.head(top_n) if top_n else agrupado
+
+    def serie_temporal(self, col_data, col_valor):
+        """Soma por dia de `col_data`, em ordem cronológica (índice datetime)."""
+        serie = self._serie(col_data, col_valor).sort_index()
+        serie.index.name = col_data
+        serie.name = col_valor
+        return serie
+
+    def tendencia_mensal(self, col_data, col_valor):
+        diaria = self.serie_temporal(col_data, col_valor)
+        mensal = diaria.groupby(diaria.index.strftime("%Y-%m")).sum(min_count=1).sort_index()
+        mensal.index.name = "mes"
+        mensal.name = col_valor
+        return mensal
+
+    def para_dict(self):
+        """Forma serializável em JSON (o cache grava junto do dataset)."""
+        def tabela(df, data):
+            indice = df.index.strftime("%Y-%m-%d") if data else df.index.astype(str)
+            return {"indice": list(indice), "colunas": {str(c): df[c].tolist() for c in df.columns}}
+        return {
+            "registros": self.registros,
+            "estatisticas": self.estatisticas,
+            "datas": self.datas,
+            "somas": {col: tabela(df, col in self.datas) for col, df in self.somas.items()},
+            "contagens": {col: tabela(df, col in self.datas) for col, df in self.contagens.items()},
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        def tabela(conteudo, data):
+            indice = pd.to_datetime(conteudo["indice"]) if data else pd.Index(conteudo["indice"], dtype=object)
+            return pd.DataFrame(conteudo["colunas"], index=indice)
+        datas = dados.get("datas", [])
+        return cls(
+            dados["registros"],
+            {col: _estatisticas_antigas(e) for col, e in dados["estatisticas"].items()},
+            {col: tabela(t, col in datas) for col, t in dados["somas"].items()},
+            {col: tabela(t, col in datas).astype("int64") for col, t in dados["contagens"].items()},
+            datas,
+        )
+
+# ============================================================
+# ESCOLHA DO MOTOR
+# ============================================================
+
+MOTORES_ARQUIVO = {"arrow": MotorArrow, "duckdb": MotorDuckDB}
+
+
+def motores_disponiveis():
+    disponiveis = ["pandas"]
+    for nome, carregar in (("arrow", _pyarrow), ("duckdb", _duckdb)):
+        try:
+            carregar()
+            disponiveis.append(nome)
+        except MotorIndisponivel:
+            pass
+    return disponiveis
+
+
+def arquivo_grande(caminho, limite_bytes=None):
+    """True se o arquivo não deve ser materializado em pandas."""
+    return os.path.getsize(caminho) > (LIMITE_BYTES_PANDAS if limite_bytes is None else limite_bytes)
+
+
+def amostra_csv(caminho, linhas=LINHAS_AMOSTRA):
+    """
+    Primeiras `linhas` do CSV (com cabeçalho) como arquivo em memória, para
+    passar pelos carregadores do cleaner sem materializar o arquivo inteiro.
+    """
+    partes = []
+    with open(caminho, "rb") as f:
+        for _ in range(linhas + 1):
+            linha = f.readline()
+            if not linha:
+                break
+            partes.append(linha)
+    amostra = io.BytesIO(b"".join(partes))
+    amostra.name = os.path.basename(caminho)
+    return amostra
+
+
+def motor_para(df=None, caminho=None, motor="auto", **opcoes):
+    """
+    Escolhe o motor de consulta.
+
+    - motor="pandas" (ou "auto" com um DataFrame pequeno): usa `df`.
+    - motor="arrow" / "duckdb": consulta o arquivo em `caminho`.
+    - motor="auto" sem DataFrame (ou com DataFrame acima do limite de
+      linhas): duckdb se instalado, senão arrow.
+    """
+    motor = os.environ.get("PLATERO_MOTOR", motor) if motor == "auto" else motor
+
+    if motor == "pandas" or (motor == "auto" and df is not None and (
+        caminho is None or len(df) <= LIMITE_LINHAS_PANDAS
+    )):
+        if df is None:
+            raise ValueError("O motor pandas precisa de um DataFrame.")
+        return MotorPandas(df)
+
+    if caminho is None:
+        raise ValueError("Motores de arquivo precisam de `caminho`.")
+
+    if motor == "auto":
+        for nome in ("duckdb", "arrow"):
+            try:
+                return MOTORES_ARQUIVO[nome](caminho, **opcoes)
+            except MotorIndisponivel:
+                continue
+        raise MotorIndisponivel("Instale pyarrow ou duckdb para arquivos grandes.")
+
+    if motor not in MOTORES_ARQUIVO:
+        raise ValueError(f"Motor desconhecido: {motor}")
+    return MOTORES_ARQUIVO[motor](caminho, **opcoes)
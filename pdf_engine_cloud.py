@@ -1,65 +1,141 @@
-import tempfile
-import os
-import requests
+import io
+import hashlib
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 import unicodedata  # <--- NOVA IMPORTAÇÃO IMPORTANTE
 
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 from fpdf import FPDF
 
+import cache_relatorio
+from fontes_pdf import registrar_fontes, caracteres_suportados
+from ingestao import COLUNA_ORIGEM_ARQUIVO
+
 COR_AZUL = (0, 51, 102)
 COR_CINZA = (85, 85, 85)
 COR_TEXTO = (40, 40, 40)
 
-def sanitize_text(text):
+# Configuração padrão das figuras embutidas no PDF
+DPI_FIGURAS = 120
+FORMATOS_FIGURA = {"png": "png", "jpeg": "jpeg", "jpg": "jpeg"}
+QUALIDADE_JPEG = 85
+
+# Incrementar sempre que o layout do relatório mudar (invalida o cache)
+VERSAO_RELATORIO = 1
+
+# Limites das tabelas do relatório
+TOP_N_TABELA = 10
+MAX_LINHAS_TABELA = 30
+MAX_COLUNAS_TABELA = 6
+MAX_TABELAS_RANKING = 3
+LIMITE_CARACTERES_CELULA = 60
+
+# ============================================================
+# SANITIZAÇÃO DE TEXTO (operações em C pré-compiladas, custo linear)
+# ============================================================
+
+MARCADORES_MARKDOWN = ("**", "__", "##", "`", "$")  # negrito/itálico/code e cifrão LaTeX
+
+SUBSTITUICOES = {
+    "•": "-", "–": "-", "—": "-",
+    "“": '"', "”": '"', "‘": "'", "’": "'",
+    "…": "..."
+}
+
+_RE_FORA_LATIN1 = re.compile(r"[^\x00-\xff]")
+_RE_NAO_SUPORTADOS = {}
+
+
+def _regex_nao_suportados(familia):
     """
-    Limpeza profunda: Remove Markdown, Emojis e converte para Latin-1 seguro.
+    Regex (compilada uma vez por família) que casa os caracteres sem glifo
+    na fonte: a classe é montada a partir das faixas do cmap da DejaVu.
+    """
+    regex = _RE_NAO_SUPORTADOS.get(familia)
+    if regex is not None:
+        return regex
+
+    faixas = []
+    for codigo in sorted(c for c in caracteres_suportados(familia) if c > 0xFF):
+        if faixas and faixas[-1][1] == codigo - 1:
+            faixas[-1][1] = codigo
+        else:
+            faixas.append([codigo, codigo])
+
+    classe = "".join(
+        re.escape(chr(ini)) if ini == fim else f"{re.escape(chr(ini))}-{re.escape(chr(fim))}"
+        for ini, fim in faixas
+    )
+    regex = re.compile(f"[^\\x00-\\xff{classe}]")
+    _RE_NAO_SUPORTADOS[familia] = regex
+    return regex
+
+
+def sanitize_text(text, unicode=False, familia="DejaVu"):
+    """
+    Limpeza profunda: Remove Markdown e Emojis.
+
+    Com unicode=False converte para Latin-1 seguro (fontes padrão do PDF).
+    Com unicode=True preserva acentos e símbolos que a fonte da família
+    desenha, trocando por espaço apenas o que ela não cobre.
     """
     if not text:
         return ""
-    
+
     # 1. Remove formatação Markdown da IA (**, ##, $$, etc)
-    text = re.sub(r'\*\*|__|##|`', '', text)  # Remove negrito/itálico/code
-    text = re.sub(r'\$\$|\$', '', text)       # Remove LaTeX cifrão
-    
-    # 2. Substituições visuais para caracteres comuns
-    replacements = {
-        "•": "-", "–": "-", "—": "-", 
-        "“": '"', "”": '"', "‘": "'", "’": "'",
-        "…": "..."
-    }
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
-
-    # 3. REMOÇÃO DE EMOJIS E SÍMBOLOS (A "Limpeza Nuclear")
-    # Em vez de listar um por um, removemos tudo que não é texto padrão.
-    # Mantém letras, números, pontuação básica e quebras de linha.
-    text_safe = ""
-    for char in text:
-        # Se for caractere ASCII ou Latin-1 válido (acentos), mantém.
-        if ord(char) < 256:
-            text_safe += char
-        else:
-            # Se for símbolo complexo (emoji), troca por espaço
-            text_safe += " "
-            
-    # 4. Normaliza espaços (mantendo as quebras de linha importantes)
-    lines = text_safe.split('\n')
-    cleaned_lines = [re.sub(r'\s+', ' ', line).strip() for line in lines]
-    text = "\n".join(cleaned_lines)
-        
-    # 5. Codificação Final (Garante que nada explode)
-    return text.encode('latin-1', 'replace').decode('latin-1')
+    for marcador in MARCADORES_MARKDOWN:
+        text = text.replace(marcador, "")
+
+    if unicode:
+        # 2. Mantém tudo que a fonte embarcada consegue desenhar
+        text = _regex_nao_suportados(familia).sub(" ", text)
+    else:
+        # 2. Substituições visuais e remoção do que não existe em Latin-1
+        for char, replacement in SUBSTITUICOES.items():
+            text = text.replace(char, replacement)
+        text = _RE_FORA_LATIN1.sub(" ", text)
+
+    # 3. Normaliza espaços (mantendo as quebras de linha importantes)
+    return "\n".join(" ".join(linha.split()) for linha in text.split("\n"))
+
+
+def renderizar_figura(fig, dpi=DPI_FIGURAS, formato="png", qualidade=QUALIDADE_JPEG):
+    """
+    Renderiza uma figura matplotlib direto para bytes (sem passar pelo disco).
+    """
+    formato_mpl = FORMATOS_FIGURA.get(str(formato).lower())
+    if formato_mpl is None:
+        raise ValueError(f"Formato de figura não suportado: {formato}")
+    formato = formato_mpl
+
+    buffer = io.BytesIO()
+    kwargs = {"format": formato, "dpi": dpi, "bbox_inches": "tight"}
+    if formato == "jpeg":
+        kwargs["pil_kwargs"] = {"quality": qualidade, "optimize": True}
+    fig.savefig(buffer, **kwargs)
+    return buffer.getvalue()
 
 
 class PDF(FPDF):
-    def __init__(self, orientation="P", unit="mm", format="A4"):
+    def __init__(
+        self,
+        orientation="P",
+        unit="mm",
+        format="A4",
+        dpi_figuras=DPI_FIGURAS,
+        formato_figuras="png",
+        qualidade_jpeg=QUALIDADE_JPEG,
+        data_geracao=None
+    ):
         super().__init__(orientation=orientation, unit=unit, format=format)
         self.use_unicode = False
+        # Data fixa no cabeçalho (None = momento da geração)
+        self.data_geracao = data_geracao
+        self.dpi_figuras = dpi_figuras
+        self.formato_figuras = formato_figuras
+        self.qualidade_jpeg = qualidade_jpeg
+        # Imagens já embutidas, indexadas pelo hash do conteúdo renderizado
+        self._imagens = {}
 
     def header(self):
         font = "DejaVu" if self.use_unicode else "Helvetica"
@@ -69,7 +145,7 @@ class PDF(FPDF):
 
         self.set_font(font, '', 9)
         self.set_text_color(*COR_CINZA)
-        data_str = datetime.now().strftime('%d/%m/%Y %H:%M')
+        data_str = (self.data_geracao or datetime.now()).strftime('%d/%m/%Y %H:%M')
         self.cell(0, 6, f"Gerado em {data_str}", ln=True, align="L")
         self.ln(4)
 
@@ -85,7 +161,7 @@ class PDF(FPDF):
         self.set_font(font, 'B', 12)
         self.set_text_color(*COR_AZUL)
         self.ln(4)
-        texto = sanitize_text(texto)
+        texto = sanitize_text(texto, unicode=self.use_unicode)
         self.cell(0, 8, texto, ln=True)
         self.set_draw_color(200, 200, 200)
         y = self.get_y()
@@ -96,16 +172,92 @@ class PDF(FPDF):
         font = "DejaVu" if self.use_unicode else "Helvetica"
         self.set_font(font, '', 10)
         self.set_text_color(*COR_TEXTO)
-        texto = sanitize_text(texto)
+        texto = sanitize_text(texto, unicode=self.use_unicode)
         self.multi_cell(0, 5, texto)
         self.ln(2)
 
     def inserir_figura(self, fig, largura=170):
+        """Insere uma figura matplotlib ou os bytes de uma figura já renderizada."""
         if fig is None:
             return
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
-            fig.savefig(tmp.name, dpi=120, bbox_inches="tight")
-            self.image(tmp.name, x=15, w=largura)
+        if isinstance(fig, (bytes, bytearray)):
+            dados = bytes(fig)
+        else:
+            dados = renderizar_figura(
+                fig,
+                dpi=self.dpi_figuras,
+                formato=self.formato_figuras,
+                qualidade=self.qualidade_jpeg
+            )
+
+        # Imagens idênticas são embutidas uma única vez e apenas referenciadas
+        # novamente (o FPDF reaproveita o mesmo objeto para o mesmo buffer).
+        chave = hashlib.sha1(dados).hexdigest()
+        buffer = self._imagens.get(chave)
+        if buffer is None:
+            buffer = io.BytesIO(dados)
+            self._imagens[chave] = buffer
+        self.image(buffer, x=15, w=largura)
+
+    def _ajustar_celula(self, texto, largura):
+        """Corta o texto para caber na largura da célula."""
+        texto = sanitize_text(str(texto), unicode=self.use_unicode)[:LIMITE_CARACTERES_CELULA]
+        limite = largura - 2 * self.c_margin
+        if self.get_string_width(texto) <= limite:
+            return texto
+        sufixo = "…" if self.use_unicode else "..."
+        while texto and self.get_string_width(texto + sufixo) > limite:
+            texto = texto[:-1]
+        return texto + sufixo
+
+    def _cabecalho_tabela(self, cabecalho, larguras, altura):
+        font = "DejaVu" if self.use_unicode else "Helvetica"
+        self.set_font(font, 'B', 9)
+        self.set_fill_color(*COR_AZUL)
+        self.set_text_color(255, 255, 255)
+        self.set_draw_color(200, 200, 200)
+        for texto, largura in zip(cabecalho, larguras):
+            self.cell(largura, altura, self._ajustar_celula(texto, largura), border=1, align="C", fill=True)
+        self.ln(altura)
+        self.set_font(font, '', 8)
+        self.set_text_color(*COR_TEXTO)
+
+    def tabela(self, cabecalho, linhas, larguras=None, alinhamentos=None, altura=6):
+        """
+        Desenha uma tabela consumindo as linhas de um iterador, uma por vez.
+
+        Nada é materializado: cada linha é escrita e descartada, e a cada
+        quebra de página o cabeçalho é repetido. Retorna as linhas escritas.
+        """
+        if not cabecalho:
+            return 0
+        if larguras is None:
+            larguras = [self.epw / len(cabecalho)] * len(cabecalho)
+        if alinhamentos is None:
+            alinhamentos = ["L"] * len(cabecalho)
+
+        if self.will_page_break(altura * 2):
+            self.add_page()
+        self._cabecalho_tabela(cabecalho, larguras, altura)
+
+        escritas = 0
+        for linha in linhas:
+            if self.will_page_break(altura):
+                self.add_page()
+                self._cabecalho_tabela(cabecalho, larguras, altura)
+
+            zebra = escritas % 2 == 1
+            self.set_fill_color(245, 245, 245)
+            for valor, largura, alinhamento in zip(linha, larguras, alinhamentos):
+                self.cell(
+                    largura, altura, self._ajustar_celula(valor, largura),
+                    border=1, align=alinhamento, fill=zebra
+                )
+            self.ln(altura)
+            escritas += 1
+
+        self.ln(3)
+        return escritas
 
 def fmt_num(x):
     try:
@@ -113,18 +265,98 @@ def fmt_num(x):
     except:
         return str(x)
 
-def check_download_font():
-    # Tenta baixar a fonte, mas se falhar, o sanitize_text garante que o PDF não quebra
-    font_path = "DejaVuSans.ttf"
-    if not os.path.exists(font_path):
-        url = "https://github.com/reingart/pyfpdf/raw/master/fpdf/font/DejaVuSans.ttf"
-        try:
-            r = requests.get(url, allow_redirects=True, timeout=5)
-            with open(font_path, 'wb') as f:
-                f.write(r.content)
-        except:
+def fmt_celula(x):
+    if x is None or (not isinstance(x, str) and pd.isna(x)):
+        return ""
+    if isinstance(x, pd.Timestamp):
+        return x.strftime("%d/%m/%Y")
+    if isinstance(x, (int, float)) and not isinstance(x, bool):
+        return fmt_num(x)
+    return str(x)
+
+# ============================================================
+# ITERADORES DE TABELA (memória limitada)
+# ============================================================
+
+def iter_ranking(df, col_categoria, col_valor, top_n=TOP_N_TABELA):
+    """
+    Gera as linhas do ranking de uma categoria: top N + "Outros".
+
+    Só o agrupamento (uma linha por categoria) fica em memória; as linhas
+    da tabela são produzidas sob demanda.
+    """
+    valores = pd.to_numeric(df[col_valor], errors="coerce")
+    agrupado = valores.groupby(df[col_categoria].astype(str)).sum(min_count=1)
+    yield from linhas_ranking(agrupado, top_n)
+
+
+def linhas_ranking(agrupado, top_n=TOP_N_TABELA):
+    """Linhas do ranking a partir de um agrupamento já calculado (Series categoria → soma)."""
+    agrupado = agrupado.dropna()
+    if agrupado.empty:
+        return
+
+    total = agrupado.sum()
+    top = agrupado.nlargest(top_n)
+
+    def percentual(valor):
+        return f"{valor / total * 100:.1f}%" if total else "-"
+
+    for posicao, (categoria, valor) in enumerate(top.items(), start=1):
+        yield [str(posicao), categoria, fmt_num(valor), percentual(valor)]
+
+    restantes = len(agrupado) - len(top)
+    if restantes > 0:
+        valor_outros = total - top.sum()
+        yield ["-", f"Outros ({restantes})", fmt_num(valor_outros), percentual(valor_outros)]
+
+
+# ============================================================
+# AMOSTRAS (peso de cada linha)
+# ============================================================
+
+def pesos_amostra(df, fracao_amostra):
+    """
+    Peso de cada linha de uma amostra: o inverso da fração amostrada.
+
+    `fracao_amostra` é uma fração única ou, numa base consolidada,
+    {arquivo: fração} casado pela coluna Origem_Arquivo (cada arquivo pode
+    ter sido amostrado numa fração diferente). Retorna None se nenhuma
+    linha vem de amostra.
+    """
+    if fracao_amostra is None:
+        return None
+    if isinstance(fracao_amostra, dict):
+        if not any(f < 1 for f in fracao_amostra.values()):
             return None
-    return font_path if os.path.exists(font_path) else None
+        if COLUNA_ORIGEM_ARQUIVO in df.columns:
+            fracoes = df[COLUNA_ORIGEM_ARQUIVO].astype(object).map(fracao_amostra)
+            return 1.0 / pd.to_numeric(fracoes, errors="coerce").fillna(1.0)
+        unicas = set(fracao_amostra.values())
+        if len(unicas) > 1:
+            raise ValueError("Frações diferentes por arquivo exigem a coluna " + COLUNA_ORIGEM_ARQUIVO)
+        fracao_amostra = unicas.pop()
+    if fracao_amostra >= 1:
+        return None
+    return pd.Series(1.0 / fracao_amostra, index=df.index)
+
+
+def descrever_amostra(fracao_amostra):
+    """Frase com a(s) fração(ões) amostrada(s), para capa e KPIs."""
+    fracoes = sorted(set(fracao_amostra.values())) if isinstance(fracao_amostra, dict) else [fracao_amostra]
+    if len(fracoes) == 1:
+        return f"amostra aleatória de {fracoes[0] * 100:.1f}% das linhas"
+    return f"amostras aleatórias de {fracoes[0] * 100:.1f}% a {fracoes[-1] * 100:.1f}% das linhas, conforme o arquivo"
+
+
+def iter_linhas(df, colunas, max_linhas=MAX_LINHAS_TABELA, bloco=500):
+    """Gera as primeiras linhas do DataFrame formatadas, em blocos."""
+    limite = min(max_linhas, len(df))
+    for inicio in range(0, limite, bloco):
+        pedaco = df.iloc[inicio:min(inicio + bloco, limite)][colunas]
+        for linha in pedaco.itertuples(index=False, name=None):
+            yield [fmt_celula(v) for v in linha]
+
 
 def gerar_pdf_pro(
     df_original,
@@ -135,20 +367,100 @@ def gerar_pdf_pro(
     figs_principais,
     texto_ia,
     usuario="Cliente",
-    coluna_alvo=None
+    coluna_alvo=None,
+    dpi_figuras=DPI_FIGURAS,
+    formato_figuras="png",
+    top_n_tabelas=TOP_N_TABELA,
+    max_linhas_tabela=MAX_LINHAS_TABELA,
+    max_colunas_tabela=MAX_COLUNAS_TABELA,
+    data_geracao=None,
+    usar_cache=False,
+    diretorio_cache=None,
+    progresso=None,
+    motor=None,
+    fracao_amostra=None
 ):
-    pdf = PDF(orientation="P", unit="mm", format="A4")
+    """
+    Gera o relatório executivo em PDF.
+
+    Com `data_geracao` fixa, entradas idênticas geram PDFs idênticos byte a
+    byte. Com `usar_cache=True` o PDF é buscado/gravado no cache em disco,
+    indexado pelo hash das entradas semânticas (dados, colunas, figuras,
+    texto da IA, usuário e opções).
+
+    `progresso(fracao, mensagem)` é chamado entre as etapas; se ele levantar
+    uma exceção (ex.: cancelamento), a geração é interrompida.
+
+    `motor` (motor_consulta) calcula KPIs e rankings sobre o arquivo
+    completo; `df_limpo` passa a ser só a amostra exibida no relatório.
+
+    `fracao_amostra` < 1 indica que `df_limpo` é uma amostra aleatória
+    dessa fração das linhas (plano de carga "amostra"); numa base
+    consolidada pode ser {arquivo: fração} (ver pesos_amostra). Cada linha
+    pesa o inverso da fração do seu arquivo: total, registros e rankings
+    são extrapolados e todos os números saem marcados como estimativas.
+    """
+    pesos = pesos_amostra(df_limpo, fracao_amostra) if motor is None else None
+    amostral = pesos is not None
+    if progresso is None:
+        progresso = lambda fracao, mensagem=None: None
+
+    progresso(0.05, "Renderizando gráficos...")
+    # Renderiza as figuras uma única vez: os bytes entram na chave do cache
+    # e são reaproveitados na montagem do documento.
+    figuras = [
+        renderizar_figura(fig, dpi=dpi_figuras, formato=formato_figuras)
+        for fig in (figs_principais or [])
+        if fig is not None
+    ]
+
+    chave = None
+    if usar_cache:
+        # "Gerado em" faz parte do documento: sem data fixa, o minuto atual
+        # (a precisão impressa) entra na chave, e um acerto nunca devolve
+        # um PDF com a data de outra geração
+        if data_geracao is None:
+            data_geracao = datetime.now().replace(second=0, microsecond=0)
+        chave = cache_relatorio.chave_relatorio(
+            df_limpo,
+            figuras,
+            versao=VERSAO_RELATORIO,
+            datas=list(datas),
+            numericas=list(numericas),
+            categoricas=list(categoricas),
+            texto_ia=texto_ia or "",
+            usuario=usuario,
+            coluna_alvo=coluna_alvo,
+            dpi_figuras=dpi_figuras,
+            formato_figuras=formato_figuras,
+            top_n_tabelas=top_n_tabelas,
+            max_linhas_tabela=max_linhas_tabela,
+            max_colunas_tabela=max_colunas_tabela,
+            data_geracao=data_geracao.isoformat() if data_geracao else None,
+            fonte=motor.assinatura() if motor is not None else None,
+            fracao_amostra=fracao_amostra if amostral else None
+        )
+        em_cache = cache_relatorio.obter(chave, diretorio_cache)
+        if em_cache is not None:
+            progresso(1.0, "Relatório recuperado do cache")
+            return em_cache
+
+    progresso(0.3, "Montando o documento...")
+
+    pdf = PDF(
+        orientation="P",
+        unit="mm",
+        format="A4",
+        dpi_figuras=dpi_figuras,
+        formato_figuras=formato_figuras,
+        data_geracao=data_geracao
+    )
+    if data_geracao is not None:
+        criacao = data_geracao if data_geracao.tzinfo else data_geracao.replace(tzinfo=timezone.utc)
+        pdf.set_creation_date(criacao)
     
-    font_path = check_download_font()
-    if font_path:
-        try:
-            pdf.add_font("DejaVu", "", font_path)
-            pdf.add_font("DejaVu", "B", font_path)
-            pdf.use_unicode = True
-        except:
-            pdf.use_unicode = False
-    else:
-        pdf.use_unicode = False
+    # Fontes embarcadas no projeto (sem download, com cache por processo)
+    pdf.use_unicode = registrar_fontes(pdf, "DejaVu")
 
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.alias_nb_pages()
@@ -165,8 +477,11 @@ def gerar_pdf_pro(
     pdf.set_text_color(*COR_CINZA)
     pdf.ln(5)
     
-    usuario = sanitize_text(usuario)
+    usuario = sanitize_text(usuario, unicode=pdf.use_unicode)
     pdf.cell(0, 8, f"Cliente: {usuario}", ln=True, align="C")
+    if amostral:
+        pdf.cell(0, 8, f"Valores estimados a partir de {descrever_amostra(fracao_amostra)}",
+                 ln=True, align="C")
 
     # RESUMO / KPIs
     pdf.add_page()
@@ -182,33 +497,110 @@ def gerar_pdf_pro(
         col_valor = numericas[0]
 
     if col_valor:
-        serie = pd.to_numeric(df_limpo[col_valor], errors="coerce")
-        total = serie.sum(skipna=True)
-        media = serie.mean(skipna=True)
-        minimo = serie.min(skipna=True)
-        maximo = serie.max(skipna=True)
-        desvio = serie.std(skipna=True)
-
-        texto = (
-            f"Coluna analisada: {col_valor}\n\n"
-            f"- Total: {fmt_num(total)}\n"
-            f"- Média: {fmt_num(media)}\n"
-            f"- Mínimo: {fmt_num(minimo)}\n"
-            f"- Máximo: {fmt_num(maximo)}\n"
-            f"- Desvio padrão: {fmt_num(desvio)}\n"
-            f"- Registros: {len(df_limpo)}"
-        )
+        if motor is not None:
+            kpis = motor.kpis(col_valor)
+            total, media, desvio = kpis["total"], kpis["media"], kpis["desvio"]
+            minimo, maximo, registros = kpis["minimo"], kpis["maximo"], kpis["registros"]
+        else:
+            serie = pd.to_numeric(df_limpo[col_valor], errors="coerce")
+            total = serie.sum(skipna=True)
+            media = serie.mean(skipna=True)
+            minimo = serie.min(skipna=True)
+            maximo = serie.max(skipna=True)
+            desvio = serie.std(skipna=True)
+            registros = len(df_limpo)
+
+        if amostral:
+            # Cada linha vale o inverso da fração amostrada do seu arquivo:
+            # total, contagem, média e desvio são ponderados (com uma fração
+            # só, média e desvio coincidem com os da amostra); mínimo e
+            # máximo são da amostra
+            validos = serie.notna()
+            peso_validos = pesos[validos].sum()
+            total = (serie * pesos).sum(skipna=True)
+            media = total / peso_validos if peso_validos else float("nan")
+            n = int(validos.sum())
+            desvio = (
+                ((pesos[validos] * (serie[validos] - media) ** 2).sum() / peso_validos * n / (n - 1)) ** 0.5
+                if n > 1 else float("nan")
+            )
+            texto = (
+                f"Coluna analisada: {col_valor}\n"
+                f"Valores estimados: {descrever_amostra(fracao_amostra)}.\n\n"
+                f"- Total (estimado): {fmt_num(total)}\n"
+                f"- Média (estimada): {fmt_num(media)}\n"
+                f"- Mínimo na amostra: {fmt_num(minimo)}\n"
+                f"- Máximo na amostra: {fmt_num(maximo)}\n"
+                f"- Desvio padrão (estimado): {fmt_num(desvio)}\n"
+                f"- Registros (estimado): {round(pesos.sum())} ({registros} na amostra)"
+            )
+        else:
+            texto = (
+                f"Coluna analisada: {col_valor}\n\n"
+                f"- Total: {fmt_num(total)}\n"
+                f"- Média: {fmt_num(media)}\n"
+                f"- Mínimo: {fmt_num(minimo)}\n"
+                f"- Máximo: {fmt_num(maximo)}\n"
+                f"- Desvio padrão: {fmt_num(desvio)}\n"
+                f"- Registros: {registros}"
+            )
         pdf.paragrafo(texto)
     else:
         pdf.paragrafo("Nenhuma coluna numérica válida para KPIs.")
 
     # GRÁFICOS
-    if figs_principais:
+    progresso(0.4, "Inserindo gráficos...")
+    if figuras:
         pdf.titulo("Gráficos principais")
-        for fig in figs_principais:
-            pdf.inserir_figura(fig)
+        for dados_fig in figuras:
+            pdf.inserir_figura(dados_fig)
             pdf.ln(5)
 
+    # RANKINGS POR CATEGORIA
+    progresso(0.6, "Montando tabelas...")
+    if col_valor and categoricas:
+        # Na amostra, as somas por categoria usam os valores já ponderados
+        df_ranking = (
+            df_limpo.assign(**{col_valor: pd.to_numeric(df_limpo[col_valor], errors="coerce") * pesos})
+            if amostral else df_limpo
+        )
+        pdf.add_page()
+        pdf.titulo("Rankings por categoria")
+        for col_cat in categoricas[:MAX_TABELAS_RANKING]:
+            if col_cat not in df_limpo.columns:
+                continue
+            pdf.paragrafo(
+                f"{col_valor} por {col_cat} (top {top_n_tabelas})"
+                + (" — somas estimadas a partir da amostra" if amostral else "")
+            )
+            pdf.tabela(
+                ["#", col_cat, col_valor, "% do total"],
+                linhas_ranking(motor.agrupar(col_cat, col_valor), top_n=top_n_tabelas)
+                if motor is not None else
+                iter_ranking(df_ranking, col_cat, col_valor, top_n=top_n_tabelas),
+                larguras=[12, pdf.epw - 82, 40, 30],
+                alinhamentos=["C", "L", "R", "R"]
+            )
+
+    # AMOSTRA DOS DADOS
+    colunas_amostra = list(df_limpo.columns[:max_colunas_tabela])
+    if colunas_amostra and len(df_limpo) > 0:
+        pdf.add_page()
+        pdf.titulo("Amostra dos dados tratados")
+        omitidas = len(df_limpo.columns) - len(colunas_amostra)
+        nota = f"Primeiras {min(max_linhas_tabela, len(df_limpo))} de {len(df_limpo)} linhas"
+        if omitidas > 0:
+            nota += f"; {omitidas} coluna(s) omitida(s)"
+        pdf.paragrafo(nota + ".")
+        alinhamentos = [
+            "R" if pd.api.types.is_numeric_dtype(df_limpo[c]) else "L" for c in colunas_amostra
+        ]
+        pdf.tabela(
+            colunas_amostra,
+            iter_linhas(df_limpo, colunas_amostra, max_linhas=max_linhas_tabela),
+            alinhamentos=alinhamentos
+        )
+
     # TEXTO DA IA
     pdf.add_page()
     pdf.titulo("Parecer da Inteligência Artificial")
@@ -218,4 +610,11 @@ def gerar_pdf_pro(
     else:
         pdf.paragrafo("Nenhum parecer de IA foi fornecido.")
 
-    return bytes(pdf.output())
\ No newline at end of file
+    progresso(0.85, "Finalizando o arquivo...")
+    resultado = bytes(pdf.output())
+    if chave is not None:
+        try:
+            cache_relatorio.salvar(chave, resultado, diretorio_cache)
+        except OSError:
+            pass  # Cache é otimização: falha de disco não impede o relatório
+    return resultado
\ No newline at end of file
@@ -0,0 +1,162 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from cleaner import limpar_coluna_numerica
+
+# ============================================================
+# PERFIL COMPACTO DE COLUNAS (gravado a cada upload)
+# ============================================================
+
+TOP_K = 10
+PONTOS_QUANTIS = 21  # mínimo, 5%, 10%, ..., 95%, máximo
+
+# Ordem de precedência dos grupos de detectar_tipos
+GRUPOS_TIPO = (
+    ("datas", "data"),
+    ("numericas", "numerica"),
+    ("booleanas", "booleana"),
+    ("texto_livre", "texto"),
+    ("categoricas", "categorica"),
+)
+
+
+def _numero(valor):
+    """float nativo (JSON/SQLite) ou None para NaN/inf."""
+    if valor is None:
+        return None
+    valor = float(valor)
+    return valor if math.isfinite(valor) else None
+
+
+def _como_numero(serie):
+    """Numérico limpo (R$, vírgula decimal...) preservando o índice; nulos ficam NaN."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.to_numeric(serie, errors="coerce")
+    presentes = serie.notna().to_numpy()
+    valores = np.full(len(serie), np.nan)
+    if presentes.any():
+        limpos = pd.to_numeric(limpar_coluna_numerica(serie[presentes]), errors="coerce")
+        valores[presentes] = limpos.to_numpy(dtype="float64", na_value=np.nan)
+    return pd.Series(valores, index=serie.index)
+
+
+def tipo_da_coluna(col, serie, tipos=None):
+    """Rótulo do tipo: usa a detecção do app quando disponível, senão o dtype."""
+    if tipos:
+        for chave, rotulo in GRUPOS_TIPO:
+            if col in tipos.get(chave, ()):
+                return rotulo
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return "data"
+    if pd.api.types.is_bool_dtype(serie):
+        return "booleana"
+    if pd.api.types.is_numeric_dtype(serie):
+        return "numerica"
+    return "categorica"
+
+
+def _perfil_numerico(serie):
+    valores = _como_numero(serie).to_numpy(dtype="float64", na_value=np.nan)
+    validos = valores[np.isfinite(valores)]
+    if not len(validos):
+        return {"contagem": 0, "soma": None, "media": None, "minimo": None, "maximo": None, "quantis": None}
+
+    quantis = np.quantile(validos, np.linspace(0, 1, PONTOS_QUANTIS))
+    return {
+        "contagem": int(len(validos)),
+        "distintos": int(len(np.unique(validos))),
+        "soma": _numero(validos.sum()),
+        "media": _numero(validos.mean()),
+        "minimo": _numero(validos.min()),
+        "maximo": _numero(validos.max()),
+        "quantis": [_numero(q) for q in quantis],
+    }
+
+
+def _perfil_data(serie):
+    if not pd.api.types.is_datetime64_any_dtype(serie):
+        serie = pd.to_datetime(serie, errors="coerce", dayfirst=True)
+    validos = serie.dropna()
+    if validos.empty:
+        return {"contagem": 0}
+    return {
+        "contagem": int(len(validos)),
+        "distintos": int(validos.nunique()),
+        "minimo": validos.min().isoformat(),
+        "maximo": validos.max().isoformat(),
+    }
+
+
+def _perfil_categorico(serie, valores, top_k):
+    validos = serie.notna()
+    rotulos = serie[validos].astype(str)
+    if rotulos.empty:
+        return {"contagem": 0, "distintos": 0, "top": []}
+
+    if valores is None:
+        contagens = rotulos.value_counts()
+        distintos = len(contagens)
+        top = [[str(cat), int(n), None] for cat, n in contagens.head(top_k).items()]
+    else:
+        agrupado = (
+            pd.DataFrame({"cat": rotulos.to_numpy(), "valor": valores[validos].to_numpy()})
+            .groupby("cat", sort=False)["valor"]
+            .agg(["size", "sum"])
+        )
+        distintos = len(agrupado)
+        agrupado = agrupado.sort_values(["size", "sum"], ascending=False).head(top_k)
+        top = [[str(cat), int(linha["size"]), _numero(linha["sum"])] for cat, linha in agrupado.iterrows()]
+
+    return {"contagem": int(len(rotulos)), "distintos": int(distintos), "top": top}
+
+
+def perfilar(df, tipos=None, col_valor=None, top_k=TOP_K):
+    """
+    Perfil de cada coluna do DataFrame.
+
+    Retorna uma lista de dicionários com: coluna, tipo, contagem, nulos,
+    distintos, soma, media, minimo, maximo, quantis (esboço de 21 pontos
+    para numéricas) e top (até `top_k` categorias como
+    [categoria, contagem, soma de `col_valor`]).
+    """
+    valores = None
+    if col_valor is not None and col_valor in df.columns:
+        valores = _como_numero(df[col_valor])
+
+    perfis = []
+    for col in df.columns:
+        serie = df[col]
+        tipo = tipo_da_coluna(col, serie, tipos)
+
+        if tipo == "numerica":
+            dados = _perfil_numerico(serie)
+        elif tipo == "data":
+            dados = _perfil_data(serie)
+        else:
+            dados = _perfil_categorico(serie, None if col == col_valor else valores, top_k)
+
+        perfil = {
+            "coluna": str(col),
+            "tipo": tipo,
+            "nulos": int(serie.isna().sum()),
+            "distintos": None,
+            "soma": None,
+            "media": None,
+            "minimo": None,
+            "maximo": None,
+            "quantis": None,
+            "top": None,
+        }
+        perfil.update(dados)
+        perfis.append(perfil)
+    return perfis
+
+
+def variacao_pct(atual, anterior):
+    """Variação percentual; None quando a base é zero ou ausente."""
+    atual, anterior = _numero(atual), _numero(anterior)
+    if atual is None or not anterior:
+        return None
+    return round((atual - anterior) / abs(anterior) * 100, 2)
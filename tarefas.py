@@ -0,0 +1,214 @@
+import contextvars
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# ============================================================
+# FILA DE TAREFAS EM SEGUNDO PLANO (PDF, ANÁLISE DE IA)
+# ============================================================
+
+MAX_WORKERS = 4          # threads do pool de tarefas leves
+MAX_PESADAS = 2          # tarefas pesadas executando ao mesmo tempo (threads do pool pesado)
+MAX_NA_FILA = 16         # tarefas pesadas aceitas (executando + aguardando)
+MAX_POR_USUARIO = 2      # tarefas pesadas ativas por usuário
+RETENCAO_SEGUNDOS = 3600 # tempo que tarefas finalizadas ficam consultáveis
+
+NA_FILA = "na_fila"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+CANCELADA = "cancelada"
+FINALIZADOS = {CONCLUIDA, ERRO, CANCELADA}
+
+
+class TarefaCancelada(Exception):
+    """Levantada dentro da tarefa quando o cancelamento foi pedido."""
+
+
+class FilaCheia(Exception):
+    """A admissão recusou a tarefa (limite global ou do usuário atingido)."""
+
+
+class Tarefa:
+    """Estado de uma tarefa; `reportar` é passado à função como `progresso`."""
+
+    _seq = itertools.count(1)
+
+    def __init__(self, tipo, dono=None, pesada=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.ordem = next(self._seq)
+        self.tipo = tipo
+        self.dono = dono
+        self.pesada = pesada
+        self.status = NA_FILA
+        self.progresso = 0.0
+        self.mensagem = "Aguardando na fila..."
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.finalizada_em = None
+        self._cancelar = threading.Event()
+        self._futuro = None
+
+    @property
+    def finalizada(self):
+        return self.status in FINALIZADOS
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def cancelamento_pedido(self):
+        return self._cancelar.is_set()
+
+    def reportar(self, fracao=None, mensagem=None):
+        """Atualiza o progresso e interrompe a tarefa se o cancelamento foi pedido."""
+        if self._cancelar.is_set():
+            raise TarefaCancelada()
+        if fracao is not None:
+            self.progresso = max(0.0, min(1.0, float(fracao)))
+        if mensagem:
+            self.mensagem = mensagem
+
+
+class ExecutorTarefas:
+    """
+    Pools de threads limitados com controle de admissão para tarefas pesadas.
+
+    Tarefas pesadas rodam num pool próprio de `max_pesadas` threads; as que
+    excedem esperam na fila desse pool, sem ocupar thread, e as leves nunca
+    ficam atrás delas. Uma pesada cancelada enquanto espera sai da fila na
+    hora. Acima de `max_na_fila` pesadas no total, ou `max_por_usuario` de
+    um mesmo dono, novas submissões são recusadas com FilaCheia.
+    """
+
+    def __init__(
+        self,
+        max_workers=MAX_WORKERS,
+        max_pesadas=MAX_PESADAS,
+        max_na_fila=MAX_NA_FILA,
+        max_por_usuario=MAX_POR_USUARIO
+    ):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="platero-tarefa")
+        self._pool_pesadas = ThreadPoolExecutor(max_workers=max_pesadas, thread_name_prefix="platero-pesada")
+        self._lock = threading.Lock()
+        self._tarefas = {}
+        self.max_na_fila = max_na_fila
+        self.max_por_usuario = max_por_usuario
+
+    # ------------------------------------------------------------
+    # Submissão e consulta
+    # ------------------------------------------------------------
+
+    def submeter(self, tipo, func, *args, dono=None, pesada=True, **kwargs):
+        """Enfileira `func(*args, progresso=..., **kwargs)` e retorna o id da tarefa."""
+        tarefa = Tarefa(tipo, dono=dono, pesada=pesada)
+
+        with self._lock:
+            self._limpar_antigas()
+            if pesada:
+                ativas = [t for t in self._tarefas.values() if t.pesada and not t.finalizada]
+                if len(ativas) >= self.max_na_fila:
+                    raise FilaCheia("Servidor ocupado. Tente novamente em instantes.")
+                if dono is not None and sum(t.dono == dono for t in ativas) >= self.max_por_usuario:
+                    raise FilaCheia("Você já tem tarefas em andamento. Aguarde a conclusão.")
+            self._tarefas[tarefa.id] = tarefa
+
+        # A tarefa herda o contexto de quem submeteu (ex.: requisição na instrumentação)
+        pool = self._pool_pesadas if pesada else self._pool
+        tarefa._futuro = pool.submit(contextvars.copy_context().run, self._executar, tarefa, func, args, kwargs)
+        return tarefa.id
+
+    def obter(self, id_tarefa):
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def cancelar(self, id_tarefa):
+        tarefa = self.obter(id_tarefa)
+        if tarefa is None or tarefa.finalizada:
+            return False
+        tarefa.cancelar()
+        # Ainda na fila: sai sem esperar uma thread só para ser descartada
+        if tarefa._futuro is not None and tarefa._futuro.cancel():
+            tarefa.mensagem = "Cancelado"
+            tarefa.finalizada_em = time.time()
+            tarefa.status = CANCELADA
+        return True
+
+    def retirar_resultado(self, id_tarefa):
+        """
+        Entrega o resultado de uma tarefa finalizada e o descarta do executor:
+        quem o recebe passa a guardá-lo (a tarefa segue listada, sem ele).
+        """
+        tarefa = self.obter(id_tarefa)
+        if tarefa is None or not tarefa.finalizada:
+            return None
+        resultado, tarefa.resultado = tarefa.resultado, None
+        return resultado
+
+    def listar(self, dono=None):
+        with self._lock:
+            tarefas = list(self._tarefas.values())
+        if dono is not None:
+            tarefas = [t for t in tarefas if t.dono == dono]
+        return sorted(tarefas, key=lambda t: t.ordem)
+
+    def esperar(self, id_tarefa, timeout=None):
+        """Bloqueia até a tarefa terminar (uso em testes e scripts)."""
+        limite = None if timeout is None else time.time() + timeout
+        tarefa = self.obter(id_tarefa)
+        while tarefa is not None and not tarefa.finalizada:
+            if limite is not None and time.time() > limite:
+                break
+            time.sleep(0.01)
+        return tarefa
+
+    def encerrar(self, cancelar_pendentes=True):
+        if cancelar_pendentes:
+            for tarefa in self.listar():
+                self.cancelar(tarefa.id)
+        self._pool.shutdown(wait=True)
+        self._pool_pesadas.shutdown(wait=True)
+
+    # ------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------
+
+    def _executar(self, tarefa, func, args, kwargs):
+        status_final = ERRO
+        try:
+            tarefa.reportar(0.0, "Processando...")
+            tarefa.status = EXECUTANDO
+            tarefa.resultado = func(*args, progresso=tarefa.reportar, **kwargs)
+            tarefa.progresso = 1.0
+            tarefa.mensagem = "Concluído"
+            status_final = CONCLUIDA
+        except TarefaCancelada:
+            tarefa.mensagem = "Cancelado"
+            status_final = CANCELADA
+        except Exception as e:
+            tarefa.erro = str(e)
+            tarefa.mensagem = "Falhou"
+        finally:
+            tarefa.finalizada_em = time.time()
+            tarefa.status = status_final
+
+    def _limpar_antigas(self):
+        agora = time.time()
+        for id_tarefa, tarefa in list(self._tarefas.items()):
+            if tarefa.finalizada and agora - tarefa.finalizada_em > RETENCAO_SEGUNDOS:
+                del self._tarefas[id_tarefa]
+
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def executor_global():
+    """Executor único do processo, compartilhado por todas as sessões."""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ExecutorTarefas()
+        return _EXECUTOR
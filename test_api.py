@@ -0,0 +1,142 @@
+import http.client
+import json
+import math
+import threading
+import time
+
+import pytest
+
+import api
+from api import Ocupado, Servico, TempoEsgotado, criar_servidor
+from test_benchmarks import gerar_vendas
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    servidor = criar_servidor(porta=0, workers=1, max_fila=1, limite_corpo=2 * 1024 * 1024)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+    servidor.servico.fechar()
+
+
+def _csv(linhas=500):
+    return gerar_vendas(linhas).to_csv(sep=";", index=False).encode("utf-8")
+
+
+def test_rotas_na_mesma_conexao(servidor):
+    conexao = http.client.HTTPConnection(*servidor.server_address, timeout=120)
+    conexao.request("GET", "/saude")
+    estado = json.loads(conexao.getresponse().read())
+    assert estado["workers"] == 1 and estado["na_fila"] == 0
+
+    corpo = _csv()
+    conexao.request("POST", "/tipos?nome=vendas.csv", body=corpo)
+    tipos = json.loads(conexao.getresponse().read())
+    assert tipos["linhas"] == 500 and "VALOR" in tipos["tipos"]["numericas"]
+
+    conexao.request("POST", "/analise?nome=vendas.csv&eixo_y=VALOR&eixo_x=LOJA", body=corpo)
+    resposta = conexao.getresponse()
+    analise = json.loads(resposta.read())
+    assert resposta.status == 200
+    assert analise["kpis"]["registros"] == 500 and "Resumo Executivo" in analise["diagnostico"]
+
+    conexao.request("POST", "/relatorio?nome=vendas.csv&ia=0", body=corpo)
+    resposta = conexao.getresponse()
+    assert resposta.status == 200 and resposta.getheader("Content-Type") == "application/pdf"
+    assert resposta.read().startswith(b"%PDF")
+
+    # Erros de entrada não derrubam a conexão quando o corpo foi lido
+    conexao.request("POST", "/analise?nome=vendas.csv&eixo_y=NAO_EXISTE", body=corpo)
+    resposta = conexao.getresponse()
+    assert resposta.status == 422 and "eixo_y" in json.loads(resposta.read())["erro"]
+    conexao.request("GET", "/saude")
+    assert json.loads(conexao.getresponse().read())["atendidas"] >= 4
+    conexao.close()
+
+
+@pytest.mark.parametrize("rota, corpo, status", [
+    ("/tipos?nome=vendas.pdf", b"x", 422),
+    ("/inexistente?nome=a.csv", b"x", 404),
+    ("/tipos?nome=a.csv", b"x" * (3 * 1024 * 1024), 413),
+])
+def test_rejeicoes(servidor, rota, corpo, status):
+    conexao = http.client.HTTPConnection(*servidor.server_address, timeout=60)
+    try:
+        conexao.request("POST", rota, body=corpo)
+        assert conexao.getresponse().status == status
+    except (BrokenPipeError, ConnectionResetError):
+        assert status == 413  # servidor recusou antes de ler o corpo inteiro
+    conexao.close()
+
+
+def test_analise_de_amostra_extrapola_e_marca_estimado(monkeypatch, tmp_path):
+    caminho = tmp_path / "vendas.csv"
+    caminho.write_bytes(_csv(200))
+    carregar = api._carregar
+    monkeypatch.setattr(api, "_carregar", lambda *args: (carregar(*args)[0], {"estrategia": "amostra", "fracao": 0.25}))
+
+    resultado = api.processar("/analise", str(caminho), {"eixo_y": "VALOR", "eixo_x": "LOJA"})
+    completo, _ = carregar(str(caminho), "seguro")
+    kpis = resultado["kpis"]
+    assert resultado["estimado"] is True
+    assert (kpis["registros"], kpis["registros_na_amostra"]) == (800, 200)
+    assert math.isclose(kpis["total"], completo["VALOR"].sum() * 4)
+    assert math.isclose(kpis["media"], completo["VALOR"].mean())
+
+
+@pytest.mark.parametrize("tamanho", ["abc", "-5"])
+def test_content_length_invalido_responde_400(servidor, tamanho):
+    conexao = http.client.HTTPConnection(*servidor.server_address, timeout=60)
+    conexao.putrequest("POST", "/tipos?nome=a.csv")
+    conexao.putheader("Content-Length", tamanho)
+    conexao.endheaders()
+    resposta = conexao.getresponse()
+    assert resposta.status == 400 and "Content-Length" in json.loads(resposta.read())["erro"]
+    conexao.close()
+
+
+def test_fila_cheia_recusa_em_vez_de_acumular():
+    servico = Servico(workers=1, max_fila=0)
+    try:
+        ocupando = threading.Thread(target=servico.executar, args=(time.sleep, 1.0))
+        ocupando.start()
+        time.sleep(0.2)
+        with pytest.raises(Ocupado):
+            servico.executar(time.sleep, 0)
+        ocupando.join()
+        assert servico.executar(abs, -3) == 3  # vaga liberada, mesmo worker aquecido
+    finally:
+        servico.fechar()
+
+
+def test_tempo_esgotado_cancela_o_que_esta_na_fila_e_espera_o_que_roda():
+    servico = Servico(workers=1, max_fila=3, tempo_maximo=0.3)
+    concluidos = []
+
+    def ocupar(nome):
+        with pytest.raises(TempoEsgotado):
+            servico.executar(time.sleep, 0.6, ao_concluir=lambda: concluidos.append(nome))
+
+    try:
+        # O pool repassa ao worker, além da que roda, as duas seguintes; a quarta espera na fila
+        nomes = ["primeira", "segunda", "terceira"]
+        ocupando = [threading.Thread(target=ocupar, args=(nome,)) for nome in nomes]
+        for thread in ocupando:
+            thread.start()
+            time.sleep(0.05)
+
+        with pytest.raises(TempoEsgotado):
+            servico.executar(abs, -1, ao_concluir=lambda: concluidos.append("fila"))
+        assert concluidos == ["fila"]  # cancelada: vaga e arquivo liberados já
+        for thread in ocupando:
+            thread.join()
+        assert concluidos == ["fila"]  # as outras seguem no worker, com os argumentos em uso
+
+        time.sleep(2.0)
+        assert concluidos == ["fila", *nomes]
+        assert servico.estado()["em_execucao"] == 0
+    finally:
+        servico.fechar()
@@ -0,0 +1,23 @@
+from benchmarks import suite
+from benchmarks.geradores import gerar_vendas
+
+
+def test_gerador_deterministico_no_formato_brasileiro():
+    a, b = gerar_vendas(500), gerar_vendas(500)
+    assert a.equals(b)
+    assert a["VALOR"].dropna().str.match(r"^R\$ \d{1,3}(\.\d{3})*,\d{2}$").all()
+    assert a["DATA"].str.match(r"^\d{2}/\d{2}/\d{4}$").all()
+
+
+def test_cenario_mede_todas_as_etapas_e_detecta_regressao():
+    resultado = suite.executar_cenario("padrao", 200, repeticoes=1, memoria=False, log=lambda *_: None)
+    assert list(resultado["etapas"]) == [nome for nome, _ in suite.ETAPAS]
+    assert resultado["entrada_inteligente"] == "xlsx"
+
+    baseline = {"resultados": {"padrao-200": resultado}}
+    atual = {"resultados": {"padrao-200": {"etapas": {
+        "gerar_pdf_pro": {"tempo_s": resultado["etapas"]["gerar_pdf_pro"]["tempo_s"] * 2 + 1, "pico_mb": None},
+        "detectar_tipos": dict(resultado["etapas"]["detectar_tipos"]),
+    }}}}
+    regressoes = suite.comparar(atual, baseline)
+    assert [(r["etapa"], r["metrica"]) for r in regressoes] == [("gerar_pdf_pro", "tempo_s")]
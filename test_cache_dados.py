@@ -0,0 +1,65 @@
+import os
+import time
+
+import pandas as pd
+
+import cache_dados
+
+
+def _df():
+    return pd.DataFrame({
+        "DATA": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-03-01"]),
+        "LOJA": pd.Series(["A", "B", "A"], dtype="category"),
+        "VENDAS": [10.5, 20.0, None],
+    })
+
+
+def test_ida_e_volta_com_tipos(tmp_path):
+    tipos = {"datas": ["DATA"], "numericas": ["VENDAS"], "categoricas": ["LOJA"]}
+    assert cache_dados.salvar("abc", _df(), tipos, meta={"nome_arquivo": "vendas.xlsx"}, diretorio=str(tmp_path))
+
+    df, tipos_lidos, meta = cache_dados.carregar("abc", diretorio=str(tmp_path))
+    assert df.equals(_df())
+    assert str(df["LOJA"].dtype) == "category"
+    assert tipos_lidos == tipos
+    assert meta["nome_arquivo"] == "vendas.xlsx"
+    assert cache_dados.carregar_tipos("abc", diretorio=str(tmp_path)) == tipos
+    assert cache_dados.carregar("outra", diretorio=str(tmp_path)) is None
+
+
+def test_anexo_grava_so_o_incremento(tmp_path):
+    diretorio = str(tmp_path)
+    tipos = {"datas": ["DATA"], "numericas": ["VENDAS"], "categoricas": ["LOJA"]}
+    base, novas = _df().iloc[:2], _df().iloc[2:]
+    cache_dados.salvar("base", base, tipos, diretorio=diretorio)
+    cache_dados.salvar("anexo", novas, tipos, diretorio=diretorio, base="base")
+
+    assert len(pd.read_feather(os.path.join(diretorio, "anexo" + cache_dados.EXT_DADOS))) == 1
+    df, _, _ = cache_dados.carregar("anexo", diretorio=diretorio)
+    pd.testing.assert_frame_equal(df, _df())
+
+    # Sem a base, o anexo sozinho não serve
+    cache_dados.remover("base", diretorio)
+    assert cache_dados.carregar("anexo", diretorio=diretorio) is None
+    assert not cache_dados.existe("anexo", diretorio=diretorio)
+
+
+def test_retencao_por_idade_e_tamanho(tmp_path):
+    diretorio = str(tmp_path)
+    for chave in ("velho", "medio", "novo"):
+        cache_dados.salvar(chave, _df(), {}, diretorio=diretorio)
+
+    antigo = time.time() - 40 * 86400
+    for ext in (cache_dados.EXT_DADOS, cache_dados.EXT_META):
+        os.utime(os.path.join(diretorio, "velho" + ext), (antigo, antigo))
+        os.utime(os.path.join(diretorio, "medio" + ext), (antigo + 39 * 86400,) * 2)
+
+    cache_dados.aplicar_retencao(diretorio, limite_bytes=10**9, idade_maxima=30 * 86400)
+    assert not cache_dados.existe("velho", diretorio)
+    assert cache_dados.existe("medio", diretorio)
+
+    # Estourando o tamanho, sai o menos usado
+    um_dataset = sum(os.path.getsize(c) for c in cache_dados._caminhos("novo", diretorio))
+    cache_dados.aplicar_retencao(diretorio, limite_bytes=um_dataset, idade_maxima=30 * 86400)
+    assert not cache_dados.existe("medio", diretorio)
+    assert cache_dados.existe("novo", diretorio)
@@ -0,0 +1,85 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+import cache_relatorio
+import pdf_engine_cloud
+from pdf_engine_cloud import gerar_pdf_pro
+
+
+def _df():
+    return pd.DataFrame({
+        "Data": pd.date_range("2024-01-01", periods=6),
+        "Categoria": ["A", "B", "C"] * 2,
+        "Valor": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0]
+    })
+
+
+def _gerar(df, **kwargs):
+    return gerar_pdf_pro(
+        df_original=df,
+        df_limpo=df,
+        datas=["Data"],
+        numericas=["Valor"],
+        categoricas=["Categoria"],
+        figs_principais=[],
+        texto_ia="Parecer",
+        usuario="Teste",
+        **kwargs
+    )
+
+
+def test_data_fixa_gera_pdf_identico_byte_a_byte():
+    data = datetime(2024, 5, 1, 9, 30)
+    assert _gerar(_df(), data_geracao=data) == _gerar(_df(), data_geracao=data)
+
+
+def test_cache_serve_relatorio_sem_regerar(tmp_path, monkeypatch):
+    data = datetime(2024, 5, 1, 9, 30)
+    primeiro = _gerar(_df(), data_geracao=data, usar_cache=True, diretorio_cache=str(tmp_path))
+    assert len(list(tmp_path.glob("*.pdf"))) == 1
+
+    def nao_deve_montar(*args, **kwargs):
+        raise AssertionError("Relatório deveria vir do cache")
+
+    monkeypatch.setattr(pdf_engine_cloud, "PDF", nao_deve_montar)
+    segundo = _gerar(_df(), data_geracao=data, usar_cache=True, diretorio_cache=str(tmp_path))
+    assert segundo == primeiro
+
+    # Qualquer mudança semântica gera outra chave
+    df_alterado = _df()
+    df_alterado.loc[0, "Valor"] = 11.0
+    chave_a = cache_relatorio.chave_relatorio(_df(), [], texto="x")
+    chave_b = cache_relatorio.chave_relatorio(df_alterado, [], texto="x")
+    assert chave_a != chave_b
+
+
+def test_remover_excedente_mantem_mais_recentes(tmp_path):
+    for i, nome in enumerate(["velho", "medio", "novo"]):
+        caminho = tmp_path / f"{nome}.pdf"
+        caminho.write_bytes(b"x" * 100)
+        os.utime(caminho, (1000 + i, 1000 + i))
+
+    total = cache_relatorio.remover_excedente(str(tmp_path), limite_bytes=250)
+
+    assert total == 200
+    assert sorted(p.stem for p in tmp_path.glob("*.pdf")) == ["medio", "novo"]
+
+
+def test_cache_sem_data_fixa_nao_reaproveita_data_antiga(tmp_path, monkeypatch):
+    agora = [datetime(2024, 5, 1, 9, 30, 5)]
+
+    class Relogio(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return agora[0]
+
+    monkeypatch.setattr(pdf_engine_cloud, "datetime", Relogio)
+    _gerar(_df(), usar_cache=True, diretorio_cache=str(tmp_path))
+    agora[0] = datetime(2024, 5, 1, 9, 30, 50)   # mesmo minuto impresso: acerto
+    _gerar(_df(), usar_cache=True, diretorio_cache=str(tmp_path))
+    assert len(list(tmp_path.glob("*.pdf"))) == 1
+    agora[0] = datetime(2024, 5, 2, 8, 0)        # outro dia: outro "Gerado em"
+    _gerar(_df(), usar_cache=True, diretorio_cache=str(tmp_path))
+    assert len(list(tmp_path.glob("*.pdf"))) == 2
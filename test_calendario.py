@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from ai_analyst import analisar_com_ia
+from calendario import Calendario
+
+
+def _vendas(linhas=5_000):
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({
+        "DATA": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700, linhas), unit="D"),
+        "LOJA": rng.choice(["A", "B", "C"], linhas),
+        "VALOR": rng.gamma(2.0, 50.0, linhas),
+    })
+    df.loc[::17, "VALOR"] = np.nan
+    df.loc[::29, "DATA"] = pd.NaT
+    return df
+
+
+def test_totais_por_nivel_batem_com_periodos_do_pandas():
+    df = _vendas()
+    calendario = Calendario(df)
+    validas = df.dropna(subset=["DATA"])
+
+    for nivel, periodo in [("dia", "D"), ("semana", "W"), ("mes", "M"), ("trimestre", "Q"), ("ano", "Y")]:
+        esperado = validas.groupby(validas["DATA"].dt.to_period(periodo))["VALOR"].sum()
+        serie = calendario.serie("DATA", "VALOR", nivel)
+        np.testing.assert_allclose(serie.to_numpy(), esperado.to_numpy())
+        assert list(serie.index) == [p.start_time for p in esperado.index]
+
+    sazonal = validas.groupby(validas["DATA"].dt.month)["VALOR"].mean()
+    np.testing.assert_allclose(calendario.sazonalidade("DATA", "VALOR").to_numpy(), sazonal.to_numpy())
+    mensal = validas.groupby(validas["DATA"].dt.to_period("M"))["VALOR"].sum()
+    assert np.isclose(calendario.crescimento_mensal("DATA", "VALOR"), mensal.pct_change().mean() * 100)
+
+
+def test_diagnostico_igual_com_calendario_compartilhado():
+    df = _vendas()
+    calendario = Calendario(df)
+    assert analisar_com_ia(df, "LOJA", "VALOR", calendario=calendario) == analisar_com_ia(df, "LOJA", "VALOR")
+    # Totais ficam guardados: a segunda consulta não recalcula
+    assert calendario.totais("DATA", "VALOR") is calendario.totais("DATA", "VALOR")
+
+
+def test_anexo_soma_totais_sem_reler_o_historico():
+    df = _vendas()
+    base, novas = df.iloc[:4_000], df.iloc[4_000:]
+    calendario = Calendario(base)
+    calendario.totais("DATA", "VALOR")
+
+    anexado = calendario.anexar(df, novas)
+    completo = Calendario(df)
+    for nivel in ("dia", "mes", "ano", "mes_do_ano"):
+        pd.testing.assert_frame_equal(anexado.totais("DATA", "VALOR")[nivel], completo.totais("DATA", "VALOR")[nivel])
+    assert anexado.linhas_validas("DATA") == completo.linhas_validas("DATA")
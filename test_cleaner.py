@@ -0,0 +1,13 @@
+import numpy as np
+import pandas as pd
+
+from cleaner import limpar_coluna_numerica
+
+
+def test_limpar_coluna_numerica_trata_vazios_como_ausentes():
+    # No pandas 3, astype(str) mantém NaN/None como float em vez de "nan"
+    serie = pd.Series(["R$ 1.234,56", None, np.nan, "", "10,5"], dtype=object)
+    limpa = limpar_coluna_numerica(serie)
+    assert limpa.iloc[0] == 1234.56
+    assert limpa.iloc[4] == 10.5
+    assert limpa.iloc[1:4].isna().all()
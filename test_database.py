@@ -0,0 +1,162 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import database
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "historico.db"))
+    database.init_db()
+    yield database
+    database.fechar_conexoes()
+
+
+def test_escritas_concorrentes_sem_travamento(banco):
+    df = pd.DataFrame({"Valor": [10.0, 20.0, 30.0]})
+
+    def salvar(i):
+        return banco.salvar_registro(f"user{i % 4}", f"arq{i}.csv", df, "Valor", aguardar=False)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futuros = list(pool.map(salvar, range(200)))
+
+    assert len({f.result(timeout=10) for f in futuros}) == 200  # um id por registro
+    historico = banco.carregar_historico("user0")
+    assert len(historico) == 50
+    assert historico["faturamento_total"].iloc[0] == 60.0
+
+    metricas = banco.metricas_banco()
+    assert metricas["falhas_escrita"] == 0
+    assert metricas["lotes"] < metricas["escritas"]  # escritas foram agrupadas
+    assert metricas["latencia_escrita_ms"]["p95"] is not None
+    assert metricas["conexoes_leitura_livres"] == metricas["conexoes_leitura"]
+
+
+def test_wal_e_falha_isolada(banco):
+    with banco.armazenamento().leitura() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    ruim = banco.armazenamento().escrever(lambda conn: conn.execute("INSERT INTO inexistente VALUES (1)"))
+    boa = banco.salvar_registro("ana", "ok.csv", pd.DataFrame({"Valor": [1]}), "Valor", aguardar=True)
+
+    with pytest.raises(Exception):
+        ruim.result(timeout=5)
+    assert boa
+    assert len(banco.carregar_historico("ana")) == 1
+
+
+def test_gravacao_sincrona_por_padrao_e_init_uma_vez(banco):
+    escritas = banco.metricas_banco()["escritas"]
+    banco.init_db()
+    assert banco.metricas_banco()["escritas"] == escritas  # já inicializado neste processo
+
+    assert banco.salvar_registro("gil", "a.csv", pd.DataFrame({"Valor": [1]}), "Valor") is True
+    assert len(banco.carregar_historico("gil")) == 1
+
+    banco.armazenamento().escrever(lambda conn: conn.execute("DROP TABLE perfil_coluna")).result()
+    assert banco.salvar_registro("gil", "b.csv", pd.DataFrame({"Valor": [2]}), "Valor") is False
+    assert len(banco.carregar_historico("gil")) == 1
+
+
+def test_migracao_de_datas_antigas(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "antigo.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute("""
+        CREATE TABLE historico (id INTEGER PRIMARY KEY AUTOINCREMENT, usuario TEXT, data_upload TEXT,
+        nome_arquivo TEXT, faturamento_total REAL, ticket_medio REAL, linhas_processadas INTEGER)
+    """)
+    conn.executemany(
+        "INSERT INTO historico (usuario, data_upload, nome_arquivo) VALUES (?, ?, ?)",
+        [("ana", "05/03/2024 10:30", "marco.csv"), ("ana", "20/01/2024 09:00", "janeiro.csv")]
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, "DB_FILE", caminho)
+    database.init_db()
+    try:
+        df = database.carregar_historico("ana")
+        assert list(df["nome_arquivo"]) == ["marco.csv", "janeiro.csv"]
+        assert df["data_upload"].iloc[0] == "2024-03-05 10:30:00"
+    finally:
+        database.fechar_conexoes()
+
+
+def test_paginacao_por_cursor_e_periodo(banco):
+    def inserir(conn):
+        for dia in range(1, 8):
+            ts = int(datetime(2024, 1, dia, 12).timestamp())
+            conn.execute(
+                "INSERT INTO historico (usuario, data_upload, ts_upload, nome_arquivo) VALUES (?, ?, ?, ?)",
+                ("bia", database._iso(ts), ts, f"dia{dia}.csv")
+            )
+    banco.armazenamento().escrever(inserir).result()
+
+    nomes, cursor = [], None
+    while True:
+        df, cursor = banco.pagina_historico("bia", limite=3, cursor=cursor)
+        nomes += list(df["nome_arquivo"])
+        if cursor is None:
+            break
+    assert nomes == [f"dia{d}.csv" for d in range(7, 0, -1)]
+
+    df, cursor = banco.pagina_historico("bia", inicio="2024-01-02", fim="2024-01-04")
+    assert list(df["nome_arquivo"]) == ["dia4.csv", "dia3.csv", "dia2.csv"]
+    assert cursor is None
+
+
+def test_perfis_e_comparacoes(banco):
+    tipos = {"numericas": ["VENDAS"], "categoricas": ["LOJA"]}
+    jan = pd.DataFrame({"LOJA": ["A", "B"], "VENDAS": [100.0, 50.0]})
+    fev = pd.DataFrame({"LOJA": ["A", "B", "C"], "VENDAS": [150.0, 50.0, 10.0]})
+    banco.salvar_registro("caio", "jan.csv", jan, "VENDAS", tipos=tipos, aguardar=True)
+    banco.salvar_registro("caio", "fev.csv", fev, "VENDAS", tipos=tipos, aguardar=True)
+
+    historico = banco.carregar_historico("caio")
+    id_fev, id_jan = historico.index[:2]
+
+    perfil = banco.carregar_perfil(id_fev)
+    assert perfil.at["VENDAS", "soma"] == 210.0
+    assert perfil.at["LOJA", "top"][0] == ["A", 1, 150.0]
+
+    comparacao = banco.comparar_uploads(id_fev, id_jan)
+    assert comparacao.at["VENDAS", "variacao_soma_pct"] == 40.0
+
+    categorias = banco.comparar_categorias(id_fev, id_jan, "LOJA")
+    assert categorias.at["A", "variacao_soma_pct"] == 50.0
+    assert pd.isna(categorias.at["C", "soma_anterior"])
+
+    resumo = banco.resumo_periodo("caio")
+    assert resumo.at["VENDAS", "uploads"] == 2
+    assert resumo.at["VENDAS", "soma"] == 360.0
+
+
+def test_rollups_mensais_por_usuario_e_empresa(banco):
+    df = pd.DataFrame({"VENDAS": [100.0, 300.0]})
+    banco.salvar_registro("duda", "a.csv", df, "VENDAS", empresa="Acme", aguardar=True)
+    banco.salvar_registro("edu", "b.csv", df * 2, "VENDAS", empresa="Acme", aguardar=True)
+
+    usuario = banco.tendencia_mensal(usuario="duda")
+    assert len(usuario) == 1
+    assert usuario["faturamento_total"].iloc[0] == 400.0
+
+    empresa = banco.tendencia_mensal(empresa="Acme")
+    assert empresa["uploads"].iloc[0] == 2
+    assert empresa["faturamento_total"].iloc[0] == 1200.0
+    assert empresa["ticket_medio"].iloc[0] == 300.0
+
+    # Reconstrução a partir do histórico chega ao mesmo resultado
+    banco.reconstruir_rollups()
+    assert banco.tendencia_mensal(empresa="Acme").equals(empresa)
+
+
+def test_upload_ligado_ao_hash_do_conteudo(banco):
+    banco.salvar_registro("fabi", "x.csv", pd.DataFrame({"V": [1]}), "V", hash_conteudo="abc123", aguardar=True)
+    id_upload = banco.carregar_historico("fabi").index[0]
+    assert banco.hash_do_upload(id_upload, "fabi") == "abc123"
+    assert banco.hash_do_upload(id_upload, "outro_usuario") is None
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from dataset_store import DatasetStore, chave_conteudo, compactar
+
+
+def _df(n=1000, semente=0):
+    return pd.DataFrame({
+        "LOJA": [f"Loja {i % 5}" for i in range(n)],
+        "QTD": list(range(semente, semente + n)),
+        "VENDAS": [float(i) for i in range(n)],
+    })
+
+
+def test_compactar_preserva_valores():
+    df = _df()
+    compacto = compactar(df)
+    assert str(compacto["LOJA"].dtype) == "category"
+    assert str(compacto["QTD"].dtype) == "int32"
+    assert compacto["VENDAS"].dtype == "float64"
+    assert compacto.astype(df.dtypes.to_dict()).equals(df)
+
+
+def test_conteudo_identico_e_carregado_uma_vez(tmp_path):
+    store = DatasetStore(diretorio_spill=str(tmp_path))
+    chave = chave_conteudo(b"planilha", "seguro")
+    chamadas = []
+
+    def carregar():
+        chamadas.append(1)
+        time.sleep(0.05)
+        return _df(), None
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        resultados = list(pool.map(lambda i: store.obter_ou_carregar(chave, carregar, dono=f"s{i}"), range(8)))
+
+    assert len(chamadas) == 1
+    assert all(erro is None and len(df) == 1000 for df, erro in resultados)
+
+    # Cópias rasas: alterar a de uma sessão não afeta o armazém
+    df, _ = resultados[0]
+    df["VENDAS"] = 0.0
+    assert store.obter(chave)["VENDAS"].sum() > 0
+
+
+def test_orcamento_despeja_sem_dono_e_recupera_do_disco(tmp_path):
+    store = DatasetStore(limite_bytes=1, diretorio_spill=str(tmp_path))
+
+    store.obter_ou_carregar("a", lambda: (_df(semente=1), None), dono="sessao1")
+    store.obter_ou_carregar("b", lambda: (_df(semente=2), None))
+    metricas = store.metricas()
+    assert metricas["datasets"] == 1           # "b" saiu; "a" tem dono
+    assert metricas["spills"] == 1
+
+    store.liberar("sessao1")
+    assert store.metricas()["datasets"] == 0
+
+    df, erro = store.obter_ou_carregar("b", lambda: (None, "não deveria reler"))
+    assert erro is None
+    assert df["QTD"].iloc[0] == 2
+    assert store.metricas()["recuperados_disco"] == 1
+
+
+def test_erro_nao_fica_em_cache(tmp_path):
+    store = DatasetStore(diretorio_spill=str(tmp_path))
+    assert store.obter_ou_carregar("x", lambda: (None, "arquivo inválido")) == (None, "arquivo inválido")
+    df, erro = store.obter_ou_carregar("x", lambda: (_df(10), None))
+    assert erro is None and len(df) == 10
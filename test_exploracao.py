@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from exploracao import COLUNA_PESO, Exploracao, amostra_estratificada
+
+
+def _vendas(linhas=200_000):
+    rng = np.random.default_rng(7)
+    # Uma loja rara: a estratificação garante que ela aparece na amostra
+    lojas = np.where(rng.random(linhas) < 0.0005, "Rara", rng.choice(["A", "B", "C", "D"], linhas))
+    return pd.DataFrame({"LOJA": lojas, "VALOR": rng.gamma(2.0, 50.0, linhas)})
+
+
+def test_amostra_cobre_todos_os_estratos_e_estima_totais():
+    df = _vendas()
+    amostra = amostra_estratificada(df, "LOJA", 5_000)
+    assert len(amostra) < len(df) // 10
+
+    # Pesos reconstituem o tamanho de cada estrato e estimam as somas
+    tamanhos = df["LOJA"].value_counts()
+    pesos = amostra.groupby("LOJA")[COLUNA_PESO].sum()
+    pd.testing.assert_series_equal(pesos.reindex(tamanhos.index), tamanhos.astype(float),
+                                   check_names=False, check_index_type=False)
+    estimado = (amostra["VALOR"] * amostra[COLUNA_PESO]).groupby(amostra["LOJA"]).sum()
+    exato = df.groupby("LOJA")["VALOR"].sum()
+    assert ((estimado / exato).drop("Rara") - 1).abs().max() < 0.1
+
+
+def test_exploracao_dispensa_amostra_quando_nao_reduz():
+    df = pd.DataFrame({"ID": range(30_000), "VALOR": 1.0})
+    exploracao = Exploracao(df, alvo_ms=0.001)
+    assert exploracao.amostra("ID", "VALOR") is None  # um estrato por linha
+
+    df["GRUPO"] = df["ID"] % 3
+    ponderada, linhas = Exploracao(pd.concat([df] * 10, ignore_index=True), alvo_ms=0.001).amostra("GRUPO", "VALOR")
+    assert linhas == len(ponderada) < 300_000
+    assert COLUNA_PESO not in ponderada
+    assert round(ponderada["VALOR"].sum()) == 300_000
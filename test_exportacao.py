@@ -0,0 +1,66 @@
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import exportacao
+from exportacao import exportar, formatos_disponiveis, ranking_completo
+
+
+def _limpo(linhas=2_500):
+    df = pd.DataFrame({
+        "DATA": pd.date_range("2024-01-01", periods=linhas, freq="h"),
+        "LOJA": pd.Categorical(np.where(np.arange(linhas) % 3, "Centro", "Sul")),
+        "VALOR": np.arange(linhas) * 1.5,
+        "OBS": pd.Series([None] * linhas, dtype=object),
+    })
+    df.loc[7, "VALOR"] = np.nan
+    df.loc[linhas - 1, "OBS"] = "última"  # só aparece no último bloco
+    return df
+
+
+@pytest.mark.parametrize("formato", formatos_disponiveis())
+def test_exporta_em_blocos_e_reabre_igual(formato, tmp_path):
+    df = _limpo()
+    fracoes = []
+    caminho = exportar(df, formato, lambda f, m=None: fracoes.append(f), linhas_por_bloco=1_000,
+                       diretorio=str(tmp_path))
+    assert os.path.basename(caminho).startswith(exportacao.PREFIXO_EXPORTACAO)
+    assert fracoes[-1] == 1.0 and len(fracoes) == 4
+
+    if formato == "csv.gz":
+        with gzip.open(caminho, "rt", encoding="utf-8-sig") as f:
+            lido = pd.read_csv(f, sep=";", parse_dates=["DATA"])
+    elif formato == "parquet":
+        lido = pd.read_parquet(caminho)
+    else:
+        lido = pd.read_excel(caminho)
+    assert len(lido) == len(df)
+    assert lido["VALOR"].sum() == pytest.approx(df["VALOR"].sum())
+    assert lido["VALOR"].isna().sum() == 1
+    assert lido["OBS"].iloc[-1] == "última"
+    assert pd.Timestamp(lido["DATA"].iloc[-1]) == df["DATA"].iloc[-1]
+
+
+def test_xlsx_divide_abas_no_limite_e_cancelamento_remove_temporario(tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao, "LINHAS_POR_ABA_XLSX", 1_000)
+    caminho = exportar(_limpo(), "xlsx", nome_aba="Vendas", linhas_por_bloco=600, diretorio=str(tmp_path))
+    assert load_workbook(caminho, read_only=True).sheetnames == ["Vendas", "Vendas (2)", "Vendas (3)"]
+    os.remove(caminho)
+
+    def cancelar(fracao, mensagem=None):
+        raise InterruptedError("cancelada")
+
+    with pytest.raises(InterruptedError):
+        exportar(_limpo(), "csv.gz", cancelar, linhas_por_bloco=1_000, diretorio=str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_ranking_completo_tem_todas_as_categorias():
+    ranking = ranking_completo(_limpo(), "LOJA", "VALOR")
+    assert list(ranking["LOJA"]) == ["Centro", "Sul"]
+    assert ranking["Registros"].sum() == 2_500
+    assert ranking["Participação (%)"].sum() == pytest.approx(100)
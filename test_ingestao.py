@@ -0,0 +1,145 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.geradores import gerar_vendas
+from cleaner import carregar_modo_seguro
+from dataset_store import chave_conteudo
+from utils import detectar_tipos
+from ingestao import (
+    AMOSTRA, COLUNA_ORIGEM_ARQUIVO, LOTES, MEMORIA, UploadEmDisco, anexar, carregar_com_plano, carregar_varios,
+    descrever_consolidacao, descrever_plano, para_disco, planejar_carga,
+)
+
+
+def _upload(linhas=20_000):
+    buffer = io.BytesIO()
+    gerar_vendas(linhas).to_csv(buffer, sep=";", index=False, encoding="utf-8")
+    buffer.seek(0)
+    buffer.name = "vendas.csv"
+    return buffer
+
+
+def test_lotes_equivalem_a_carga_completa_com_menos_memoria():
+    arquivo = _upload()
+    completo = planejar_carga(arquivo, orcamento=1 << 34)
+    assert completo["estrategia"] == MEMORIA
+    df_completo, erro = carregar_com_plano(arquivo, completo, "seguro")
+    assert erro is None
+
+    plano = planejar_carga(arquivo, orcamento=4 * 1024 * 1024)
+    assert plano["estrategia"] == LOTES
+    df, erro = carregar_com_plano(arquivo, plano, "seguro")
+    assert erro is None
+    assert len(df) == len(df_completo)
+    assert df["VALOR"].sum() == df_completo["VALOR"].sum()
+    assert isinstance(df["LOJA"].dtype, pd.CategoricalDtype)
+    assert df.memory_usage(deep=True).sum() < df_completo.memory_usage(deep=True).sum()
+
+
+def test_orcamento_minimo_carrega_amostra_e_avisa():
+    arquivo = _upload()
+    plano = planejar_carga(arquivo, orcamento=1024 * 1024)
+    assert plano["estrategia"] == AMOSTRA and plano["fracao"] < 1
+
+    df, erro = carregar_com_plano(arquivo, plano, "inteligente")
+    assert erro is None
+    assert 0 < len(df) < 20_000
+    assert pd.api.types.is_datetime64_any_dtype(df["DATA"])
+    assert "amostra" in descrever_plano(plano)
+
+
+def test_extensao_em_maiusculas_e_reconhecida():
+    arquivo = _upload(500)
+    arquivo.name = "VENDAS.CSV"
+    df, erro = carregar_modo_seguro(arquivo)
+    assert erro is None
+    assert len(df) == 500
+
+
+def test_upload_grande_vai_para_disco_e_e_apagado():
+    arquivo = _upload(2_000)
+    em_disco = para_disco(arquivo, limite=0)
+    assert isinstance(em_disco, UploadEmDisco) and os.path.exists(em_disco.caminho)
+    assert chave_conteudo(em_disco.getbuffer(), "seguro") == chave_conteudo(arquivo.getvalue(), "seguro")
+
+    df_disco, _ = carregar_com_plano(em_disco, planejar_carga(em_disco), "seguro")
+    df_ram, _ = carregar_com_plano(arquivo, planejar_carga(arquivo), "seguro")
+    pd.testing.assert_frame_equal(df_disco, df_ram)
+
+    em_disco.close()
+    assert not os.path.exists(em_disco.caminho)
+    assert para_disco(arquivo) is arquivo
+
+
+def _csv(nome, texto):
+    arquivo = io.BytesIO(texto.encode("utf-8"))
+    arquivo.name = nome
+    return arquivo
+
+
+def test_varios_arquivos_consolidados_com_esquemas_alinhados():
+    sp = _csv("sp_jan.csv", "LOJA;VALOR\nSP;\"1.000,50\"\nSP;20\n")
+    rj = _csv("rj_jan.csv", "Loja;Valor;Vendedor\nRJ;n/d\nRJ;\"3,5\";Ana\n")
+    vazio = _csv("vazio.csv", "")
+
+    df, relatorio = carregar_varios([sp, rj, vazio], carregar_modo_seguro)
+
+    assert list(df.columns) == ["LOJA", "VALOR", "Vendedor", COLUNA_ORIGEM_ARQUIVO]
+    assert df[COLUNA_ORIGEM_ARQUIVO].tolist() == ["sp_jan.csv"] * 2 + ["rj_jan.csv"] * 2
+    assert df["VALOR"].tolist()[:2] == [1000.5, 20.0] and df["VALOR"].iloc[3] == 3.5
+    assert list(relatorio["erros"]) == ["vazio.csv"]
+    assert {"arquivo": "sp_jan.csv", "faltando": ["Vendedor"], "renomeadas": {}} in relatorio["divergencias"]
+    assert relatorio["conflitos_tipo"][0]["coluna"] == "VALOR"
+    assert len(descrever_consolidacao(relatorio)) == 4
+
+
+def test_anexo_limpa_so_as_linhas_novas():
+    vendas = gerar_vendas(3_000)
+    def upload(linhas, nome):
+        arquivo = io.BytesIO()
+        vendas.iloc[:linhas].to_csv(arquivo, sep=";", index=False)
+        arquivo.seek(0)
+        arquivo.name = nome
+        return arquivo
+
+    base, _ = carregar_modo_seguro(upload(2_000, "ytd_nov.csv"))
+    tipos = detectar_tipos(base)
+    novas, estado, relatorio = anexar(base, upload(3_000, "ytd_dez.csv"), "seguro", tipos)
+    assert relatorio == {"linhas_arquivo": 3_000, "novas": 1_000, "repetidas": 2_000}
+    df = pd.concat([base, novas], ignore_index=True)
+
+    completo, _ = carregar_modo_seguro(upload(3_000, "x.csv"))
+    assert len(df) == 3_000
+    assert estado.motor.kpis("VALOR")["total"] == pytest.approx(completo["VALOR"].sum())
+
+    # O mesmo arquivo de novo: nada a limpar (hashes das linhas brutas)
+    _, estado, relatorio = anexar(df, upload(3_000, "ytd_dez.csv"), "seguro", tipos, estado)
+    assert relatorio["novas"] == 0
+    assert estado.motor.registros == 3_000
+
+
+def test_anexo_mantem_linhas_iguais_do_mesmo_upload():
+    def upload(linhas):
+        arquivo = io.BytesIO(("LOJA;VALOR\n" + "\n".join(linhas)).encode())
+        arquivo.name = "vendas.csv"
+        return arquivo
+
+    base, _ = carregar_modo_seguro(upload(["A;10,00", "B;5,00"]))
+    tipos = detectar_tipos(base)
+
+    # Duas vendas idênticas no mesmo arquivo são duas linhas; uma já estava na base
+    novas, estado, relatorio = anexar(base, upload(["A;10,00", "A;10,00", "C;1,00", "C;1,00"]), "seguro", tipos)
+    assert (relatorio["novas"], relatorio["repetidas"]) == (3, 1)
+    df = pd.concat([base, novas], ignore_index=True)
+
+    # Reenviado, nada entra; com uma cópia a mais, só ela
+    _, estado, relatorio = anexar(df, upload(["A;10,00", "A;10,00", "C;1,00", "C;1,00"]), "seguro", tipos, estado)
+    assert relatorio["novas"] == 0
+    novas, estado, relatorio = anexar(df, upload(["A;10,00"] * 3 + ["C;1,00"] * 2), "seguro", tipos, estado)
+    assert relatorio["novas"] == 1
+    df = pd.concat([df, novas], ignore_index=True)
+    assert df.groupby("LOJA").size().to_dict() == {"A": 3, "B": 1, "C": 2}
+    assert estado.motor.registros == len(df)
@@ -0,0 +1,60 @@
+import json
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import instrumentacao
+from instrumentacao import Coletor, definir_contexto, etapa, instrumentado
+
+
+@pytest.fixture
+def coletor(tmp_path, monkeypatch):
+    coletor = Coletor(diretorio=str(tmp_path))
+    monkeypatch.setattr(instrumentacao, "_COLETOR", coletor)
+    return coletor
+
+
+def test_etapas_aninhadas_com_contexto_e_erro(coletor):
+    definir_contexto(requisicao="abc", usuario="ana", arquivo="vendas.csv")
+    with etapa("carregamento") as medicao:
+        with etapa("leitura"):
+            pass
+        medicao.dimensoes(pd.DataFrame({"a": [1, 2, 3]}))
+    with pytest.raises(ValueError):
+        with etapa("tipos"):
+            raise ValueError("falhou")
+
+    with open(coletor.caminho_log, encoding="utf-8") as f:
+        registros = [json.loads(linha) for linha in f]
+    leitura, carregamento, tipos = registros
+    assert leitura["pai"] == "carregamento" and carregamento["pai"] is None
+    assert (carregamento["linhas"], carregamento["colunas"]) == (3, 1)
+    assert carregamento["requisicao"] == "abc" and carregamento["arquivo"] == "vendas.csv"
+    assert tipos["status"] == "erro"
+    assert carregamento["cpu_ms"] >= 0 and carregamento["parede_ms"] >= 0
+
+    percentis = coletor.percentis()
+    assert percentis["leitura"]["parede_ms"]["n"] == 1
+    lento = coletor.mais_lentos()[0]
+    assert lento["requisicao"] == "abc" and lento["linhas"] == 3
+
+    coletor.gravar_percentis()
+    assert os.path.exists(os.path.join(coletor.diretorio, "percentis.json"))
+    # Um novo processo retoma a janela a partir do log
+    assert Coletor(diretorio=coletor.diretorio).percentis()["tipos"]["parede_ms"]["n"] == 1
+
+
+def test_contexto_chega_as_tarefas_em_segundo_plano(coletor):
+    from tarefas import ExecutorTarefas
+
+    executor = ExecutorTarefas(max_workers=1)
+    definir_contexto(requisicao="xyz")
+    try:
+        id_tarefa = executor.submeter("analise", instrumentado("analise_ia", lambda progresso: threading.get_ident()))
+        assert executor.esperar(id_tarefa, timeout=5).resultado != threading.get_ident()
+    finally:
+        executor.encerrar()
+    registro = coletor.mais_lentos()[0]
+    assert registro["requisicao"] == "xyz" and registro["etapa_mais_lenta"] == "analise_ia"
@@ -0,0 +1,36 @@
+import json
+
+import lote
+
+
+def _csv(caminho, linhas=30):
+    conteudo = ["DATA;CATEGORIA;VENDAS"] + [
+        f"{(i % 28) + 1:02d}/{(i % 12) + 1:02d}/2024;Serviço{i % 3};R$ {1000 + i},50"
+        for i in range(linhas)
+    ]
+    caminho.write_text("\n".join(conteudo), encoding="latin-1")
+
+
+def test_lote_gera_pdf_e_resumo_e_retoma(tmp_path):
+    entrada = tmp_path / "planilhas"
+    entrada.mkdir()
+    _csv(entrada / "janeiro.csv")
+    (entrada / "vazio.csv").write_text("")
+    saida = tmp_path / "saida"
+
+    codigo = lote.main([str(entrada), "--saida", str(saida), "--workers", "1"])
+
+    assert codigo == 1  # o arquivo vazio falha, mas não derruba o lote
+    resumo = json.loads((saida / "janeiro.json").read_text(encoding="utf-8"))
+    assert resumo["status"] == "ok"
+    assert resumo["linhas"] == 30
+    assert (saida / "janeiro.pdf").read_bytes().startswith(b"%PDF")
+    assert json.loads((saida / "vazio.json").read_text(encoding="utf-8"))["status"] == "erro"
+
+    consolidado = json.loads((saida / lote.ARQUIVO_RESUMO).read_text(encoding="utf-8"))
+    assert consolidado["contagem"] == {"ok": 1, "erro": 1}
+
+    # Segunda execução: o que deu certo é pulado, só a falha é refeita
+    lote.main([str(entrada), "--saida", str(saida), "--workers", "1"])
+    consolidado = json.loads((saida / lote.ARQUIVO_RESUMO).read_text(encoding="utf-8"))
+    assert consolidado["contagem"] == {"pulado": 1, "erro": 1}
@@ -0,0 +1,116 @@
+import json
+import math
+
+import pandas as pd
+import pytest
+
+import motor_consulta
+from motor_consulta import MotorArrow, MotorIncremental, MotorPandas, motor_para
+
+pytest.importorskip("pyarrow")
+
+CSV = (
+    "DATA;LOJA;VALOR\n"
+    "05/01/2024;São Paulo;\"R$ 1.000,50\"\n"
+    "20/01/2024;Rio;200\n"
+    "03/02/2024;São Paulo;300,25\n"
+    "10/02/2024;Belém;\n"
+    "15/03/2024;Rio;abc\n"
+)
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = tmp_path / "vendas.csv"
+    caminho.write_bytes(CSV.encode("latin-1"))
+    return str(caminho)
+
+
+def _df():
+    return pd.DataFrame({
+        "DATA": pd.to_datetime(["2024-01-05", "2024-01-20", "2024-02-03", "2024-02-10", "2024-03-15"]),
+        "LOJA": ["São Paulo", "Rio", "São Paulo", "Belém", "Rio"],
+        "VALOR": [1000.50, 200.0, 300.25, None, None],
+    })
+
+
+def test_arrow_equivale_ao_pandas(arquivo):
+    arrow = MotorArrow(arquivo, separador=";")
+    pandas = MotorPandas(_df())
+
+    ka, kp = arrow.kpis("VALOR"), pandas.kpis("VALOR")
+    assert ka["registros"] == kp["registros"] == 5
+    assert ka["contagem"] == kp["contagem"] == 3
+    for chave in ("total", "media", "minimo", "maximo", "desvio"):
+        assert math.isclose(ka[chave], kp[chave], rel_tol=1e-9)
+
+    pd.testing.assert_series_equal(arrow.agrupar("LOJA", "VALOR"), pandas.agrupar("LOJA", "VALOR"), check_dtype=False)
+    pd.testing.assert_series_equal(
+        arrow.tendencia_mensal("DATA", "VALOR"), pandas.tendencia_mensal("DATA", "VALOR"),
+        check_dtype=False, check_index_type=False
+    )
+
+
+def test_pareto_e_escolha_do_motor(arquivo):
+    pareto = MotorPandas(_df()).pareto("LOJA", "VALOR")
+    assert pareto.index[0] == "São Paulo"
+    assert pareto["acumulado"].iloc[-1] == pytest.approx(1.0)
+    assert pareto.attrs["categorias_no_corte"] == 0
+
+    assert isinstance(motor_para(df=_df()), MotorPandas)
+    assert motor_para(caminho=arquivo, motor="arrow").nome == "arrow"
+    assert motor_consulta.amostra_csv(arquivo, linhas=2).getvalue().count(b"\n") == 3
+
+
+def test_duckdb_equivale_ao_arrow(arquivo):
+    pytest.importorskip("duckdb")
+    duck = motor_consulta.MotorDuckDB(arquivo, separador=";")
+    arrow = MotorArrow(arquivo, separador=";")
+    assert math.isclose(duck.kpis("VALOR")["total"], arrow.kpis("VALOR")["total"])
+    pd.testing.assert_series_equal(
+        duck.agrupar("LOJA", "VALOR"), arrow.agrupar("LOJA", "VALOR"), check_index_type=False
+    )
+    pd.testing.assert_series_equal(
+        duck.tendencia_mensal("DATA", "VALOR"), arrow.tendencia_mensal("DATA", "VALOR"), check_index_type=False
+    )
+
+
+def test_incremental_mesclado_equivale_ao_pandas():
+    df = _df()
+    parte1 = MotorIncremental.de_dataframe(df.iloc[:3], ["VALOR"], ["LOJA"], ["DATA"])
+    parte2 = MotorIncremental.de_dataframe(df.iloc[3:], ["VALOR"], ["LOJA"], ["DATA"])
+    incremental = MotorIncremental.de_dict(json.loads(json.dumps(parte1.mesclar(parte2).para_dict())))
+    pandas = MotorPandas(df)
+
+    ki, kp = incremental.kpis("VALOR"), pandas.kpis("VALOR")
+    assert (ki["registros"], ki["contagem"]) == (5, 3)
+    for chave in ("total", "media", "minimo", "maximo", "desvio"):
+        assert math.isclose(ki[chave], kp[chave], rel_tol=1e-9)
+    pd.testing.assert_series_equal(
+        incremental.agrupar("LOJA", "VALOR"), pandas.agrupar("LOJA", "VALOR"), check_index_type=False
+    )
+    pd.testing.assert_series_equal(
+        incremental.tendencia_mensal("DATA", "VALOR"), pandas.tendencia_mensal("DATA", "VALOR"),
+        check_index_type=False
+    )
+    assert incremental.cobre("LOJA", "VALOR") and not incremental.cobre("VALOR")
+
+
+def test_incremental_desvio_estavel_com_valores_grandes():
+    """Soma dos quadrados cancelava em valores ~1e9; média e M2 (Chan) mantêm a precisão."""
+    df = pd.DataFrame({"VALOR": [1e9 + 0.1, 1e9 + 0.2, 1e9 + 0.3, 1e9 + 0.5, 1e9 + 0.8]})
+    partes = [MotorIncremental.de_dataframe(df.iloc[i:i + 2], ["VALOR"]) for i in range(0, 5, 2)]
+    incremental = partes[0].mesclar(partes[1]).mesclar(partes[2])
+    esperado = df["VALOR"].std()
+    assert math.isclose(incremental.kpis("VALOR")["desvio"], esperado, rel_tol=1e-6)
+
+    # Agregados gravados no formato antigo (soma dos quadrados) continuam legíveis
+    antigo = incremental.para_dict()
+    e = antigo["estatisticas"]["VALOR"]
+    antigo["estatisticas"]["VALOR"] = {
+        "contagem": e["contagem"], "soma": e["soma"], "soma_quadrados": float((df["VALOR"] ** 2).sum()),
+        "minimo": e["minimo"], "maximo": e["maximo"],
+    }
+    kpis = MotorIncremental.de_dict(antigo).kpis("VALOR")
+    assert kpis["total"] == e["soma"] and kpis["contagem"] == 5
+    assert math.isclose(kpis["media"], df["VALOR"].mean(), rel_tol=1e-12)
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+# Módulos do núcleo: precisam rodar em workers, lote e testes sem Streamlit
+NUCLEO = ["cleaner", "utils", "ai_analyst", "pdf_engine_cloud", "database", "tarefas", "lote", "cache_relatorio", "perfil", "dataset_store", "cache_dados", "motor_consulta", "instrumentacao", "ingestao", "exploracao", "calendario", "exportacao", "api"]
+
+
+def test_nucleo_nao_importa_streamlit_nem_graficos():
+    codigo = (
+        "import sys\n"
+        f"for m in {NUCLEO!r}: __import__(m)\n"
+        "print(sorted(m for m in ('streamlit', 'matplotlib', 'seaborn') if m in sys.modules))\n"
+    )
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == "[]"
@@ -49,4 +49,156 @@ def test_pdf_encoding_safety():
         assert isinstance(pdf_bytes, (bytes, bytearray))
         print("Sucesso: O sistema sanitizou os caracteres especiais corretamente.")
     except Exception as e:
-        pytest.fail(f"O PDF falhou ao processar caracteres especiais: {e}")
\ No newline at end of file
+        pytest.fail(f"O PDF falhou ao processar caracteres especiais: {e}")
+
+def test_pdf_figuras_em_memoria_sem_arquivos_temporarios(tmp_path, monkeypatch):
+    """Figuras idênticas são embutidas uma vez e nada é gravado no diretório temporário."""
+    import tempfile
+    import matplotlib.pyplot as plt
+
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.setattr(tempfile, "tempdir", None)
+
+    df = pd.DataFrame({"Categoria": ["A", "B"], "Valor": [1, 2]})
+
+    def nova_figura():
+        fig, ax = plt.subplots(figsize=(4, 2))
+        ax.bar(["A", "B"], [1, 2])
+        return fig
+
+    figs = [nova_figura(), nova_figura()]
+    pdf_png = gerar_pdf_pro(df, df, [], ["Valor"], ["Categoria"], figs, "", usuario="Teste")
+    pdf_jpeg = gerar_pdf_pro(
+        df, df, [], ["Valor"], ["Categoria"], figs, "",
+        usuario="Teste", dpi_figuras=72, formato_figuras="jpeg"
+    )
+    for fig in figs:
+        plt.close(fig)
+
+    assert list(tmp_path.iterdir()) == []
+    assert pdf_png.count(b"/Subtype /Image") == 1
+    assert b"/DCTDecode" in pdf_jpeg
+
+
+def test_fontes_embarcadas_sem_rede_e_com_cache(monkeypatch):
+    """As fontes DejaVu vêm do projeto (sem rede) e são analisadas uma vez por processo."""
+    import socket
+    import fontes_pdf
+
+    def sem_rede(*args, **kwargs):
+        raise AssertionError("Geração de PDF não deve acessar a rede")
+
+    monkeypatch.setattr(socket, "socket", sem_rede)
+    fontes_pdf.limpar_cache_fontes()
+
+    df = pd.DataFrame({"A": [1, 2]})
+    primeiro = gerar_pdf_pro(df, df, [], ["A"], [], [], "Ação", usuario="Zé")
+    modelos = dict(fontes_pdf._MODELOS)
+    segundo = gerar_pdf_pro(df, df, [], ["A"], [], [], "Ação", usuario="Zé")
+
+    assert len(modelos) == 2  # regular + negrito
+    assert fontes_pdf._MODELOS == modelos  # nada foi reanalisado
+    for pdf_bytes in (primeiro, segundo):
+        assert b"DejaVuSansBold" in pdf_bytes
+        assert b"DejaVuSansOblique" not in pdf_bytes
+
+
+def test_fontes_sem_clone_usam_add_font_publico(monkeypatch):
+    """Fora da série do fpdf2 fixada, as fontes entram pelo add_font público."""
+    import fontes_pdf
+
+    clones = []
+    monkeypatch.setattr(fontes_pdf, "CLONE_SUPORTADO", False)
+    monkeypatch.setattr(fontes_pdf, "_clonar_fonte", lambda *args: clones.append(args))
+
+    df = pd.DataFrame({"A": [1, 2]})
+    pdf_bytes = gerar_pdf_pro(df, df, [], ["A"], [], [], "Ação", usuario="Zé")
+    assert clones == []
+    assert b"DejaVuSansBold" in pdf_bytes
+
+
+def test_relatorio_de_amostra_marca_valores_estimados(monkeypatch):
+    import pdf_engine_cloud
+
+    textos = []
+    original = pdf_engine_cloud.PDF.paragrafo
+
+    def paragrafo(self, texto):
+        textos.append(texto)
+        original(self, texto)
+
+    monkeypatch.setattr(pdf_engine_cloud.PDF, "paragrafo", paragrafo)
+
+    df = pd.DataFrame({"A": [10.0, 30.0]})
+    gerar_pdf_pro(df, df, [], ["A"], [], [], "", fracao_amostra=0.25)
+    kpis = next(t for t in textos if t.startswith("Coluna analisada"))
+    assert "Total (estimado): 160" in kpis
+    assert "Registros (estimado): 8 (2 na amostra)" in kpis
+
+
+def test_base_consolidada_pondera_cada_arquivo_pela_sua_fracao(monkeypatch):
+    """Arquivos amostrados em frações diferentes: cada linha pesa o inverso da fração do seu arquivo."""
+    import pdf_engine_cloud
+
+    textos, rankings = [], []
+    original = pdf_engine_cloud.PDF.paragrafo
+
+    def paragrafo(self, texto):
+        textos.append(texto)
+        original(self, texto)
+
+    def tabela(self, cabecalho, linhas, **kwargs):
+        rankings.append(list(linhas))
+        return 0
+
+    monkeypatch.setattr(pdf_engine_cloud.PDF, "paragrafo", paragrafo)
+    monkeypatch.setattr(pdf_engine_cloud.PDF, "tabela", tabela)
+
+    # a.csv inteiro (2 linhas) e 10% de b.csv (1 linha, vale 10)
+    df = pd.DataFrame({
+        "Valor": [10.0, 30.0, 5.0],
+        "Loja": ["X", "X", "Y"],
+        "Origem_Arquivo": ["a.csv", "a.csv", "b.csv"],
+    })
+    gerar_pdf_pro(df, df, [], ["Valor"], ["Loja"], [], "",
+                  fracao_amostra={"a.csv": 1.0, "b.csv": 0.1})
+    kpis = next(t for t in textos if t.startswith("Coluna analisada"))
+    assert "amostras aleatórias de 10.0% a 100.0%" in kpis
+    assert "Total (estimado): 90.00" in kpis
+    assert "Média (estimada): 7.50" in kpis
+    assert "Registros (estimado): 12 (3 na amostra)" in kpis
+    assert rankings[0] == [["1", "Y", "50.00", "55.6%"], ["2", "X", "40.00", "44.4%"]]
+
+
+def test_sanitize_text_modos_latin1_e_unicode():
+    """Latin-1 mantém o comportamento antigo; o modo Unicode preserva o que a DejaVu desenha."""
+    from pdf_engine_cloud import sanitize_text
+
+    texto = "📌 **Resumo**  \n• Média “alta” → 3σ…\n\tR$ 10"
+
+    assert sanitize_text(texto) == 'Resumo\n- Média "alta" 3 ...\nR 10'
+    assert sanitize_text(texto, unicode=True) == "Resumo\n• Média “alta” → 3σ…\nR 10"
+    assert sanitize_text("") == ""
+
+
+def test_tabela_streaming_repete_cabecalho_e_resume_outros():
+    """A tabela consome um iterador, pagina com cabeçalho repetido e o ranking agrupa o excedente."""
+    from pdf_engine_cloud import PDF, iter_ranking
+
+    pdf = PDF()
+    pdf.set_compression(False)
+    pdf.add_page()
+
+    linhas = ([str(i), f"item {i}"] for i in range(150))
+    escritas = pdf.tabela(["Coluna Repetida", "Item"], linhas)
+    conteudo = bytes(pdf.output())
+
+    assert escritas == 150
+    assert pdf.page_no() > 1
+    assert conteudo.count(b"Coluna Repetida") == pdf.page_no()
+
+    df = pd.DataFrame({"Loja": [f"L{i % 25}" for i in range(1000)], "Valor": [1.0] * 1000})
+    ranking = list(iter_ranking(df, "Loja", "Valor", top_n=5))
+    assert len(ranking) == 6
+    assert ranking[-1][1] == "Outros (20)"
+    assert ranking[-1][2] == "800.00"
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from perfil import perfilar, variacao_pct
+
+
+def test_perfil_por_tipo():
+    df = pd.DataFrame({
+        "DATA": pd.to_datetime(["2024-01-01", "2024-01-15", None]),
+        "LOJA": ["A", "B", "A"],
+        "VENDAS": ["R$ 1.000,00", "500,50", None],
+    })
+    tipos = {"datas": ["DATA"], "numericas": ["VENDAS"], "categoricas": ["LOJA"]}
+    perfis = {p["coluna"]: p for p in perfilar(df, tipos=tipos, col_valor="VENDAS")}
+
+    vendas = perfis["VENDAS"]
+    assert vendas["tipo"] == "numerica"
+    assert (vendas["contagem"], vendas["nulos"]) == (2, 1)
+    assert vendas["soma"] == 1500.5
+    assert vendas["quantis"][0] == 500.5 and vendas["quantis"][-1] == 1000.0
+
+    assert perfis["LOJA"]["top"] == [["A", 2, 1000.0], ["B", 1, 500.5]]
+    assert perfis["DATA"]["minimo"].startswith("2024-01-01")
+    assert perfis["DATA"]["nulos"] == 1
+
+
+def test_variacao_pct():
+    assert variacao_pct(150, 100) == 50.0
+    assert variacao_pct(10, 0) is None
+    assert variacao_pct(None, 10) is None
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from tarefas import ExecutorTarefas, FilaCheia, CONCLUIDA, CANCELADA, ERRO
+
+
+def test_tarefa_conclui_com_progresso():
+    executor = ExecutorTarefas(max_workers=2, max_pesadas=1)
+
+    def trabalho(x, progresso):
+        progresso(0.5, "metade")
+        return x * 2
+
+    tarefa = executor.esperar(executor.submeter("teste", trabalho, 21), timeout=5)
+    executor.encerrar()
+
+    assert tarefa.status == CONCLUIDA
+    assert tarefa.resultado == 42
+    assert tarefa.progresso == 1.0
+
+    # Entregue a quem pediu, o resultado não fica retido no executor
+    assert executor.retirar_resultado(tarefa.id) == 42
+    assert tarefa.resultado is None and tarefa.status == CONCLUIDA
+
+
+def test_cancelamento_e_erro():
+    executor = ExecutorTarefas(max_workers=2, max_pesadas=1)
+    liberar = threading.Event()
+
+    def longo(progresso):
+        while not liberar.wait(0.01):
+            progresso()
+
+    def quebra(progresso):
+        raise ValueError("falhou")
+
+    id_longo = executor.submeter("longo", longo)
+    id_erro = executor.submeter("erro", quebra, pesada=False)
+    executor.cancelar(id_longo)
+
+    assert executor.esperar(id_longo, timeout=5).status == CANCELADA
+    tarefa_erro = executor.esperar(id_erro, timeout=5)
+    assert tarefa_erro.status == ERRO and tarefa_erro.erro == "falhou"
+    liberar.set()
+    executor.encerrar()
+
+
+def test_admissao_limita_tarefas_pesadas():
+    executor = ExecutorTarefas(max_workers=4, max_pesadas=1, max_na_fila=3, max_por_usuario=1)
+    liberar = threading.Event()
+
+    def bloqueia(progresso):
+        liberar.wait(5)
+
+    executor.submeter("pdf", bloqueia, dono="ana")
+    with pytest.raises(FilaCheia):
+        executor.submeter("pdf", bloqueia, dono="ana")
+
+    executor.submeter("pdf", bloqueia, dono="bia")
+    executor.submeter("pdf", bloqueia, dono="caio")
+    with pytest.raises(FilaCheia):
+        executor.submeter("pdf", bloqueia, dono="duda")
+
+    # Tarefas leves não disputam as vagas pesadas
+    leve = executor.submeter("leve", lambda progresso: "ok", pesada=False)
+    assert executor.esperar(leve, timeout=5).resultado == "ok"
+
+    liberar.set()
+    executor.encerrar(cancelar_pendentes=False)
+
+
+def test_pesadas_aguardando_nao_ocupam_threads_das_leves():
+    executor = ExecutorTarefas(max_workers=1, max_pesadas=1)
+    liberar = threading.Event()
+
+    def bloqueia(progresso):
+        liberar.wait(5)
+
+    executor.submeter("pdf", bloqueia)
+    na_fila = executor.submeter("pdf", bloqueia)
+
+    leve = executor.submeter("leve", lambda progresso: "ok", pesada=False)
+    assert executor.esperar(leve, timeout=2).resultado == "ok"
+
+    # Cancelada enquanto aguarda: finaliza sem esperar a vaga
+    executor.cancelar(na_fila)
+    assert executor.obter(na_fila).status == CANCELADA
+
+    liberar.set()
+    executor.encerrar()
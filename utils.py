@@ -113,4 +113,26 @@ def detectar_tipos(df):
         "quantidades": quantidades,
         "booleanas": booleanas,
         "texto_livre": texto_livre
-    }
\ No newline at end of file
+    }
+
+
+# ============================================================
+# ESCOLHA PADRÃO DE EIXOS
+# ============================================================
+
+def escolher_coluna_kpi(numericas):
+    """Prefere colunas de venda/valor/total para os KPIs; senão a primeira numérica."""
+    for col in numericas:
+        if "VENDA" in col.upper() or "VALOR" in col.upper() or "TOTAL" in col.upper():
+            return col
+    return numericas[0] if numericas else None
+
+
+def escolher_eixo_x(df, datas):
+    """Agrupamento padrão: primeira data, depois ANO, CATEGORIA ou a primeira coluna."""
+    if datas:
+        return datas[0]
+    for col in ["ANO", "CATEGORIA"]:
+        if col in df.columns:
+            return col
+    return df.columns[0]